@@ -6,63 +6,176 @@ Handles all communication with the Sonarr API
 
 import requests
 import time
-from typing import List, Dict, Any, Optional, Union
+import functools
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Optional, Set, Union, Iterable, Iterator, Tuple
 from utils.logger import logger, debug_log
-from config import API_KEY, API_URL, API_TIMEOUT, COMMAND_WAIT_DELAY, COMMAND_WAIT_ATTEMPTS
+from config import (
+    API_KEY, API_URL, API_TIMEOUT, COMMAND_WAIT_DELAY, COMMAND_WAIT_ATTEMPTS,
+    API_MAX_CONCURRENCY, API_POOL_SIZE, COMMAND_MAX_OUTSTANDING, WANTED_PREFETCH_PAGES,
+    SERIES_CACHE_TTL, SERIES_CACHE_SIZE, API_RETRIES, API_RETRY_BACKOFF,
+    CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN, API_RATE_LIMIT,
+    API_FAST_DECODE, API_DECODE_STATS, SERIES_REFRESH_FRESHNESS_MINUTES,
+    WANTED_DELTA_SYNC, WANTED_FULL_RESYNC_MINUTES, WANTED_CACHE_MAX_RECORDS,
+    DOWNLOAD_QUEUE_HIGH_WATER, DOWNLOAD_QUEUE_LOW_WATER, DOWNLOAD_QUEUE_SAMPLE_SECONDS, DOWNLOAD_QUEUE_COUNT_COMMANDS,
+    Settings, settings
+)
+from command_tracker import CommandTracker
+from series_cache import SeriesCache
+from resilience import CircuitBreaker, TokenBucket, backoff_delay
+from decoding import ChunkReader, DecodeStats, decode_projected
+from models import EpisodeRef, SeriesRef, episodes_from_records
+from refresh_registry import RefreshRegistry
+from throttle import DownloadThrottle
+from wanted_sync import SnapshotTooLarge, WantedPageCache, WantedSnapshot
+from state import STATE_DIR
 
-# Create a session for reuse
+# Create a session for reuse, with a connection pool large enough for the worker threads
 session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=max(API_POOL_SIZE, 1),
+    pool_maxsize=max(API_POOL_SIZE, API_MAX_CONCURRENCY, 1)
+)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
 
-def sonarr_request(endpoint: str, method: str = "GET", data: Dict = None) -> Optional[Union[Dict, List]]:
+# Worker threads used for concurrent requests - this bounds the number of requests in flight
+executor = ThreadPoolExecutor(max_workers=max(API_MAX_CONCURRENCY, 1), thread_name_prefix="sonarr-api")
+
+# Fail fast while Sonarr is down, and keep our request rate polite
+circuit_breaker = CircuitBreaker(failure_threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN)
+rate_limiter = TokenBucket(rate=API_RATE_LIMIT)
+
+# HTTP status codes worth retrying - Sonarr is busy or restarting
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Bytes received and decoded sizes per endpoint, collected when API_DECODE_STATS is enabled
+decode_stats = DecodeStats()
+
+def _decode_response(endpoint: str, response: requests.Response, projected: bool) -> Optional[Union[Dict, List]]:
+    """Decode a response body, projecting wanted records when requested and API_FAST_DECODE is enabled."""
+    if projected and API_FAST_DECODE:
+        reader = ChunkReader(response.iter_content(chunk_size=64 * 1024))
+        try:
+            result = decode_projected(reader)
+        finally:
+            response.close()
+        bytes_received = reader.bytes_read
+    else:
+        result = response.json()
+        bytes_received = len(response.content)
+
+    if API_DECODE_STATS:
+        decode_stats.record(endpoint, bytes_received, result)
+    return result
+
+def sonarr_request(endpoint: str, method: str = "GET", data: Dict = None, projected: bool = False) -> Optional[Union[Dict, List]]:
     """
     Make a request to the Sonarr API (v3).
     `endpoint` should be something like 'series', 'command', 'wanted/cutoff', etc.
+    Set `projected` for paged wanted/* responses to keep only the record fields the hunt uses.
+    GET requests are retried up to API_RETRIES times with jittered exponential backoff.
+    Connection errors, timeouts and server errors count towards the circuit breaker;
+    while it is open, requests return None immediately.
     """
     url = f"{API_URL}/api/v3/{endpoint}"
     headers = {
         "X-Api-Key": API_KEY,
         "Content-Type": "application/json"
     }
-    
-    try:
-        if method.upper() == "GET":
-            response = session.get(url, headers=headers, timeout=API_TIMEOUT)
-        elif method.upper() == "POST":
-            response = session.post(url, headers=headers, json=data, timeout=API_TIMEOUT)
-        else:
-            logger.error(f"Unsupported HTTP method: {method}")
-            return None
-        
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API request error: {e}")
+    method = method.upper()
+    if method not in ("GET", "POST"):
+        logger.error(f"Unsupported HTTP method: {method}")
         return None
-    
-def wait_for_command(command_id: int):
-    logger.debug(f"Waiting for command {command_id} to complete...")
-    attempts = 0
-    while True:
+
+    # Only idempotent requests are safe to repeat
+    attempts = API_RETRIES + 1 if method == "GET" else 1
+
+    for attempt in range(attempts):
+        if not circuit_breaker.allow():
+            logger.debug(f"Circuit breaker open, skipping request to {endpoint}")
+            return None
+
+        rate_limiter.acquire()
         try:
-            time.sleep(COMMAND_WAIT_DELAY)
-            response = sonarr_request(f"command/{command_id}")
-            logger.debug(f"Command {command_id} Status: {response['status']}")
-        except Exception as error:
-            logger.error(f"Error fetching command status on attempt {attempts + 1}: {error}")
-            return False
+            if method == "GET":
+                response = session.get(url, headers=headers, timeout=API_TIMEOUT, stream=projected and API_FAST_DECODE)
+            else:
+                response = session.post(url, headers=headers, json=data, timeout=API_TIMEOUT)
+            
+            response.raise_for_status()
+            result = _decode_response(endpoint, response, projected)
+            circuit_breaker.record_success()
+            return result
+        except ValueError as e:
+            # Sonarr answered, but not with valid JSON
+            logger.error(f"Invalid JSON in API response from {endpoint}: {e}")
+            return None
+        except requests.exceptions.RequestException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            if status_code is not None and status_code not in RETRYABLE_STATUS_CODES:
+                # Sonarr answered - the request itself is at fault, so don't retry or trip the breaker
+                logger.error(f"API request error: {e}")
+                return None
 
-        attempts += 1
+            if circuit_breaker.record_failure():
+                logger.warning(f"Sonarr is not responding. Pausing API requests for {CIRCUIT_BREAKER_COOLDOWN}s.")
 
-        if response['status'].lower() in ['complete', 'completed'] or attempts >= COMMAND_WAIT_ATTEMPTS:
-            break
+            if attempt + 1 < attempts and circuit_breaker.allow():
+                delay = backoff_delay(attempt, base=API_RETRY_BACKOFF)
+                logger.warning(f"API request error: {e}. Retrying in {delay:.1f}s ({attempt + 1}/{API_RETRIES})...")
+                time.sleep(delay)
+                continue
 
-    if response['status'].lower() not in ['complete', 'completed']:
-        logger.warning(f"Command {command_id} did not complete within the allowed attempts.")
-        return False
+            logger.error(f"API request error: {e}")
+            return None
+
+def is_sonarr_available() -> bool:
+    """False while the circuit breaker is open after repeated request failures."""
+    return circuit_breaker.allow()
+    
+def sonarr_request_many(endpoints: Iterable[str], projected: bool = False) -> List[Optional[Union[Dict, List]]]:
+    """
+    Make several GET requests to the Sonarr API concurrently.
+    At most API_MAX_CONCURRENCY requests are in flight at once.
+    Results are returned in the same order as `endpoints`.
+    """
+    endpoints = list(endpoints)
+    if not endpoints:
+        return []
+    request = functools.partial(sonarr_request, projected=projected)
+    if API_MAX_CONCURRENCY <= 1 or len(endpoints) == 1:
+        return [request(endpoint) for endpoint in endpoints]
+    return list(executor.map(request, endpoints))
 
-    time.sleep(0.5)
+# Shared poller for all in-flight commands
+command_tracker = CommandTracker(
+    sonarr_request,
+    poll_interval=COMMAND_WAIT_DELAY,
+    max_attempts=COMMAND_WAIT_ATTEMPTS,
+    max_outstanding=COMMAND_MAX_OUTSTANDING
+)
 
-    return response['status'].lower() in ['complete', 'completed']
+def wait_for_command(command_id: int) -> bool:
+    """Block until a command completes. Returns True if it completed successfully."""
+    logger.debug(f"Waiting for command {command_id} to complete...")
+    return command_tracker.track(command_id).result()
+
+def submit_command(data: Dict) -> Optional[Future]:
+    """
+    POST /api/v3/command and track the new command without waiting for it.
+    Blocks while COMMAND_MAX_OUTSTANDING commands are already running.
+    Returns a Future resolving to True on completion, or None if the command could not be started.
+    """
+    command_tracker.acquire_slot()
+    response = sonarr_request("command", method="POST", data=data)
+    if not response or 'id' not in response:
+        command_tracker.release_slot()
+        return None
+    logger.debug(f"Started {data.get('name')} command {response['id']}")
+    return command_tracker.track(response['id'], slot_acquired=True)
 
 def get_series() -> List[Dict]:
     """Get all series from Sonarr."""
@@ -71,49 +184,107 @@ def get_series() -> List[Dict]:
         debug_log("Raw series API response sample:", series_list[:2] if len(series_list) > 2 else series_list)
     return series_list or []
 
-def refresh_series(series_id: int) -> bool:
+# Series objects by ID, filled once per cycle from a single bulk series request
+series_cache = SeriesCache(ttl=SERIES_CACHE_TTL, max_size=SERIES_CACHE_SIZE)
+
+def warm_series_cache(force: bool = False) -> None:
+    """Fill the series cache from one GET /api/v3/series call, unless it is still fresh."""
+    if not force and not series_cache.is_stale():
+        return
+    series_list = get_series()
+    if series_list:
+        series_cache.warm(series_list)
+        logger.debug(f"Series cache warmed with {len(series_cache)} series")
+
+def get_series_by_id(series_id: int) -> Optional[Dict]:
+    """GET /api/v3/series/<id>, served from the series cache when possible."""
+    return get_series_by_ids([series_id]).get(series_id)
+
+def get_series_by_ids(series_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    GET /api/v3/series/<id> for many series at once.
+    Cached series are served from the series cache; the rest are fetched concurrently and cached.
+    Returns a dict of series ID -> series object; failed lookups are left out.
+    """
+    unique_ids = [series_id for series_id in dict.fromkeys(series_ids) if series_id is not None]
+    found, missing_ids = series_cache.get_many(unique_ids)
+    responses = sonarr_request_many(f"series/{series_id}" for series_id in missing_ids)
+    for series_id, series_data in zip(missing_ids, responses):
+        if series_data:
+            series_cache.put(series_id, series_data)
+            found[series_id] = series_data
+    return found
+
+def start_refresh_series(series_id: int) -> Optional[Future]:
     """
     POST /api/v3/command
     {
       "name": "RefreshSeries",
       "seriesId": <series_id>
     }
+    Always sends the command. Returns a Future for it, or None if it could not be started.
     """
     data = {
         "name": "RefreshSeries",
         "seriesId": series_id
     }
-    response = sonarr_request("command", method="POST", data=data)
-    if not response or 'id' not in response:
+    return submit_command(data)
+
+# Last successful refresh per series, so recently refreshed series aren't refreshed again
+series_refresh_registry = RefreshRegistry(
+    STATE_DIR / "series_refresh_times.json",
+    freshness_window=SERIES_REFRESH_FRESHNESS_MINUTES * 60,
+    start_refresh=start_refresh_series
+)
+
+def refresh_series_async(series_id: int, force: bool = False) -> Optional[Future]:
+    """
+    Refresh a series without waiting. A series refreshed within SERIES_REFRESH_FRESHNESS_MINUTES
+    is not refreshed again (unless `force`), and a refresh already running for the
+    series is shared. Returns a Future resolving to True once the series is up to date,
+    or None if the command could not be started.
+    """
+    return series_refresh_registry.refresh(series_id, force=force)
+
+def refresh_series(series_id: int) -> bool:
+    """Refresh a series and wait for the command to complete."""
+    future = refresh_series_async(series_id)
+    if future is None:
         return False
-    return wait_for_command(response['id'])
+    return future.result()
 
-def episode_search_episodes(episode_ids: List[int]) -> bool:
+def episode_search_episodes_async(episode_ids: List[int]) -> Optional[Future]:
     """
     POST /api/v3/command
     {
       "name": "EpisodeSearch",
       "episodeIds": [...]
     }
+    Returns a Future for the command, or None if it could not be started.
     """
     data = {
         "name": "EpisodeSearch",
         "episodeIds": episode_ids
     }
-    response = sonarr_request("command", method="POST", data=data)
-    if not response or 'id' not in response:
+    return submit_command(data)
+
+def episode_search_episodes(episode_ids: List[int]) -> bool:
+    """Search for episodes and wait for the command to complete."""
+    future = episode_search_episodes_async(episode_ids)
+    if future is None:
         return False
-    return wait_for_command(response['id'])
+    return future.result()
 
-def get_download_queue_size() -> int:
+def sample_download_queue_size() -> Optional[int]:
     """
     GET /api/v3/queue
-    Returns total number of items in the queue with the status 'downloading'.
+    Returns total number of items in the queue with the status 'downloading',
+    or None if Sonarr couldn't be asked.
     """
     response = sonarr_request("queue?status=downloading")
-    if not response:
-        return 0
-        
+    if not isinstance(response, dict):
+        return None
+
     total_records = response.get("totalRecords", 0)
     if not isinstance(total_records, int):
         total_records = 0
@@ -121,97 +292,301 @@ def get_download_queue_size() -> int:
 
     return total_records
 
+def get_download_queue_size() -> int:
+    """
+    GET /api/v3/queue
+    Returns total number of items in the queue with the status 'downloading' (0 on failure).
+    """
+    total_records = sample_download_queue_size()
+    return total_records if total_records is not None else 0
+
+# Commands that search indexers and can add to the download queue
+SEARCH_COMMANDS = {"EpisodeSearch", "SeasonSearch", "SeriesSearch", "MissingEpisodeSearch", "CutoffUnmetEpisodeSearch"}
+
+def get_pending_search_count() -> Optional[int]:
+    """
+    GET /api/v3/command
+    Returns the number of search commands that are queued or still running in Sonarr,
+    or None if Sonarr couldn't be asked.
+    """
+    commands = sonarr_request("command")
+    if not isinstance(commands, list):
+        return None
+    return sum(
+        1 for command in commands
+        if isinstance(command, dict) and command.get("name") in SEARCH_COMMANDS
+        and str(command.get("status", "")).lower() in ("queued", "started")
+    )
+
+# Holds searches back while the download queue is above DOWNLOAD_QUEUE_HIGH_WATER
+download_throttle = DownloadThrottle(
+    sample_download_queue_size,
+    high_water=DOWNLOAD_QUEUE_HIGH_WATER,
+    low_water=DOWNLOAD_QUEUE_LOW_WATER,
+    sample_interval=DOWNLOAD_QUEUE_SAMPLE_SECONDS,
+    sample_commands=get_pending_search_count if DOWNLOAD_QUEUE_COUNT_COMMANDS else None
+)
+
+# Records per page when paging through wanted/cutoff and wanted/missing
+CUTOFF_PAGE_SIZE = 200
+MISSING_PAGE_SIZE = 250
+
+def wanted_endpoint(kind: str, page: int, page_size: int, descending: bool = True) -> str:
+    """Build the endpoint for one page of wanted/cutoff or wanted/missing (`kind` is 'cutoff' or 'missing')."""
+    return (
+        f"wanted/{kind}?"
+        f"sortKey=airDateUtc&sortDirection={'descending' if descending else 'ascending'}&includeSeriesInformation=true"
+        f"&page={page}&pageSize={page_size}"
+    )
+
+def fetch_wanted_page(kind: str, page: int, page_size: int, descending: bool = True) -> Optional[Dict]:
+    """Fetch one (projected) page of wanted/cutoff or wanted/missing."""
+    return sonarr_request(wanted_endpoint(kind, page, page_size, descending), method="GET", projected=True)
+
 def get_cutoff_unmet(page: int = 1) -> Optional[Dict]:
     """
     GET /api/v3/wanted/cutoff?sortKey=airDateUtc&sortDirection=descending&includeSeriesInformation=true
         &page=<page>&pageSize=200
     Returns JSON with a "records" array and "totalRecords".
+    With WANTED_DELTA_SYNC, pages are served from the cutoff page cache while the list is unchanged.
     """
-    endpoint = (
-        "wanted/cutoff?"
-        "sortKey=airDateUtc&sortDirection=descending&includeSeriesInformation=true"
-        f"&page={page}&pageSize=200"
-    )
-    return sonarr_request(endpoint, method="GET")
+    if WANTED_DELTA_SYNC:
+        return cutoff_page_cache.get(page)
+    return fetch_wanted_page("cutoff", page, CUTOFF_PAGE_SIZE)
 
-def get_cutoff_unmet_total_pages() -> int:
+def get_cutoff_unmet_pages(pages: Iterable[int]) -> Dict[int, Optional[Dict]]:
     """
-    To find total pages, call the endpoint with page=1&pageSize=1, read totalRecords,
-    then compute how many pages if each pageSize=200.
+    Fetch several wanted/cutoff pages concurrently.
+    Returns a dict of page number -> page JSON (None if the request failed).
     """
-    response = sonarr_request("wanted/cutoff?page=1&pageSize=1")
-    if not response or "totalRecords" not in response:
-        return 0
-    
-    total_records = response.get("totalRecords", 0)
-    if not isinstance(total_records, int) or total_records < 1:
+    pages = list(dict.fromkeys(pages))
+    results = {}
+    if WANTED_DELTA_SYNC:
+        results = {page: cutoff_page_cache.cached(page) for page in pages}
+        pages = [page for page in pages if results[page] is None]
+    endpoints = [wanted_endpoint("cutoff", page, CUTOFF_PAGE_SIZE) for page in pages]
+    for page, data in zip(pages, sonarr_request_many(endpoints, projected=True)):
+        results[page] = cutoff_page_cache.store(page, data) if WANTED_DELTA_SYNC else data
+    return results
+
+def get_cutoff_unmet_total_records() -> int:
+    """
+    Call the endpoint with page=1&pageSize=1 and read totalRecords (0 on failure).
+    With WANTED_DELTA_SYNC this also validates the cutoff page cache (probing the newest and oldest record).
+    """
+    if WANTED_DELTA_SYNC:
+        total_records = cutoff_page_cache.validate()
+    else:
+        response = sonarr_request("wanted/cutoff?page=1&pageSize=1")
+        if not response or "totalRecords" not in response:
+            return 0
+        total_records = response.get("totalRecords", 0)
+    return total_records if isinstance(total_records, int) and total_records > 0 else 0
+
+def get_cutoff_unmet_total_pages(total_records: Optional[int] = None) -> int:
+    """
+    To find total pages, read totalRecords (see get_cutoff_unmet_total_records, unless
+    already known), then compute how many pages if each pageSize=200.
+    """
+    if total_records is None:
+        total_records = get_cutoff_unmet_total_records()
+    if total_records < 1:
         return 0
     
     # Each page has up to 200 episodes
-    total_pages = (total_records + 200 - 1) // 200
+    total_pages = (total_records + CUTOFF_PAGE_SIZE - 1) // CUTOFF_PAGE_SIZE
     return max(total_pages, 1)
 
+def iter_wanted_pages(kind: str, page_size: int, start_page: int = 1,
+                      prefetch: Optional[int] = None,
+                      cache: Optional[WantedPageCache] = None,
+                      end_page: Optional[int] = None,
+                      total_pages: Optional[int] = None) -> Iterator[Tuple[int, int, Optional[Dict]]]:
+    """
+    Page through wanted/cutoff or wanted/missing (`kind` is 'cutoff' or 'missing').
+    Yields (page, total_pages, page JSON) in page order until the last page (or `end_page`),
+    using totalRecords from the first response. A page that fails to load is yielded as None;
+    if the first one does, paging only goes on when `total_pages` is already known.
+    Up to `prefetch` (default WANTED_PREFETCH_PAGES) following pages are requested in the
+    background while the caller works on the current one, so at most prefetch + 1 pages
+    are held in memory. Pages held by `cache` are served from it, and fetched pages are added to it.
+    """
+    if prefetch is None:
+        prefetch = WANTED_PREFETCH_PAGES
+
+    def fetch(page: int) -> Optional[Dict]:
+        data = cache.cached(page) if cache is not None else None
+        if data is not None:
+            return data
+        data = fetch_wanted_page(kind, page, page_size)
+        return cache.store(page, data) if cache is not None else data
+
+    first = fetch(start_page)
+    if first and "records" in first:
+        total_records = first.get("totalRecords", 0)
+        if not isinstance(total_records, int):
+            total_records = 0
+        total_pages = max((total_records + page_size - 1) // page_size, 1)
+    elif total_pages is None:
+        yield start_page, start_page, None
+        return
+
+    yield start_page, total_pages, first
+    del first
+
+    last_page = min(end_page, total_pages) if end_page is not None else total_pages
+    pending = deque()
+    next_page = start_page + 1
+    while pending or next_page <= last_page:
+        # Keep the prefetch window full
+        while next_page <= last_page and len(pending) <= max(prefetch, 0):
+            pending.append((next_page, executor.submit(fetch, next_page)))
+            next_page += 1
+
+        page, future = pending.popleft()
+        yield page, total_pages, future.result()
+
+def iter_wanted_records(kind: str, page_size: int, prefetch: Optional[int] = None) -> Iterator[Dict]:
+    """Yield every record of wanted/cutoff or wanted/missing, one page at a time."""
+    for page, total_pages, data in iter_wanted_pages(kind, page_size, prefetch=prefetch):
+        if not data:
+            logger.error(f"ERROR: Unable to retrieve wanted/{kind} data from Sonarr on page {page}.")
+            continue
+        yield from data.get("records", [])
+
+# Wanted lists kept between cycles when WANTED_DELTA_SYNC is enabled
+missing_snapshot = WantedSnapshot(
+    "missing", MISSING_PAGE_SIZE,
+    fetch_page=functools.partial(fetch_wanted_page, "missing"),
+    iter_pages=lambda: iter_wanted_pages("missing", MISSING_PAGE_SIZE),
+    full_resync_interval=WANTED_FULL_RESYNC_MINUTES * 60,
+    max_records=WANTED_CACHE_MAX_RECORDS
+)
+cutoff_page_cache = WantedPageCache(
+    "cutoff", CUTOFF_PAGE_SIZE,
+    fetch_page=functools.partial(fetch_wanted_page, "cutoff"),
+    max_age=WANTED_FULL_RESYNC_MINUTES * 60,
+    max_records=WANTED_CACHE_MAX_RECORDS
+)
+
 def get_episodes_for_series(series_id: int) -> Optional[List[Dict]]:
     """Get all episodes for a specific series"""
     return sonarr_request(f"episode?seriesId={series_id}", method="GET")
 
-def get_missing_episodes(pageSize: int = 1000) -> Optional[Dict]:
+def get_missing_pages(pages: Iterable[int], pageSize: int = MISSING_PAGE_SIZE) -> Dict[int, Optional[Dict]]:
     """
-    GET /api/v3/wanted/missing?pageSize=<pageSize>&includeSeriesInformation=true
-    Returns JSON with a "records" array of missing episodes and "totalRecords".
+    Fetch several wanted/missing pages concurrently.
+    Returns a dict of page number -> page JSON (None if the request failed).
     """
-    endpoint = f"wanted/missing?pageSize={pageSize}&includeSeriesInformation=true"
-    return sonarr_request(endpoint, method="GET")
+    pages = list(dict.fromkeys(pages))
+    endpoints = [wanted_endpoint("missing", page, pageSize) for page in pages]
+    return dict(zip(pages, sonarr_request_many(endpoints, projected=True)))
 
-def get_series_with_missing_episodes() -> List[Dict]:
+def attach_series(episodes: List[EpisodeRef], series_by_id: Dict[int, SeriesRef]) -> None:
+    """
+    Link episodes whose series wasn't embedded in their record to a SeriesRef,
+    looking up all of the unknown series in one (cached, concurrent) batch.
+    Episodes whose series can't be found keep series=None.
+    """
+    unknown = [episode.series_id for episode in episodes if episode.series is None]
+    if not unknown:
+        return
+    for series_id, series_data in get_series_by_ids(unknown).items():
+        series_by_id.setdefault(series_id, SeriesRef.from_series(series_data))
+    for episode in episodes:
+        if episode.series is None:
+            episode.series = series_by_id.get(episode.series_id)
+
+def get_series_with_missing_episodes() -> List[SeriesRef]:
     """
     Fetch all shows that have missing episodes using the wanted/missing endpoint.
-    Returns a list of series objects with an additional 'missingEpisodes' field 
-    containing the list of missing episodes for that series.
+    Returns a list of SeriesRef objects whose `episodes` holds the missing episodes for that series.
+    Every page of wanted/missing is read, and episodes are grouped as each page arrives.
     """
-    missing_data = get_missing_episodes()
-    if not missing_data or "records" not in missing_data:
-        return []
-    
-    # Group missing episodes by series ID
-    series_with_missing = {}
-    for episode in missing_data.get("records", []):
-        series_id = episode.get("seriesId")
-        series_title = None
-        
-        # Try to get series info from the episode record
-        if "series" in episode and isinstance(episode["series"], dict):
-            series_info = episode["series"]
-            series_title = series_info.get("title")
-        
-        if series_id not in series_with_missing:
-            # Initialize the series entry if it doesn't exist
-            if series_title:
-                # We have the series info from the episode
-                series_with_missing[series_id] = {
-                    "id": series_id,
-                    "title": series_title,
-                    "monitored": series_info.get("monitored", False),
-                    "missingEpisodes": [episode]
-                }
-            else:
-                # We need to fetch the series info
-                series_info = sonarr_request(f"series/{series_id}", method="GET")
-                if series_info:
-                    series_with_missing[series_id] = {
-                        "id": series_id,
-                        "title": series_info.get("title", "Unknown Show"),
-                        "monitored": series_info.get("monitored", False),
-                        "missingEpisodes": [episode]
-                    }
+    series_by_id: Dict[int, SeriesRef] = {}
+
+    records = None
+    if WANTED_DELTA_SYNC:
+        # Reconcile the local snapshot with Sonarr instead of reading every page again
+        try:
+            records = missing_snapshot.sync()
+        except SnapshotTooLarge as e:
+            logger.info(f"{e} - paging through it instead")
         else:
-            # Add the episode to the existing series entry
-            series_with_missing[series_id]["missingEpisodes"].append(episode)
-    
-    # Convert to list and add count for convenience
-    result = []
-    for series_id, series_data in series_with_missing.items():
-        series_data["missingEpisodeCount"] = len(series_data["missingEpisodes"])
-        result.append(series_data)
+            if records is None:
+                logger.error("ERROR: Unable to retrieve wanted/missing data from Sonarr.")
+                return []
+
+    if records is not None:
+        pages = (
+            (start // MISSING_PAGE_SIZE + 1, 0, {"records": records[start:start + MISSING_PAGE_SIZE]})
+            for start in range(0, len(records), MISSING_PAGE_SIZE)
+        )
+    else:
+        pages = iter_wanted_pages("missing", MISSING_PAGE_SIZE)
+
+    for page, total_pages, missing_data in pages:
+        if not missing_data or "records" not in missing_data:
+            logger.error(f"ERROR: Unable to retrieve wanted/missing data from Sonarr on page {page}.")
+            continue
+
+        logger.debug(f"Grouping {len(missing_data['records'])} missing episodes from page {page} of {total_pages}")
+        episodes = episodes_from_records(missing_data["records"], series_by_id)
+        del missing_data
+
+        # Series not embedded in the records are looked up together, once per page
+        attach_series(episodes, series_by_id)
+
+        # Group missing episodes by series
+        for episode in episodes:
+            if episode.series is not None:
+                episode.series.episodes.append(episode)
     
-    return result
\ No newline at end of file
+    return [series for series in series_by_id.values() if series.episodes]
+
+# Settings that size connection pools, worker threads and caches when this module is
+# loaded; changing them takes effect after a restart
+RESTART_SETTINGS = {"api_max_concurrency", "api_pool_size", "command_max_outstanding", "series_cache_size", "state_backend"}
+
+def apply_settings(snapshot: Settings, changed: Set[str]) -> None:
+    """Apply changed settings to the running API client, without restarting the cycle"""
+    global API_TIMEOUT, API_RETRIES, API_RETRY_BACKOFF, CIRCUIT_BREAKER_COOLDOWN
+    global API_FAST_DECODE, API_DECODE_STATS, WANTED_PREFETCH_PAGES, WANTED_DELTA_SYNC
+    API_TIMEOUT = snapshot.api_timeout
+    API_RETRIES = snapshot.api_retries
+    API_RETRY_BACKOFF = snapshot.api_retry_backoff
+    CIRCUIT_BREAKER_COOLDOWN = snapshot.circuit_breaker_cooldown
+    API_FAST_DECODE = snapshot.api_fast_decode
+    API_DECODE_STATS = snapshot.api_decode_stats
+    WANTED_PREFETCH_PAGES = snapshot.wanted_prefetch_pages
+
+    if "wanted_delta_sync" in changed:
+        # The snapshot and cached pages weren't kept up to date while delta sync was off
+        missing_snapshot.invalidate()
+        cutoff_page_cache.invalidate()
+        WANTED_DELTA_SYNC = snapshot.wanted_delta_sync
+
+    circuit_breaker.failure_threshold = max(snapshot.circuit_breaker_threshold, 1)
+    circuit_breaker.cooldown = snapshot.circuit_breaker_cooldown
+    rate_limiter.rate = snapshot.api_rate_limit
+    rate_limiter.capacity = max(snapshot.api_rate_limit, 1)
+    command_tracker.poll_interval = max(snapshot.command_wait_delay, 0.1)
+    command_tracker.max_attempts = max(snapshot.command_wait_attempts, 1)
+    series_cache.ttl = snapshot.series_cache_ttl
+    series_refresh_registry.freshness_window = snapshot.series_refresh_freshness_minutes * 60
+    missing_snapshot.full_resync_interval = snapshot.wanted_full_resync_minutes * 60
+    cutoff_page_cache.max_age = snapshot.wanted_full_resync_minutes * 60
+    missing_snapshot.max_records = snapshot.wanted_cache_max_records
+    cutoff_page_cache.max_records = snapshot.wanted_cache_max_records
+    download_throttle.configure(
+        snapshot.download_queue_high_water,
+        snapshot.download_queue_low_water,
+        snapshot.download_queue_sample_seconds,
+        get_pending_search_count if snapshot.download_queue_count_commands else None
+    )
+
+    needs_restart = changed & RESTART_SETTINGS
+    if needs_restart:
+        logger.warning(f"Changed settings {', '.join(sorted(needs_restart))} take effect after a restart")
+
+settings.subscribe(apply_settings)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Processed-ID set benchmark for Huntarr-Sonarr
+Compares memory, load time and lookup time of the processed ID representations:
+the original list from load_processed_ids(), the resident text index and the bitmap file
+
+Usage:
+    python benchmarks/bench_processed_ids.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = pathlib.Path(__file__).resolve().parent
+REPO_DIR = BENCHMARK_DIR.parent
+
+def load_processed_ids_list(file_path: pathlib.Path):
+    """The original load_processed_ids(): a list of ints, scanned linearly by `in`."""
+    with open(file_path, 'r') as f:
+        return [int(line.strip()) for line in f if line.strip().isdigit()]
+
+def measure_load(load):
+    """Load a structure, returning it with the time taken and the Python memory it holds."""
+    # Timed without tracemalloc, which slows allocation down considerably
+    started = time.perf_counter()
+    loaded = load()
+    elapsed = time.perf_counter() - started
+    del loaded
+    tracemalloc.start()
+    loaded = load()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded, elapsed, current
+
+def measure_lookups(contains, queries) -> float:
+    """Average seconds per membership check."""
+    started = time.perf_counter()
+    for obj_id in queries:
+        contains(obj_id)
+    return (time.perf_counter() - started) / len(queries)
+
+def run(size: int, lookups: int, list_lookups: int, work_dir: pathlib.Path):
+    from state_store import ProcessedIndex, BitmapStateStore
+
+    # Sonarr episode IDs are dense: take most IDs of a contiguous range
+    rng = random.Random(size)
+    id_range = int(size * 1.25)
+    ids = rng.sample(range(1, id_range + 1), size)
+    searched_at = time.time()
+    queries = [rng.randint(1, id_range) for _ in range(lookups)]
+
+    text_path = work_dir / f"ids_{size}.txt"
+    text_path.write_text("".join(f"{obj_id}\n" for obj_id in ids))
+    log_path = work_dir / f"ids_{size}.log"
+    log_path.write_text("".join(f"{obj_id}\t{searched_at:.0f}\n" for obj_id in ids))
+    bitmap_path = work_dir / f"ids_{size}.bin"
+    BitmapStateStore({"upgrade": bitmap_path}, bucket_seconds=3600)._write("upgrade", dict.fromkeys(ids, searched_at))
+
+    results = []
+
+    processed_list, load_time, memory = measure_load(lambda: load_processed_ids_list(text_path))
+    lookup_time = measure_lookups(processed_list.__contains__, queries[:list_lookups])
+    results.append(("list (load_processed_ids)", text_path.stat().st_size, memory, load_time, lookup_time))
+    del processed_list
+
+    index, load_time, memory = measure_load(lambda: ProcessedIndex(log_path))
+    lookup_time = measure_lookups(index.__contains__, queries)
+    results.append(("resident index (text)", log_path.stat().st_size, memory, load_time, lookup_time))
+    del index
+
+    # The mapped file lives in the page cache, not the Python heap: see "on disk" for its size
+    store, load_time, memory = measure_load(lambda: BitmapStateStore({"upgrade": bitmap_path}, bucket_seconds=3600))
+    view = store._views["upgrade"]
+    lookup_time = measure_lookups(view.__contains__, queries)
+    results.append(("bitmap + Bloom (mmap)", bitmap_path.stat().st_size, memory, load_time, lookup_time))
+
+    # Every answer must match the set of IDs
+    expected = set(ids)
+    mismatches = sum((obj_id in view) != (obj_id in expected) for obj_id in queries)
+    if mismatches:
+        raise AssertionError(f"bitmap lookups disagree with the ID set for {mismatches} queries")
+    del view, store
+
+    return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark processed-ID set representations.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=20000, help="membership checks per representation")
+    parser.add_argument("--list-lookups", type=int, default=200, help="membership checks on the (slow) list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="huntarr-ids-") as work_dir:
+        # Keep settings written on import away from /config
+        os.environ["CONFIG_DIR"] = work_dir
+        sys.path.insert(0, str(REPO_DIR))
+
+        print(f"{'IDs':>9}  {'representation':<26} {'on disk':>10} {'memory':>10} {'load':>9} {'lookup':>10}")
+        for size in args.sizes:
+            for name, disk, memory, load_time, lookup_time in run(size, args.lookups, args.list_lookups, pathlib.Path(work_dir)):
+                print(f"{size:>9}  {name:<26} {disk / 1024:>8.0f}KB {memory / 1024:>8.0f}KB "
+                      f"{load_time * 1000:>7.1f}ms {lookup_time * 1e6:>8.2f}us")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Fake Sonarr v3 server for Huntarr-Sonarr benchmarks
+Serves a synthetic library of configurable size locally, with no network access needed
+
+Usage:
+    python benchmarks/fake_sonarr.py --series 10000 --episodes 1000000 --latency 0.02
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import re
+import threading
+import time
+from array import array
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+# How long finished commands stay in the GET /command list, like Sonarr's command history
+FINISHED_COMMAND_RETENTION = 300
+
+class SyntheticLibrary:
+    """
+    A deterministic Sonarr library generated on demand.
+
+    Episode IDs run from 1 to `episodes` and are spread round-robin over the series.
+    Air dates increase with the episode ID, and the newest `future_rate` of episodes
+    air in the future. Which episodes are missing or below cutoff is derived from a
+    hash of the ID, so only the ID lists of wanted episodes are held in memory.
+    """
+
+    def __init__(self, series: int, episodes: int, missing_rate: float, cutoff_rate: float,
+                 future_rate: float = 0.01):
+        self.series_count = max(series, 1)
+        self.episode_count = max(episodes, 1)
+        self.future_rate = future_rate
+        self.today = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        missing_per_mille = int(missing_rate * 1000)
+        cutoff_per_mille = int(cutoff_rate * 1000)
+        self.missing_ids = array("l")
+        self.cutoff_ids = array("l")
+        for episode_id in range(1, self.episode_count + 1):
+            if (episode_id * 2654435761) % 1000 < missing_per_mille:
+                self.missing_ids.append(episode_id)
+            elif (episode_id * 40503) % 1000 < cutoff_per_mille:
+                self.cutoff_ids.append(episode_id)
+
+    def series(self, series_id: int) -> Optional[Dict]:
+        if not 1 <= series_id <= self.series_count:
+            return None
+        episodes_per_series = max(self.episode_count // self.series_count, 1)
+        season_count = max(episodes_per_series // 20, 1)
+        return {
+            "id": series_id,
+            "title": f"Synthetic Show {series_id}",
+            "sortTitle": f"synthetic show {series_id}",
+            "status": "continuing" if series_id % 3 else "ended",
+            "overview": "A synthetic series generated for benchmarking. " * 6,
+            "network": "Benchmark Network",
+            "airTime": "21:00",
+            "images": [
+                {"coverType": cover, "url": f"/MediaCover/{series_id}/{cover}.jpg",
+                 "remoteUrl": f"https://artworks.example/{series_id}/{cover}.jpg"}
+                for cover in ("banner", "poster", "fanart")
+            ],
+            "seasons": [
+                {"seasonNumber": season, "monitored": True,
+                 "statistics": {"episodeFileCount": 20, "episodeCount": 20, "totalEpisodeCount": 20,
+                                "sizeOnDisk": 20 * 1500000000, "percentOfEpisodes": 100.0}}
+                for season in range(1, season_count + 1)
+            ],
+            "year": 2000 + series_id % 25,
+            "path": f"/tv/Synthetic Show {series_id}",
+            "qualityProfileId": 1,
+            "languageProfileId": 1,
+            "seasonFolder": True,
+            "monitored": series_id % 13 != 0,
+            "useSceneNumbering": False,
+            "runtime": 45,
+            "tvdbId": 100000 + series_id,
+            "tvRageId": 0,
+            "tvMazeId": 0,
+            "seriesType": "standard",
+            "cleanTitle": f"syntheticshow{series_id}",
+            "titleSlug": f"synthetic-show-{series_id}",
+            "genres": ["Drama", "Benchmark"],
+            "tags": [],
+            "added": "2020-01-01T00:00:00Z",
+            "ratings": {"votes": 100, "value": 8.0},
+            "statistics": {"seasonCount": season_count, "episodeFileCount": episodes_per_series,
+                           "episodeCount": episodes_per_series, "totalEpisodeCount": episodes_per_series,
+                           "sizeOnDisk": episodes_per_series * 1500000000, "percentOfEpisodes": 100.0}
+        }
+
+    def episode(self, episode_id: int, include_series: bool = False) -> Dict:
+        series_id = (episode_id - 1) % self.series_count + 1
+        index = (episode_id - 1) // self.series_count
+        # Spread air dates over ~25 years, with the newest future_rate of episodes still to air
+        days = (episode_id - self.episode_count * (1 - self.future_rate)) * 9000 / self.episode_count
+        air_date = self.today + datetime.timedelta(days=days)
+        record = {
+            "seriesId": series_id,
+            "tvdbId": 5000000 + episode_id,
+            "episodeFileId": 0,
+            "seasonNumber": index // 20 + 1,
+            "episodeNumber": index % 20 + 1,
+            "title": f"Episode {index + 1}",
+            "airDate": air_date.strftime("%Y-%m-%d"),
+            "airDateUtc": air_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "overview": "A synthetic episode generated for benchmarking.",
+            "hasFile": False,
+            "monitored": episode_id % 17 != 0,
+            "unverifiedSceneNumbering": False,
+            "id": episode_id
+        }
+        if include_series:
+            record["series"] = self.series(series_id)
+        return record
+
+    def wanted_page(self, ids: array, page: int, page_size: int, descending: bool, include_series: bool) -> Dict:
+        total = len(ids)
+        start = (page - 1) * page_size
+        if descending:
+            # Newest air date (highest ID) first
+            indexes = range(total - 1 - start, max(total - 1 - start - page_size, -1), -1)
+        else:
+            indexes = range(start, min(start + page_size, total))
+        return {
+            "page": page,
+            "pageSize": page_size,
+            "sortKey": "airDateUtc",
+            "sortDirection": "descending" if descending else "ascending",
+            "totalRecords": total,
+            "records": [self.episode(ids[index], include_series) for index in indexes if 0 <= index < total]
+        }
+
+class FakeSonarr:
+    """Request counters, queued commands and queue state shared by all request handlers."""
+
+    def __init__(self, library: SyntheticLibrary, latency: float, command_duration: float, queue_size: int):
+        self.library = library
+        self.latency = latency
+        self.command_duration = command_duration
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.command_ids = itertools.count(1)
+        self.commands: Dict[int, Dict] = {}
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats = {"requests": 0, "bytes_sent": 0, "bytes_received": 0, "endpoints": {}, "commands": {}}
+
+    def count(self, method: str, path: str, bytes_sent: int, bytes_received: int) -> None:
+        key = f"{method} " + re.sub(r"/\d+", "/{id}", path)
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_sent"] += bytes_sent
+            self.stats["bytes_received"] += bytes_received
+            endpoint = self.stats["endpoints"].setdefault(key, {"requests": 0, "bytes_sent": 0})
+            endpoint["requests"] += 1
+            endpoint["bytes_sent"] += bytes_sent
+
+    def command_status(self, command: Dict) -> Dict:
+        elapsed = time.time() - command["started"]
+        status = "completed" if elapsed >= self.command_duration else "started"
+        return dict(command["body"], id=command["id"], name=command["name"], status=status)
+
+    def start_command(self, body: Dict) -> Dict:
+        with self.lock:
+            command_id = next(self.command_ids)
+            command = {"id": command_id, "name": body.get("name"), "body": body, "started": time.time()}
+            self.commands[command_id] = command
+            self.stats["commands"][command["name"]] = self.stats["commands"].get(command["name"], 0) + 1
+        return self.command_status(command)
+
+    def visible_commands(self) -> List[Dict]:
+        now = time.time()
+        with self.lock:
+            for command_id, command in list(self.commands.items()):
+                if now - command["started"] > self.command_duration + FINISHED_COMMAND_RETENTION:
+                    del self.commands[command_id]
+            commands = list(self.commands.values())
+        return [self.command_status(command) for command in commands]
+
+def make_handler(sonarr: FakeSonarr):
+    library = sonarr.library
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, payload, path: str, bytes_received: int = 0) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            if path.startswith("/api/"):
+                sonarr.count(self.command, path[len("/api/v3"):], len(body), bytes_received)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            path = url.path
+
+            if path == "/stats":
+                with sonarr.lock:
+                    return self.send_json(200, sonarr.stats, path)
+
+            if sonarr.latency > 0:
+                time.sleep(sonarr.latency)
+
+            resource = path[len("/api/v3/"):] if path.startswith("/api/v3/") else None
+            if resource is None:
+                return self.send_json(404, {"message": "Not Found"}, path)
+
+            if resource == "series":
+                series = [library.series(series_id) for series_id in range(1, library.series_count + 1)]
+                return self.send_json(200, series, path)
+
+            match = re.fullmatch(r"series/(\d+)", resource)
+            if match:
+                series = library.series(int(match.group(1)))
+                return self.send_json(200 if series else 404, series or {"message": "NotFound"}, path)
+
+            if resource == "episode":
+                series_id = int(query.get("seriesId", 0))
+                episodes = [
+                    library.episode(episode_id)
+                    for episode_id in range(series_id, library.episode_count + 1, library.series_count)
+                ] if 1 <= series_id <= library.series_count else []
+                return self.send_json(200, episodes, path)
+
+            if resource in ("wanted/missing", "wanted/cutoff"):
+                ids = library.missing_ids if resource == "wanted/missing" else library.cutoff_ids
+                page = max(int(query.get("page", 1)), 1)
+                page_size = max(int(query.get("pageSize", 10)), 1)
+                descending = query.get("sortDirection", "descending") == "descending"
+                include_series = query.get("includeSeriesInformation", "false").lower() == "true"
+                return self.send_json(200, library.wanted_page(ids, page, page_size, descending, include_series), path)
+
+            if resource == "queue":
+                return self.send_json(200, {"page": 1, "pageSize": 10, "totalRecords": sonarr.queue_size, "records": []}, path)
+
+            if resource == "command":
+                return self.send_json(200, sonarr.visible_commands(), path)
+
+            match = re.fullmatch(r"command/(\d+)", resource)
+            if match:
+                with sonarr.lock:
+                    command = sonarr.commands.get(int(match.group(1)))
+                if command is None:
+                    return self.send_json(404, {"message": "NotFound"}, path)
+                return self.send_json(200, sonarr.command_status(command), path)
+
+            return self.send_json(404, {"message": "Not Found"}, path)
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length else b""
+
+            if path == "/stats/reset":
+                sonarr.reset_stats()
+                return self.send_json(200, {}, path)
+
+            if sonarr.latency > 0:
+                time.sleep(sonarr.latency)
+
+            if path == "/api/v3/command":
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    return self.send_json(400, {"message": "Invalid JSON"}, path, len(raw))
+                return self.send_json(201, sonarr.start_command(body), path, len(raw))
+
+            return self.send_json(404, {"message": "Not Found"}, path, len(raw))
+
+    return Handler
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serve a synthetic Sonarr v3 library for benchmarking.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8989)
+    parser.add_argument("--series", type=int, default=1000, help="number of series")
+    parser.add_argument("--episodes", type=int, default=100000, help="number of episodes")
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="fraction of episodes that are missing")
+    parser.add_argument("--cutoff-rate", type=float, default=0.10, help="fraction of episodes below quality cutoff")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API response")
+    parser.add_argument("--command-duration", type=float, default=2.0, help="seconds until a command completes")
+    parser.add_argument("--queue-size", type=int, default=0, help="downloading items reported by the queue")
+    return parser
+
+def create_from_args(args) -> FakeSonarr:
+    library = SyntheticLibrary(args.series, args.episodes, args.missing_rate, args.cutoff_rate)
+    return FakeSonarr(library, args.latency, args.command_duration, args.queue_size)
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sonarr = create_from_args(args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(sonarr))
+    server.daemon_threads = True
+    print(f"Fake Sonarr serving {args.series} series / {args.episodes} episodes "
+          f"({len(sonarr.library.missing_ids)} missing, {len(sonarr.library.cutoff_ids)} cutoff unmet) "
+          f"on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+End-to-end cycle benchmark for Huntarr-Sonarr
+Runs the missing and upgrade processing against a local fake Sonarr and reports
+requests issued, bytes transferred, wall time and peak RSS
+
+Usage:
+    python benchmarks/run_benchmark.py --series 10000 --episodes 1000000 --latency 0.02
+"""
+
+import argparse
+import json
+import logging
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCHMARK_DIR = pathlib.Path(__file__).resolve().parent
+REPO_DIR = BENCHMARK_DIR.parent
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark one hunt cycle against a local fake Sonarr.")
+    parser.add_argument("--port", type=int, default=18989)
+    parser.add_argument("--series", type=int, default=1000, help="number of series")
+    parser.add_argument("--episodes", type=int, default=100000, help="number of episodes")
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="fraction of episodes that are missing")
+    parser.add_argument("--cutoff-rate", type=float, default=0.10, help="fraction of episodes below quality cutoff")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API response")
+    parser.add_argument("--command-duration", type=float, default=0.5, help="seconds until a command completes")
+    parser.add_argument("--hunt-missing-shows", type=int, default=5)
+    parser.add_argument("--hunt-upgrade-episodes", type=int, default=20)
+    parser.add_argument("--sequential", action="store_true", help="use sequential instead of random selection")
+    parser.add_argument("--skip-series-refresh", action="store_true")
+    parser.add_argument("--state-backend", choices=("sqlite", "text", "bitmap"), default="sqlite")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    return parser
+
+def fetch_stats(base_url: str, reset: bool = False) -> dict:
+    request = urllib.request.Request(f"{base_url}/stats/reset" if reset else f"{base_url}/stats",
+                                     data=b"" if reset else None)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+def start_fake_sonarr(args) -> subprocess.Popen:
+    command = [
+        sys.executable, str(BENCHMARK_DIR / "fake_sonarr.py"),
+        "--port", str(args.port),
+        "--series", str(args.series),
+        "--episodes", str(args.episodes),
+        "--missing-rate", str(args.missing_rate),
+        "--cutoff-rate", str(args.cutoff_rate),
+        "--latency", str(args.latency),
+        "--command-duration", str(args.command_duration)
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    # The server prints one line once the library is built and it is listening
+    print(server.stdout.readline().strip(), file=sys.stderr)
+    return server
+
+def configure(args, config_dir: str) -> None:
+    """Point Huntarr at the fake Sonarr and a throwaway config directory, then write the settings."""
+    os.environ["CONFIG_DIR"] = config_dir
+    os.environ["API_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ["API_KEY"] = "benchmark"
+    sys.path.insert(0, str(REPO_DIR))
+
+    import settings_manager
+    settings_manager.update_setting("huntarr", "hunt_missing_shows", args.hunt_missing_shows)
+    settings_manager.update_setting("huntarr", "hunt_upgrade_episodes", args.hunt_upgrade_episodes)
+    settings_manager.update_setting("huntarr", "random_selection", not args.sequential)
+    settings_manager.update_setting("huntarr", "skip_series_refresh", args.skip_series_refresh)
+    settings_manager.update_setting("advanced", "random_missing", not args.sequential)
+    settings_manager.update_setting("advanced", "random_upgrades", not args.sequential)
+    settings_manager.update_setting("advanced", "command_wait_delay", 1)
+    settings_manager.update_setting("advanced", "state_backend", args.state_backend)
+    # The fake Sonarr is local; don't let rate limiting dominate the measurement
+    settings_manager.update_setting("advanced", "api_rate_limit", 0)
+
+def run_phase(name: str, func, base_url: str) -> dict:
+    fetch_stats(base_url, reset=True)
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    stats = fetch_stats(base_url)
+    return {
+        "phase": name,
+        "result": result,
+        "wall_time": round(elapsed, 3),
+        "requests": stats["requests"],
+        "bytes_received": stats["bytes_sent"],
+        "bytes_sent": stats["bytes_received"],
+        "endpoints": stats["endpoints"],
+        "commands": stats["commands"],
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+def print_report(phases) -> None:
+    for phase in phases:
+        print(f"{phase['phase']}: {phase['wall_time']:.2f}s wall, {phase['requests']} requests, "
+              f"{phase['bytes_received'] / 1024:.1f} KiB received, {phase['bytes_sent'] / 1024:.1f} KiB sent, "
+              f"peak RSS {phase['peak_rss_kib'] / 1024:.1f} MiB (result: {phase['result']})")
+        for endpoint, stats in sorted(phase["endpoints"].items()):
+            print(f"    {endpoint}: {stats['requests']} requests, {stats['bytes_sent'] / 1024:.1f} KiB")
+        for name, count in sorted(phase["commands"].items()):
+            print(f"    command {name}: {count}")
+
+def main() -> int:
+    args = build_parser().parse_args()
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_fake_sonarr(args)
+    try:
+        with tempfile.TemporaryDirectory(prefix="huntarr-benchmark-") as config_dir:
+            logging.disable(logging.CRITICAL)
+            configure(args, config_dir)
+
+            from api import warm_series_cache
+            from missing import process_missing_episodes
+            from upgrade import process_cutoff_upgrades
+
+            phases = [
+                run_phase("warm_series_cache", warm_series_cache, base_url),
+                run_phase("process_missing_episodes", process_missing_episodes, base_url),
+                run_phase("process_cutoff_upgrades", process_cutoff_upgrades, base_url)
+            ]
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(phases, indent=2))
+    else:
+        print_report(phases)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
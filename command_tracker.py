@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Command tracking for Huntarr-Sonarr
+Polls Sonarr's command list once per tick for every command still in flight
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Union
+from utils.logger import logger
+
+# Statuses Sonarr reports for commands that are no longer running
+COMPLETED_STATUSES = {"complete", "completed"}
+FAILED_STATUSES = {"failed", "aborted", "cancelled", "orphaned"}
+
+class CommandTracker:
+    """
+    Tracks in-flight Sonarr commands and resolves a Future for each one when it finishes.
+
+    A single background thread polls GET /api/v3/command every `poll_interval` seconds
+    and updates all tracked commands from that one response. Commands missing from the
+    list (Sonarr only keeps recent ones) are looked up individually via command/<id>.
+    Each Future resolves to True if the command completed, False otherwise.
+    """
+
+    def __init__(self, request: Callable[[str], Optional[Union[Dict, List]]],
+                 poll_interval: float = 1, max_attempts: int = 600, max_outstanding: int = 10):
+        self._request = request
+        self.poll_interval = max(poll_interval, 0.1)
+        self.max_attempts = max(max_attempts, 1)
+        self._slots = threading.BoundedSemaphore(max(max_outstanding, 1))
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire_slot(self) -> None:
+        """Block until fewer than `max_outstanding` commands are in flight."""
+        self._slots.acquire()
+
+    def release_slot(self) -> None:
+        """Give back a slot taken with acquire_slot() for a command that was never started."""
+        self._slots.release()
+
+    def track(self, command_id: int, slot_acquired: bool = False) -> Future:
+        """Start tracking a command and return a Future for its completion."""
+        future = Future()
+        with self._lock:
+            self._pending[command_id] = {
+                "future": future,
+                "attempts": 0,
+                "slot": slot_acquired
+            }
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="command-tracker", daemon=True)
+                self._thread.start()
+        return future
+
+    def outstanding(self) -> int:
+        """Number of commands currently being tracked."""
+        with self._lock:
+            return len(self._pending)
+
+    def _resolve(self, command_id: int, result: bool) -> None:
+        with self._lock:
+            entry = self._pending.pop(command_id, None)
+        if entry is None:
+            return
+        if entry["slot"]:
+            self._slots.release()
+        entry["future"].set_result(result)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                command_ids = list(self._pending)
+
+            try:
+                self._poll(command_ids)
+            except Exception as error:
+                logger.error(f"Error polling command statuses: {error}")
+
+    def _poll(self, command_ids: List[int]) -> None:
+        # One request for every command Sonarr still knows about
+        wanted = set(command_ids)
+        statuses = {}
+        command_list = self._request("command")
+        if isinstance(command_list, list):
+            for command in command_list:
+                if isinstance(command, dict) and command.get("id") in wanted:
+                    statuses[command["id"]] = str(command.get("status", "")).lower()
+
+        for command_id in command_ids:
+            status = statuses.get(command_id)
+            if status is None:
+                # Not in the list - fall back to asking for this command directly
+                response = self._request(f"command/{command_id}")
+                if isinstance(response, dict):
+                    status = str(response.get("status", "")).lower()
+
+            logger.debug(f"Command {command_id} Status: {status}")
+
+            if status in COMPLETED_STATUSES:
+                self._resolve(command_id, True)
+                continue
+            if status in FAILED_STATUSES:
+                logger.warning(f"Command {command_id} finished with status '{status}'.")
+                self._resolve(command_id, False)
+                continue
+
+            with self._lock:
+                entry = self._pending.get(command_id)
+                if entry is None:
+                    continue
+                entry["attempts"] += 1
+                timed_out = entry["attempts"] >= self.max_attempts
+            if timed_out:
+                logger.warning(f"Command {command_id} did not complete within the allowed attempts.")
+                self._resolve(command_id, False)
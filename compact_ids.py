@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Compact ID sets for Huntarr-Sonarr
+Roaring-style bitmaps and a Bloom filter that are queried in place from a memory-mapped file
+"""
+
+import bisect
+import struct
+from array import array
+from typing import Iterable, Iterator, List, Tuple
+
+# IDs are split into a 16-bit container key and a 16-bit low part, as in Roaring bitmaps.
+# A container holding more than ARRAY_MAX_SIZE values is stored as a 65536-bit bitmap,
+# otherwise as a sorted array of 16-bit values - whichever is smaller.
+ARRAY_MAX_SIZE = 4096
+BITMAP_CONTAINER_BYTES = 8192
+
+ARRAY_CONTAINER = 0
+BITMAP_CONTAINER = 1
+
+# Serialized bitmap: container count, then per container (key, type, cardinality, offset),
+# then the container data. Offsets are relative to the start of the bitmap.
+BITMAP_HEADER = struct.Struct("<I")
+CONTAINER_ENTRY = struct.Struct("<IBxxxII")
+
+def _containers(sorted_ids: Iterable[int]) -> Iterator[Tuple[int, List[int]]]:
+    key, values = None, []
+    for obj_id in sorted_ids:
+        high = obj_id >> 16
+        if high != key:
+            if values:
+                yield key, values
+            key, values = high, []
+        values.append(obj_id & 0xFFFF)
+    if values:
+        yield key, values
+
+def serialize_bitmap(ids: Iterable[int]) -> bytes:
+    """Serialize a set of non-negative 32-bit IDs as a roaring-style bitmap."""
+    entries = []
+    payloads = []
+    offset = 0
+    containers = list(_containers(sorted(set(ids))))
+    data_start = BITMAP_HEADER.size + CONTAINER_ENTRY.size * len(containers)
+    for key, values in containers:
+        if len(values) > ARRAY_MAX_SIZE:
+            bits = bytearray(BITMAP_CONTAINER_BYTES)
+            for value in values:
+                bits[value >> 3] |= 1 << (value & 7)
+            payload, kind = bytes(bits), BITMAP_CONTAINER
+        else:
+            payload, kind = array("H", values).tobytes(), ARRAY_CONTAINER
+        entries.append(CONTAINER_ENTRY.pack(key, kind, len(values), data_start + offset))
+        payloads.append(payload)
+        offset += len(payload)
+    return BITMAP_HEADER.pack(len(containers)) + b"".join(entries) + b"".join(payloads)
+
+class BitmapView:
+    """Read-only lookups on a serialized bitmap inside a buffer (e.g. an mmap), without decoding it."""
+
+    def __init__(self, buffer, start: int = 0):
+        self._buffer = buffer
+        self._start = start
+        (self._count,) = BITMAP_HEADER.unpack_from(buffer, start)
+        self._keys = [
+            CONTAINER_ENTRY.unpack_from(buffer, start + BITMAP_HEADER.size + index * CONTAINER_ENTRY.size)[0]
+            for index in range(self._count)
+        ]
+
+    def _entry(self, index: int) -> Tuple[int, int, int, int]:
+        return CONTAINER_ENTRY.unpack_from(self._buffer, self._start + BITMAP_HEADER.size + index * CONTAINER_ENTRY.size)
+
+    def __contains__(self, obj_id: int) -> bool:
+        high, low = obj_id >> 16, obj_id & 0xFFFF
+        index = bisect.bisect_left(self._keys, high)
+        if index == len(self._keys) or self._keys[index] != high:
+            return False
+        _, kind, cardinality, offset = self._entry(index)
+        position = self._start + offset
+        if kind == BITMAP_CONTAINER:
+            return bool(self._buffer[position + (low >> 3)] & (1 << (low & 7)))
+        values = memoryview(self._buffer)[position:position + 2 * cardinality].cast("H")
+        try:
+            found = bisect.bisect_left(values, low)
+            return found < cardinality and values[found] == low
+        finally:
+            values.release()
+
+    def __iter__(self) -> Iterator[int]:
+        for index in range(self._count):
+            key, kind, cardinality, offset = self._entry(index)
+            position = self._start + offset
+            base = key << 16
+            if kind == BITMAP_CONTAINER:
+                bits = self._buffer[position:position + BITMAP_CONTAINER_BYTES]
+                for byte_index, byte in enumerate(bits):
+                    while byte:
+                        lowest = byte & -byte
+                        yield base | (byte_index << 3) | (lowest.bit_length() - 1)
+                        byte ^= lowest
+            else:
+                yield from (base | value for value in array("H", self._buffer[position:position + 2 * cardinality]))
+
+    def cardinality(self) -> int:
+        return sum(self._entry(index)[2] for index in range(self._count))
+
+class BloomFilter:
+    """
+    A Bloom filter over integer IDs. Built with for_capacity(n) it has roughly 1%
+    false positives for up to n IDs. Can be built in memory, serialized, and queried
+    in place from a buffer.
+    """
+
+    HEADER = struct.Struct("<IB")
+    BITS_PER_ID = 10
+    HASHES = 7
+
+    def __init__(self, num_bits: int, hashes: int = HASHES, bits=None, start: int = 0):
+        self.num_bits = max(num_bits, 8)
+        self.hashes = hashes
+        self._bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self._start = start
+
+    @classmethod
+    def for_capacity(cls, capacity: int) -> "BloomFilter":
+        return cls(max(capacity, 1) * cls.BITS_PER_ID)
+
+    @classmethod
+    def from_buffer(cls, buffer, start: int = 0) -> "BloomFilter":
+        num_bits, hashes = cls.HEADER.unpack_from(buffer, start)
+        return cls(num_bits, hashes, bits=buffer, start=start + cls.HEADER.size)
+
+    def _positions(self, obj_id: int) -> Iterator[int]:
+        # Double hashing from two multiplicative hashes of the ID
+        h1 = (obj_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = ((obj_id ^ (obj_id >> 16)) * 0xC2B2AE3D27D4EB4F) & 0xFFFFFFFFFFFFFFFF | 1
+        for index in range(self.hashes):
+            yield ((h1 + index * h2) >> 11) % self.num_bits
+
+    def add(self, obj_id: int) -> None:
+        for position in self._positions(obj_id):
+            self._bits[self._start + (position >> 3)] |= 1 << (position & 7)
+
+    def __contains__(self, obj_id: int) -> bool:
+        bits, start = self._bits, self._start
+        for position in self._positions(obj_id):
+            if not bits[start + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def capacity(self) -> int:
+        return self.num_bits // self.BITS_PER_ID
+
+    def copy(self) -> "BloomFilter":
+        """An in-memory copy that IDs can be added to."""
+        size = (self.num_bits + 7) // 8
+        return BloomFilter(self.num_bits, self.hashes, bits=bytearray(self._bits[self._start:self._start + size]))
+
+    def serialize(self) -> bytes:
+        size = (self.num_bits + 7) // 8
+        return self.HEADER.pack(self.num_bits, self.hashes) + bytes(self._bits[self._start:self._start + size])
+
+    @classmethod
+    def serialized_size(cls, buffer, start: int = 0) -> int:
+        num_bits, _ = cls.HEADER.unpack_from(buffer, start)
+        return cls.HEADER.size + (max(num_bits, 8) + 7) // 8
+
+# Bucketed ID file: magic, version, bucket count, total IDs, then the Bloom filter over
+# every ID, then per bucket (start time, newest search time, bitmap length, bitmap).
+FILE_MAGIC = b"HSPB"
+FILE_HEADER = struct.Struct("<4sHHI")
+BUCKET_HEADER = struct.Struct("<ddI")
+
+def serialize_buckets(bloom: BloomFilter, total: int, buckets: List[Tuple[float, float, bytes]]) -> bytes:
+    """
+    Serialize (bucket start, newest search time, serialized bitmap) buckets, oldest first,
+    with a Bloom filter over every ID and the number of distinct IDs across all buckets.
+    """
+    parts = [FILE_HEADER.pack(FILE_MAGIC, 1, len(buckets), total), bloom.serialize()]
+    for bucket_start, newest, bitmap in buckets:
+        parts.append(BUCKET_HEADER.pack(bucket_start, newest, len(bitmap)))
+        parts.append(bitmap)
+    return b"".join(parts)
+
+class BucketedIds:
+    """Lookups on a serialized bucket file in a buffer: Bloom filter first, then each bucket's bitmap."""
+
+    def __init__(self, buffer):
+        magic, version, bucket_count, self.total = FILE_HEADER.unpack_from(buffer, 0)
+        if magic != FILE_MAGIC or version != 1:
+            raise ValueError("Not a processed ID bitmap file")
+        position = FILE_HEADER.size
+        self.bloom = BloomFilter.from_buffer(buffer, position)
+        position += BloomFilter.serialized_size(buffer, position)
+        self._buffer = buffer
+        # (bucket start, newest search time, bitmap, offset, length), oldest bucket first
+        self.buckets: List[Tuple[float, float, BitmapView, int, int]] = []
+        for _ in range(bucket_count):
+            bucket_start, newest, length = BUCKET_HEADER.unpack_from(buffer, position)
+            position += BUCKET_HEADER.size
+            self.buckets.append((bucket_start, newest, BitmapView(buffer, position), position, length))
+            position += length
+
+    def __contains__(self, obj_id: int) -> bool:
+        if obj_id not in self.bloom:
+            return False
+        # Recently searched IDs are the most likely to be looked up
+        return any(obj_id in bucket[2] for bucket in reversed(self.buckets))
+
+    def raw_bitmap(self, index: int) -> bytes:
+        """The serialized bitmap of a bucket, for copying it unchanged into a new file."""
+        _, _, _, offset, length = self.buckets[index]
+        return bytes(self._buffer[offset:offset + length])
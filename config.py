@@ -5,12 +5,18 @@ Handles all environment variables and configuration settings
 """
 
 import os
+import dataclasses
 import logging
+import threading
+from typing import Any, Callable, List, Mapping, Optional, Set
 import settings_manager
 
 # Web UI Configuration
 ENABLE_WEB_UI = os.environ.get("ENABLE_WEB_UI", "true").lower() == "true"
 
+# Run the web server as a thread of the hunt process instead of a process of its own (default false)
+SINGLE_PROCESS = os.environ.get("SINGLE_PROCESS", "false").lower() == "true"
+
 # API Configuration
 API_KEY = os.environ.get("API_KEY", "your-api-key")
 API_URL = os.environ.get("API_URL", "http://your-sonarr-address:8989")
@@ -22,6 +28,126 @@ except ValueError:
     API_TIMEOUT = 60
     print(f"Warning: Invalid API_TIMEOUT value, using default: {API_TIMEOUT}")
 
+# Number of times a failed GET request to Sonarr is retried (default 3)
+try:
+    API_RETRIES = int(os.environ.get("API_RETRIES", "3"))
+except ValueError:
+    API_RETRIES = 3
+    print(f"Warning: Invalid API_RETRIES value, using default: {API_RETRIES}")
+
+# Base delay in seconds for exponential backoff between retries (default 1)
+try:
+    API_RETRY_BACKOFF = float(os.environ.get("API_RETRY_BACKOFF", "1"))
+except ValueError:
+    API_RETRY_BACKOFF = 1
+    print(f"Warning: Invalid API_RETRY_BACKOFF value, using default: {API_RETRY_BACKOFF}")
+
+# Consecutive failed requests before API calls are paused (default 5)
+try:
+    CIRCUIT_BREAKER_THRESHOLD = int(os.environ.get("CIRCUIT_BREAKER_THRESHOLD", "5"))
+except ValueError:
+    CIRCUIT_BREAKER_THRESHOLD = 5
+    print(f"Warning: Invalid CIRCUIT_BREAKER_THRESHOLD value, using default: {CIRCUIT_BREAKER_THRESHOLD}")
+
+# Seconds API calls stay paused once the circuit breaker opens (default 300)
+try:
+    CIRCUIT_BREAKER_COOLDOWN = int(os.environ.get("CIRCUIT_BREAKER_COOLDOWN", "300"))
+except ValueError:
+    CIRCUIT_BREAKER_COOLDOWN = 300
+    print(f"Warning: Invalid CIRCUIT_BREAKER_COOLDOWN value, using default: {CIRCUIT_BREAKER_COOLDOWN}")
+
+# Maximum average number of API requests per second, 0 for unlimited (default 20)
+try:
+    API_RATE_LIMIT = float(os.environ.get("API_RATE_LIMIT", "20"))
+except ValueError:
+    API_RATE_LIMIT = 20
+    print(f"Warning: Invalid API_RATE_LIMIT value, using default: {API_RATE_LIMIT}")
+
+# Decode wanted/* responses down to the fields the hunt uses (default true)
+API_FAST_DECODE = os.environ.get("API_FAST_DECODE", "true").lower() == "true"
+
+# Log bytes received and decoded response sizes per endpoint each cycle (default false)
+API_DECODE_STATS = os.environ.get("API_DECODE_STATS", "false").lower() == "true"
+
+# Keep wanted/missing and cutoff results between cycles and only fetch what changed (default false).
+# Changes inside kept records (monitored flags, air dates) are only seen by the next full re-sync.
+WANTED_DELTA_SYNC = os.environ.get("WANTED_DELTA_SYNC", "false").lower() == "true"
+
+# Minutes after which the kept wanted lists are read from Sonarr in full again (default 360)
+try:
+    WANTED_FULL_RESYNC_MINUTES = int(os.environ.get("WANTED_FULL_RESYNC_MINUTES", "360"))
+except ValueError:
+    WANTED_FULL_RESYNC_MINUTES = 360
+    print(f"Warning: Invalid WANTED_FULL_RESYNC_MINUTES value, using default: {WANTED_FULL_RESYNC_MINUTES}")
+
+# Most wanted records kept in memory between cycles; larger lists are paged as usual (default 10000)
+try:
+    WANTED_CACHE_MAX_RECORDS = int(os.environ.get("WANTED_CACHE_MAX_RECORDS", "10000"))
+except ValueError:
+    WANTED_CACHE_MAX_RECORDS = 10000
+    print(f"Warning: Invalid WANTED_CACHE_MAX_RECORDS value, using default: {WANTED_CACHE_MAX_RECORDS}")
+
+# Download queue size at which searches pause mid-cycle (default -1 = no limit),
+# and the size it must drain to before they resume (default -1 = 3/4 of the high-water mark)
+try:
+    DOWNLOAD_QUEUE_HIGH_WATER = int(os.environ.get("DOWNLOAD_QUEUE_HIGH_WATER", "-1"))
+except ValueError:
+    DOWNLOAD_QUEUE_HIGH_WATER = -1
+    print(f"Warning: Invalid DOWNLOAD_QUEUE_HIGH_WATER value, using default: {DOWNLOAD_QUEUE_HIGH_WATER}")
+
+try:
+    DOWNLOAD_QUEUE_LOW_WATER = int(os.environ.get("DOWNLOAD_QUEUE_LOW_WATER", "-1"))
+except ValueError:
+    DOWNLOAD_QUEUE_LOW_WATER = -1
+    print(f"Warning: Invalid DOWNLOAD_QUEUE_LOW_WATER value, using default: {DOWNLOAD_QUEUE_LOW_WATER}")
+
+# Seconds between download queue samples while throttling (default 30)
+try:
+    DOWNLOAD_QUEUE_SAMPLE_SECONDS = int(os.environ.get("DOWNLOAD_QUEUE_SAMPLE_SECONDS", "30"))
+except ValueError:
+    DOWNLOAD_QUEUE_SAMPLE_SECONDS = 30
+    print(f"Warning: Invalid DOWNLOAD_QUEUE_SAMPLE_SECONDS value, using default: {DOWNLOAD_QUEUE_SAMPLE_SECONDS}")
+
+# Count searches still pending in Sonarr as part of the download queue (default false)
+DOWNLOAD_QUEUE_COUNT_COMMANDS = os.environ.get("DOWNLOAD_QUEUE_COUNT_COMMANDS", "false").lower() == "true"
+
+# Worker threads for the refresh and search stages of the hunt pipeline (default 4 each)
+try:
+    PIPELINE_REFRESH_WORKERS = int(os.environ.get("PIPELINE_REFRESH_WORKERS", "4"))
+except ValueError:
+    PIPELINE_REFRESH_WORKERS = 4
+    print(f"Warning: Invalid PIPELINE_REFRESH_WORKERS value, using default: {PIPELINE_REFRESH_WORKERS}")
+
+try:
+    PIPELINE_SEARCH_WORKERS = int(os.environ.get("PIPELINE_SEARCH_WORKERS", "4"))
+except ValueError:
+    PIPELINE_SEARCH_WORKERS = 4
+    print(f"Warning: Invalid PIPELINE_SEARCH_WORKERS value, using default: {PIPELINE_SEARCH_WORKERS}")
+
+# Items each hunt pipeline stage can have waiting in its queue (default 8)
+try:
+    PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "8"))
+except ValueError:
+    PIPELINE_QUEUE_SIZE = 8
+    print(f"Warning: Invalid PIPELINE_QUEUE_SIZE value, using default: {PIPELINE_QUEUE_SIZE}")
+
+# Search the highest-scoring shows and episodes first instead of in list or shuffled order (default false)
+PRIORITY_SCHEDULING = os.environ.get("PRIORITY_SCHEDULING", "false").lower() == "true"
+
+# Weight of the random part of a score when RANDOM_MISSING / RANDOM_UPGRADES are enabled (default 0.2)
+try:
+    PRIORITY_RANDOM_WEIGHT = float(os.environ.get("PRIORITY_RANDOM_WEIGHT", "0.2"))
+except ValueError:
+    PRIORITY_RANDOM_WEIGHT = 0.2
+    print(f"Warning: Invalid PRIORITY_RANDOM_WEIGHT value, using default: {PRIORITY_RANDOM_WEIGHT}")
+
+# Cutoff-unmet pages whose episodes are ranked against each other (default 5)
+try:
+    PRIORITY_UPGRADE_PAGES = int(os.environ.get("PRIORITY_UPGRADE_PAGES", "5"))
+except ValueError:
+    PRIORITY_UPGRADE_PAGES = 5
+    print(f"Warning: Invalid PRIORITY_UPGRADE_PAGES value, using default: {PRIORITY_UPGRADE_PAGES}")
+
 # Settings that can be overridden by the settings manager
 # Load from environment first, will be overridden by settings if they exist
 
@@ -39,6 +165,16 @@ except ValueError:
     HUNT_UPGRADE_EPISODES = 5
     print(f"Warning: Invalid HUNT_UPGRADE_EPISODES value, using default: {HUNT_UPGRADE_EPISODES}")
 
+# Maximum number of episodes searched by a single upgrade EpisodeSearch command (default 10)
+try:
+    UPGRADE_SEARCH_BATCH_SIZE = int(os.environ.get("UPGRADE_SEARCH_BATCH_SIZE", "10"))
+except ValueError:
+    UPGRADE_SEARCH_BATCH_SIZE = 10
+    print(f"Warning: Invalid UPGRADE_SEARCH_BATCH_SIZE value, using default: {UPGRADE_SEARCH_BATCH_SIZE}")
+
+# Only batch upgrade searches for episodes of the same series together (default false)
+UPGRADE_BATCH_BY_SERIES = os.environ.get("UPGRADE_BATCH_BY_SERIES", "false").lower() == "true"
+
 # Sleep duration in seconds after completing one full cycle (default 15 minutes)
 try:
     SLEEP_DURATION = int(os.environ.get("SLEEP_DURATION", "900"))
@@ -53,6 +189,10 @@ except ValueError:
     STATE_RESET_INTERVAL_HOURS = 168
     print(f"Warning: Invalid STATE_RESET_INTERVAL_HOURS value, using default: {STATE_RESET_INTERVAL_HOURS}")
 
+# Where processed IDs are kept: "sqlite" (state.db), "text" (processed_*_ids.txt files)
+# or "bitmap" (compact processed_*_ids.bin files)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "sqlite").lower()
+
 # Selection Settings
 RANDOM_SELECTION = os.environ.get("RANDOM_SELECTION", "true").lower() == "true"
 MONITORED_ONLY = os.environ.get("MONITORED_ONLY", "true").lower() == "true"
@@ -61,6 +201,13 @@ MONITORED_ONLY = os.environ.get("MONITORED_ONLY", "true").lower() == "true"
 SKIP_FUTURE_EPISODES = os.environ.get("SKIP_FUTURE_EPISODES", "true").lower() == "true"
 SKIP_SERIES_REFRESH = os.environ.get("SKIP_SERIES_REFRESH", "false").lower() == "true"
 
+# Minutes after a successful refresh during which a series is not refreshed again (default 60)
+try:
+    SERIES_REFRESH_FRESHNESS_MINUTES = int(os.environ.get("SERIES_REFRESH_FRESHNESS_MINUTES", "60"))
+except ValueError:
+    SERIES_REFRESH_FRESHNESS_MINUTES = 60
+    print(f"Warning: Invalid SERIES_REFRESH_FRESHNESS_MINUTES value, using default: {SERIES_REFRESH_FRESHNESS_MINUTES}")
+
 # Advanced settings - load from environment first, will be overridden by settings if they exist
 try:
     COMMAND_WAIT_DELAY = int(os.environ.get("COMMAND_WAIT_DELAY", "1"))
@@ -75,6 +222,48 @@ except ValueError:
     COMMAND_WAIT_ATTEMPTS = 600
     print(f"Warning: Invalid COMMAND_WAIT_ATTEMPTS value, using default: {COMMAND_WAIT_ATTEMPTS}")
 
+# Maximum number of Sonarr commands (refresh/search) allowed to run at once (default 10)
+try:
+    COMMAND_MAX_OUTSTANDING = int(os.environ.get("COMMAND_MAX_OUTSTANDING", "10"))
+except ValueError:
+    COMMAND_MAX_OUTSTANDING = 10
+    print(f"Warning: Invalid COMMAND_MAX_OUTSTANDING value, using default: {COMMAND_MAX_OUTSTANDING}")
+
+# Maximum number of Sonarr API requests in flight at once (default 4)
+try:
+    API_MAX_CONCURRENCY = int(os.environ.get("API_MAX_CONCURRENCY", "4"))
+except ValueError:
+    API_MAX_CONCURRENCY = 4
+    print(f"Warning: Invalid API_MAX_CONCURRENCY value, using default: {API_MAX_CONCURRENCY}")
+
+# Number of pooled HTTP connections kept open to Sonarr (default 10)
+try:
+    API_POOL_SIZE = int(os.environ.get("API_POOL_SIZE", "10"))
+except ValueError:
+    API_POOL_SIZE = 10
+    print(f"Warning: Invalid API_POOL_SIZE value, using default: {API_POOL_SIZE}")
+
+# Number of wanted/missing and wanted/cutoff pages to prefetch while paging (default 1)
+try:
+    WANTED_PREFETCH_PAGES = int(os.environ.get("WANTED_PREFETCH_PAGES", "1"))
+except ValueError:
+    WANTED_PREFETCH_PAGES = 1
+    print(f"Warning: Invalid WANTED_PREFETCH_PAGES value, using default: {WANTED_PREFETCH_PAGES}")
+
+# Seconds before cached series metadata is fetched again (default 900)
+try:
+    SERIES_CACHE_TTL = int(os.environ.get("SERIES_CACHE_TTL", "900"))
+except ValueError:
+    SERIES_CACHE_TTL = 900
+    print(f"Warning: Invalid SERIES_CACHE_TTL value, using default: {SERIES_CACHE_TTL}")
+
+# Maximum number of series kept in the series cache (default 10000)
+try:
+    SERIES_CACHE_SIZE = int(os.environ.get("SERIES_CACHE_SIZE", "10000"))
+except ValueError:
+    SERIES_CACHE_SIZE = 10000
+    print(f"Warning: Invalid SERIES_CACHE_SIZE value, using default: {SERIES_CACHE_SIZE}")
+
 # Minimum size of the download queue before starting a hunt (default -1)
 try:
     MINIMUM_DOWNLOAD_QUEUE_SIZE = int(os.environ.get("MINIMUM_DOWNLOAD_QUEUE_SIZE", "-1"))
@@ -93,52 +282,182 @@ RANDOM_UPGRADES = os.environ.get("RANDOM_UPGRADES", str(RANDOM_SELECTION)).lower
 # Hunt mode: "missing", "upgrade", or "both"
 HUNT_MODE = os.environ.get("HUNT_MODE", "both")
 
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    """
+    A validated, immutable snapshot of every setting that can be changed in the web UI.
+    Field names are the keys in huntarr.json; `version` goes up each time a setting changes.
+    """
+
+    # huntarr
+    sleep_duration: int
+    hunt_missing_shows: int
+    hunt_upgrade_episodes: int
+    state_reset_interval_hours: int
+    monitored_only: bool
+    random_selection: bool
+    skip_future_episodes: bool
+    skip_series_refresh: bool
+    series_refresh_freshness_minutes: int
+
+    # advanced
+    api_timeout: int
+    debug_mode: bool
+    command_wait_delay: int
+    command_wait_attempts: int
+    command_max_outstanding: int
+    minimum_download_queue_size: int
+    random_missing: bool
+    random_upgrades: bool
+    api_max_concurrency: int
+    api_pool_size: int
+    wanted_prefetch_pages: int
+    series_cache_ttl: int
+    series_cache_size: int
+    api_retries: int
+    api_retry_backoff: float
+    circuit_breaker_threshold: int
+    circuit_breaker_cooldown: int
+    api_rate_limit: float
+    api_fast_decode: bool
+    api_decode_stats: bool
+    wanted_delta_sync: bool
+    wanted_full_resync_minutes: int
+    wanted_cache_max_records: int
+    upgrade_search_batch_size: int
+    upgrade_batch_by_series: bool
+    state_backend: str
+    priority_scheduling: bool
+    priority_random_weight: float
+    priority_upgrade_pages: int
+    pipeline_refresh_workers: int
+    pipeline_search_workers: int
+    pipeline_queue_size: int
+    download_queue_high_water: int
+    download_queue_low_water: int
+    download_queue_sample_seconds: int
+    download_queue_count_commands: bool
+
+    version: int = 0
+
+    def changed_from(self, other: "Settings") -> Set[str]:
+        """Names of the settings whose values differ from `other`."""
+        return {
+            field.name for field in dataclasses.fields(self)
+            if field.name != "version" and getattr(self, field.name) != getattr(other, field.name)
+        }
+
+# Callback for settings changes: (new snapshot, names of the changed settings)
+SettingsObserver = Callable[[Settings, Set[str]], None]
+
+def _validate(name: str, value: Any, expected: type, fallback: Any) -> Any:
+    """Convert a value from huntarr.json to the setting's type, or keep `fallback` if it can't be."""
+    try:
+        if expected is bool:
+            if isinstance(value, str) and value.lower() in ("true", "false"):
+                return value.lower() == "true"
+            if not isinstance(value, bool):
+                raise ValueError(value)
+            return value
+        if isinstance(value, bool):
+            raise ValueError(value)
+        if expected is int:
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError(value)
+            return int(value)
+        if expected is float:
+            return float(value)
+        return str(value).lower()
+    except (TypeError, ValueError):
+        logging.getLogger("huntarr-sonarr").warning(f"Invalid value {value!r} for setting {name}, keeping {fallback!r}")
+        return fallback
+
+def _environment_settings() -> Settings:
+    """The settings given by environment variables (or their defaults), before huntarr.json is applied."""
+    values = {field.name: globals()[field.name.upper()] for field in dataclasses.fields(Settings) if field.name != "version"}
+    return Settings(**values)
+
+class LiveSettings:
+    """
+    The current Settings, rebuilt when the settings file changes.
+
+    While nothing changed, current() costs one stat of the settings file (see
+    settings_manager.SettingsCache) and returns the same snapshot. When something
+    did, the new snapshot gets the next version and every subscriber is called with
+    it and the names of the changed settings, so each can react to just those.
+    """
+
+    def __init__(self, defaults: Settings):
+        self.defaults = defaults
+        self._lock = threading.RLock()
+        self._source: Optional[Mapping[str, Any]] = None
+        self._snapshot = defaults
+        self._observers: List[SettingsObserver] = []
+
+    def subscribe(self, observer: SettingsObserver) -> None:
+        with self._lock:
+            self._observers.append(observer)
+
+    def _build(self, source: Mapping[str, Any]) -> Settings:
+        huntarr_settings = source.get("huntarr", {})
+        advanced_settings = source.get("advanced", {})
+        huntarr_keys = {**settings_manager.DEFAULT_SETTINGS["huntarr"], **settings_manager.ENVIRONMENT_SETTINGS["huntarr"]}
+        environment_keys = {**settings_manager.ENVIRONMENT_SETTINGS["huntarr"], **settings_manager.ENVIRONMENT_SETTINGS["advanced"]}
+        values = {}
+        for field in dataclasses.fields(Settings):
+            if field.name == "version":
+                continue
+            section = huntarr_settings if field.name in huntarr_keys else advanced_settings
+            if field.name in environment_keys and field.name.upper() in os.environ:
+                # An environment variable that is set wins for settings the web UI doesn't show
+                values[field.name] = getattr(self.defaults, field.name)
+            elif field.name in section:
+                values[field.name] = _validate(field.name, section[field.name], field.type, getattr(self._snapshot, field.name))
+            else:
+                values[field.name] = getattr(self.defaults, field.name)
+
+        # RANDOM_MISSING / RANDOM_UPGRADES follow RANDOM_SELECTION unless set explicitly
+        for name in ("random_missing", "random_upgrades"):
+            if name not in advanced_settings:
+                values[name] = values["random_selection"]
+        return Settings(**values)
+
+    def current(self) -> Settings:
+        """The current settings, notifying subscribers first if the settings file changed."""
+        source = settings_manager.get_settings_snapshot()
+        if source is self._source:
+            return self._snapshot
+        with self._lock:
+            if source is self._source:
+                return self._snapshot
+            self._source = source
+            snapshot = self._build(source)
+            changed = snapshot.changed_from(self._snapshot)
+            if not changed:
+                return self._snapshot
+            self._snapshot = dataclasses.replace(snapshot, version=self._snapshot.version + 1)
+            for observer in self._observers:
+                try:
+                    observer(self._snapshot, changed)
+                except Exception as e:
+                    logging.getLogger("huntarr-sonarr").error(f"Error applying changed settings {sorted(changed)}: {e}")
+            return self._snapshot
+
+def _update_globals(snapshot: Settings, changed: Set[str]) -> None:
+    """Keep the module-level constants (e.g. config.STATE_RESET_INTERVAL_HOURS) in step with the snapshot."""
+    for name in changed:
+        globals()[name.upper()] = getattr(snapshot, name)
+
+settings = LiveSettings(_environment_settings())
+settings.subscribe(_update_globals)
+
 def refresh_settings():
     """Refresh configuration settings from the settings manager."""
-    global HUNT_MISSING_SHOWS, HUNT_UPGRADE_EPISODES, SLEEP_DURATION
-    global STATE_RESET_INTERVAL_HOURS, MONITORED_ONLY, RANDOM_SELECTION
-    global SKIP_FUTURE_EPISODES, SKIP_SERIES_REFRESH
-    global API_TIMEOUT, DEBUG_MODE, COMMAND_WAIT_DELAY, COMMAND_WAIT_ATTEMPTS
-    global MINIMUM_DOWNLOAD_QUEUE_SIZE, RANDOM_MISSING, RANDOM_UPGRADES
-    
-    # Load settings directly from settings manager
-    settings = settings_manager.get_all_settings()
-    huntarr_settings = settings.get("huntarr", {})
-    advanced_settings = settings.get("advanced", {})
-    
-    # Update global variables with fresh values
-    HUNT_MISSING_SHOWS = huntarr_settings.get("hunt_missing_shows", HUNT_MISSING_SHOWS)
-    HUNT_UPGRADE_EPISODES = huntarr_settings.get("hunt_upgrade_episodes", HUNT_UPGRADE_EPISODES)
-    SLEEP_DURATION = huntarr_settings.get("sleep_duration", SLEEP_DURATION)
-    STATE_RESET_INTERVAL_HOURS = huntarr_settings.get("state_reset_interval_hours", STATE_RESET_INTERVAL_HOURS)
-    MONITORED_ONLY = huntarr_settings.get("monitored_only", MONITORED_ONLY)
-    RANDOM_SELECTION = huntarr_settings.get("random_selection", RANDOM_SELECTION)
-    SKIP_FUTURE_EPISODES = huntarr_settings.get("skip_future_episodes", SKIP_FUTURE_EPISODES)
-    SKIP_SERIES_REFRESH = huntarr_settings.get("skip_series_refresh", SKIP_SERIES_REFRESH)
-    
-    # Advanced settings
-    API_TIMEOUT = advanced_settings.get("api_timeout", API_TIMEOUT)
-    DEBUG_MODE = advanced_settings.get("debug_mode", DEBUG_MODE)
-    COMMAND_WAIT_DELAY = advanced_settings.get("command_wait_delay", COMMAND_WAIT_DELAY)
-    COMMAND_WAIT_ATTEMPTS = advanced_settings.get("command_wait_attempts", COMMAND_WAIT_ATTEMPTS)
-    MINIMUM_DOWNLOAD_QUEUE_SIZE = advanced_settings.get("minimum_download_queue_size", MINIMUM_DOWNLOAD_QUEUE_SIZE)
-    
-    # Get the specific random settings - default to RANDOM_SELECTION for backward compatibility
-    # but only if not explicitly set in the advanced settings
-    if "random_missing" in advanced_settings:
-        RANDOM_MISSING = advanced_settings.get("random_missing")
-    else:
-        RANDOM_MISSING = RANDOM_SELECTION
-        
-    if "random_upgrades" in advanced_settings:
-        RANDOM_UPGRADES = advanced_settings.get("random_upgrades")
-    else:
-        RANDOM_UPGRADES = RANDOM_SELECTION
-    
+    current = settings.current()
+
     # Log the refresh for debugging
-    import logging
     logger = logging.getLogger("huntarr-sonarr")
-    logger.debug(f"Settings refreshed: SLEEP_DURATION={SLEEP_DURATION}, HUNT_MISSING_SHOWS={HUNT_MISSING_SHOWS}")
+    logger.debug(f"Settings refreshed (version {current.version}): SLEEP_DURATION={SLEEP_DURATION}, HUNT_MISSING_SHOWS={HUNT_MISSING_SHOWS}")
     logger.debug(f"Advanced settings refreshed: API_TIMEOUT={API_TIMEOUT}, DEBUG_MODE={DEBUG_MODE}")
     logger.debug(f"Random settings: RANDOM_SELECTION={RANDOM_SELECTION}, RANDOM_MISSING={RANDOM_MISSING}, RANDOM_UPGRADES={RANDOM_UPGRADES}")
 
@@ -150,16 +469,29 @@ def log_configuration(logger):
     logger.info("=== Huntarr [Sonarr Edition] Starting ===")
     logger.info(f"API URL: {API_URL}")
     logger.info(f"API Timeout: {API_TIMEOUT}s")
+    logger.info(f"API_RETRIES={API_RETRIES}, API_RETRY_BACKOFF={API_RETRY_BACKOFF}s, API_RATE_LIMIT={API_RATE_LIMIT}/s")
+    logger.info(f"API_FAST_DECODE={API_FAST_DECODE}, API_DECODE_STATS={API_DECODE_STATS}")
+    logger.info(f"WANTED_DELTA_SYNC={WANTED_DELTA_SYNC}, WANTED_FULL_RESYNC_MINUTES={WANTED_FULL_RESYNC_MINUTES}, "
+                f"WANTED_CACHE_MAX_RECORDS={WANTED_CACHE_MAX_RECORDS}")
+    logger.info(f"CIRCUIT_BREAKER_THRESHOLD={CIRCUIT_BREAKER_THRESHOLD}, CIRCUIT_BREAKER_COOLDOWN={CIRCUIT_BREAKER_COOLDOWN}s")
     logger.info(f"Missing Content Configuration: HUNT_MISSING_SHOWS={HUNT_MISSING_SHOWS}")
     logger.info(f"Upgrade Configuration: HUNT_UPGRADE_EPISODES={HUNT_UPGRADE_EPISODES}")
-    logger.info(f"State Reset Interval: {STATE_RESET_INTERVAL_HOURS} hours")
+    logger.info(f"UPGRADE_SEARCH_BATCH_SIZE={UPGRADE_SEARCH_BATCH_SIZE}, UPGRADE_BATCH_BY_SERIES={UPGRADE_BATCH_BY_SERIES}")
+    logger.info(f"State Reset Interval: {STATE_RESET_INTERVAL_HOURS} hours, STATE_BACKEND={STATE_BACKEND}")
     logger.info(f"Minimum Download Queue Size: {MINIMUM_DOWNLOAD_QUEUE_SIZE}")
+    logger.info(f"DOWNLOAD_QUEUE_HIGH_WATER={DOWNLOAD_QUEUE_HIGH_WATER}, DOWNLOAD_QUEUE_LOW_WATER={DOWNLOAD_QUEUE_LOW_WATER}, "
+                f"DOWNLOAD_QUEUE_SAMPLE_SECONDS={DOWNLOAD_QUEUE_SAMPLE_SECONDS}, DOWNLOAD_QUEUE_COUNT_COMMANDS={DOWNLOAD_QUEUE_COUNT_COMMANDS}")
     logger.info(f"MONITORED_ONLY={MONITORED_ONLY}, RANDOM_SELECTION={RANDOM_SELECTION}")
     logger.info(f"RANDOM_MISSING={RANDOM_MISSING}, RANDOM_UPGRADES={RANDOM_UPGRADES}")
+    logger.info(f"PRIORITY_SCHEDULING={PRIORITY_SCHEDULING}, PRIORITY_RANDOM_WEIGHT={PRIORITY_RANDOM_WEIGHT}, PRIORITY_UPGRADE_PAGES={PRIORITY_UPGRADE_PAGES}")
     logger.info(f"HUNT_MODE={HUNT_MODE}, SLEEP_DURATION={SLEEP_DURATION}s")
-    logger.info(f"COMMAND_WAIT_DELAY={COMMAND_WAIT_DELAY}, COMMAND_WAIT_ATTEMPTS={COMMAND_WAIT_ATTEMPTS}")
+    logger.info(f"COMMAND_WAIT_DELAY={COMMAND_WAIT_DELAY}, COMMAND_WAIT_ATTEMPTS={COMMAND_WAIT_ATTEMPTS}, COMMAND_MAX_OUTSTANDING={COMMAND_MAX_OUTSTANDING}")
+    logger.info(f"PIPELINE_REFRESH_WORKERS={PIPELINE_REFRESH_WORKERS}, PIPELINE_SEARCH_WORKERS={PIPELINE_SEARCH_WORKERS}, PIPELINE_QUEUE_SIZE={PIPELINE_QUEUE_SIZE}")
+    logger.info(f"API_MAX_CONCURRENCY={API_MAX_CONCURRENCY}, API_POOL_SIZE={API_POOL_SIZE}, WANTED_PREFETCH_PAGES={WANTED_PREFETCH_PAGES}")
+    logger.info(f"SERIES_CACHE_TTL={SERIES_CACHE_TTL}s, SERIES_CACHE_SIZE={SERIES_CACHE_SIZE}")
     logger.info(f"SKIP_FUTURE_EPISODES={SKIP_FUTURE_EPISODES}, SKIP_SERIES_REFRESH={SKIP_SERIES_REFRESH}")
-    logger.info(f"ENABLE_WEB_UI={ENABLE_WEB_UI}, DEBUG_MODE={DEBUG_MODE}")
+    logger.info(f"SERIES_REFRESH_FRESHNESS_MINUTES={SERIES_REFRESH_FRESHNESS_MINUTES}")
+    logger.info(f"ENABLE_WEB_UI={ENABLE_WEB_UI}, SINGLE_PROCESS={SINGLE_PROCESS}, DEBUG_MODE={DEBUG_MODE}")
     logger.debug(f"API_KEY={API_KEY}")
 
 # Initial refresh of settings
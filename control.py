@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Control channel for Huntarr-Sonarr
+Lets the web server reload settings, restart, pause or start the hunt and ask for
+its status over a Unix domain socket served by main.py
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from utils.logger import logger
+
+# Socket the hunt loop listens on (kept out of /config, which may not support sockets)
+CONTROL_SOCKET = pathlib.Path(os.environ.get("CONTROL_SOCKET", "/tmp/huntarr-control.sock"))
+
+# Seconds a client waits for the hunt loop to answer
+CONTROL_TIMEOUT = 5
+
+# Longest request or response line accepted
+MAX_MESSAGE_BYTES = 64 * 1024
+
+COMMANDS = ("status", "reload-settings", "restart-cycle", "pause", "resume", "run-now")
+
+class HuntControl:
+    """
+    State shared by the hunt loop and control requests.
+
+    The hunt loop reports its phase and the pipeline.Quota of the work in progress, and
+    asks at safe points - before a cycle and before admitting more work - whether it
+    should wait (paused) or stop early (a restart of the cycle was requested). While
+    sleeping between cycles it waits on sleep_until(), which wakes up on any request.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.paused = False
+        self.phase = "starting"
+        self.phase_started = time.time()
+        self.cycle = 0
+        self.next_cycle_at: Optional[float] = None
+        self._quota = None
+        self._restart = False
+        self._run_now = False
+        self._reload = False
+
+    # Hunt loop side
+
+    def begin_cycle(self) -> None:
+        with self._condition:
+            self.cycle += 1
+            self.next_cycle_at = None
+            self._restart = False
+            self._run_now = False
+
+    def set_phase(self, phase: str) -> None:
+        with self._condition:
+            self.phase = phase
+            self.phase_started = time.time()
+            self._quota = None
+
+    def track(self, quota) -> None:
+        """Report `quota` (a pipeline.Quota) as the work in progress of the current phase."""
+        with self._condition:
+            self._quota = quota
+
+    def checkpoint(self) -> bool:
+        """Block while paused. Returns False once a restart of the cycle has been requested."""
+        with self._condition:
+            while self.paused and not self._restart:
+                self._condition.wait()
+            return not self._restart
+
+    def restart_requested(self) -> bool:
+        with self._condition:
+            return self._restart
+
+    def interrupted(self) -> bool:
+        """True while paused or once a restart of the cycle was requested, for work that is waiting."""
+        with self._condition:
+            return self.paused or self._restart
+
+    def sleep_until(self, next_cycle_at: float, timeout: float) -> Optional[str]:
+        """
+        Sleep until the next cycle is due at `next_cycle_at` (for at most `timeout` seconds)
+        or a request comes in: returns "restart", "run-now" or "reload" for what woke it
+        up, or None once it slept that long.
+        """
+        deadline = min(next_cycle_at, time.time() + timeout)
+        with self._condition:
+            self.next_cycle_at = next_cycle_at
+            while True:
+                if self._restart:
+                    return "restart"
+                if self._run_now:
+                    self._run_now = False
+                    return "run-now"
+                if self._reload:
+                    self._reload = False
+                    return "reload"
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    # Request side
+
+    def request_restart(self) -> None:
+        with self._condition:
+            self._restart = True
+            self._condition.notify_all()
+
+    def request_run_now(self) -> bool:
+        """Cut the sleep between cycles short. Returns False if a cycle is already running."""
+        with self._condition:
+            if self.next_cycle_at is None:
+                return False
+            self._run_now = True
+            self._condition.notify_all()
+            return True
+
+    def settings_reloaded(self) -> None:
+        """Wake the sleep between cycles so it is recalculated with the new settings."""
+        with self._condition:
+            self._reload = True
+            self._condition.notify_all()
+
+    def set_paused(self, paused: bool) -> None:
+        with self._condition:
+            self.paused = paused
+            self._condition.notify_all()
+
+    def status(self) -> Dict[str, Any]:
+        with self._condition:
+            now = time.time()
+            status = {
+                "phase": self.phase,
+                "phase_seconds": round(now - self.phase_started),
+                "paused": self.paused,
+                "cycle": self.cycle,
+                "restart_requested": self._restart,
+                "next_cycle_in": max(round(self.next_cycle_at - now), 0) if self.next_cycle_at is not None else None
+            }
+            if self._quota is not None:
+                status.update(in_flight=self._quota.in_flight, completed=self._quota.completed, limit=self._quota.limit)
+            return status
+
+# The hunt loop's control state, shared by main.py, missing.py and upgrade.py
+hunt_control = HuntControl()
+
+class Controller:
+    """
+    Carries out control requests on `control`. `reload_settings` re-reads the settings
+    file and returns the new settings version.
+    """
+
+    def __init__(self, control: HuntControl, reload_settings: Callable[[], int]):
+        self.control = control
+        self.reload_settings = reload_settings
+
+    def dispatch(self, command: Optional[str]) -> Dict[str, Any]:
+        control = self.control
+        if command == "status":
+            return {"ok": True, **control.status()}
+        if command == "reload-settings":
+            version = self.reload_settings()
+            control.settings_reloaded()
+            return {"ok": True, "settings_version": version}
+        if command == "restart-cycle":
+            logger.warning("⚠️ Restart requested from web UI. Stopping current operations... ⚠️")
+            control.request_restart()
+            return {"ok": True}
+        if command in ("pause", "resume"):
+            paused = command == "pause"
+            if paused != control.paused:
+                logger.warning("⏸️ Hunting paused from web UI" if paused else "▶️ Hunting resumed from web UI")
+            control.set_paused(paused)
+            return {"ok": True, "paused": paused}
+        if command == "run-now":
+            started = control.request_run_now()
+            if started:
+                logger.info("Starting the next cycle now, as requested from web UI")
+            return {"ok": True, "started": started}
+        return {"ok": False, "error": f"unknown command {command!r}, expected one of {', '.join(COMMANDS)}"}
+
+# Set when the hunt loop runs in this process (SINGLE_PROCESS): requests skip the socket
+_local_controller: Optional[Controller] = None
+
+def serve_in_process(controller: Controller) -> None:
+    """Answer send_command() in this process directly, without a socket."""
+    global _local_controller
+    _local_controller = controller
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out."""
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline(MAX_MESSAGE_BYTES))
+            command = request.get("command") if isinstance(request, dict) else None
+            response = self.server.controller.dispatch(command)
+        except ValueError:
+            response = {"ok": False, "error": "invalid request"}
+        except Exception as e:
+            logger.error(f"Error handling control request: {e}")
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves requests for `controller` on a Unix socket that only this user can use."""
+
+    daemon_threads = True
+
+    def __init__(self, path: pathlib.Path, controller: Controller):
+        self.path = path
+        self.controller = controller
+        # A socket left behind by an earlier run would make bind() fail
+        with contextlib.suppress(FileNotFoundError):
+            path.unlink()
+        super().__init__(str(path), _RequestHandler)
+        os.chmod(path, 0o600)
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, name="control", daemon=True).start()
+        logger.debug(f"Control channel listening on {self.path}")
+
+def send_command(command: str, path: pathlib.Path = CONTROL_SOCKET,
+                 timeout: float = CONTROL_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """Send a command to the hunt loop and return its response, or None if it isn't reachable."""
+    if _local_controller is not None:
+        try:
+            return _local_controller.dispatch(command)
+        except Exception as e:
+            logger.error(f"Error handling control request: {e}")
+            return {"ok": False, "error": str(e)}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            sock.sendall(json.dumps({"command": command}).encode() + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline(MAX_MESSAGE_BYTES)
+        response = json.loads(line)
+        return response if isinstance(response, dict) else None
+    except (OSError, ValueError):
+        return None
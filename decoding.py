@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Response decoding for Huntarr-Sonarr
+Projects wanted/cutoff and wanted/missing records down to the fields the hunt uses
+"""
+
+import json
+import re
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+# Optional faster JSON backends - used when installed, plain json otherwise
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fields of a wanted record read by the missing and upgrade processing
+RECORD_FIELDS = (
+    "id", "seriesId", "seasonNumber", "episodeNumber",
+    "title", "airDateUtc", "monitored", "seriesTitle"
+)
+
+# Fields of the embedded series object that are kept
+SERIES_FIELDS = ("id", "title", "monitored")
+
+# Top-level fields of a paged response that are kept
+PAGE_FIELDS = ("page", "pageSize", "sortKey", "sortDirection", "totalRecords")
+
+def project_record(record: Dict) -> Dict:
+    """Reduce a wanted record (and its embedded series) to RECORD_FIELDS / SERIES_FIELDS."""
+    projected = {field: record[field] for field in RECORD_FIELDS if field in record}
+    series = record.get("series")
+    if isinstance(series, dict):
+        projected["series"] = {field: series[field] for field in SERIES_FIELDS if field in series}
+    return projected
+
+def project_page(page: Any) -> Any:
+    """Project every record of an already decoded paged response."""
+    if not isinstance(page, dict) or not isinstance(page.get("records"), list):
+        return page
+    projected = {field: page[field] for field in PAGE_FIELDS if field in page}
+    projected["records"] = [project_record(record) for record in page["records"] if isinstance(record, dict)]
+    return projected
+
+def backend_name() -> str:
+    """The JSON backend used for projected responses."""
+    if ijson is not None:
+        return f"ijson ({ijson.backend})"
+    if orjson is not None:
+        return "orjson"
+    return "json"
+
+def decode_projected(stream) -> Dict:
+    """
+    Decode a paged wanted response from a file-like `stream`, keeping only the projected fields.
+
+    With ijson the `records` array is parsed incrementally: each record is built,
+    projected and its full form discarded before the next one is read, so the
+    complete response never exists as Python objects. Without ijson the body is
+    decoded in one go (with orjson if available) and projected afterwards.
+    """
+    if ijson is None:
+        body = stream.read()
+        page = orjson.loads(body) if orjson is not None else json.loads(body)
+        return project_page(page)
+
+    result: Dict[str, Any] = {"records": []}
+    builder = None
+    try:
+        for prefix, event, value in ijson.parse(stream, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == "records.item" and event == "end_map":
+                    result["records"].append(project_record(builder.value))
+                    builder = None
+            elif prefix == "records.item" and event == "start_map":
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix in PAGE_FIELDS and event in ("number", "string", "boolean", "null"):
+                result[prefix] = value
+    except ijson.JSONError as error:
+        # Surface parse errors like json/orjson do
+        raise ValueError(str(error)) from error
+    return result
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximate memory used by a decoded JSON value, including everything it contains."""
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return size
+
+class ChunkReader:
+    """File-like reader over an iterator of byte chunks that counts the bytes read."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        # Chunks are returned as they arrive; only an empty result means end of stream
+        if size == 0:
+            return b""
+        if size is None or size < 0:
+            data = b"".join(self._chunks)
+        else:
+            data = next(self._chunks, b"")
+        self.bytes_read += len(data)
+        return data
+
+class DecodeStats:
+    """Bytes received and peak decoded size per endpoint, collected in measurement mode."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, bytes_received: int, decoded: Any) -> None:
+        # Query strings and IDs are dropped so pages/items of one endpoint are grouped
+        path = re.sub(r"/\d+", "/{id}", endpoint.split("?", 1)[0])
+        decoded_size = deep_sizeof(decoded)
+        with self._lock:
+            stats = self._endpoints.setdefault(path, {"requests": 0, "bytes": 0, "peak_decoded": 0})
+            stats["requests"] += 1
+            stats["bytes"] += bytes_received
+            stats["peak_decoded"] = max(stats["peak_decoded"], decoded_size)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+    def summary(self) -> Optional[str]:
+        """One line per endpoint, or None if nothing was recorded."""
+        with self._lock:
+            if not self._endpoints:
+                return None
+            return "\n".join(
+                f"  {path}: {stats['requests']} requests, {stats['bytes'] / 1024:.1f} KiB received, "
+                f"peak decoded size {stats['peak_decoded'] / 1024:.1f} KiB"
+                for path, stats in sorted(self._endpoints.items())
+            )
@@ -8,26 +8,16 @@ import time
 import sys
 import os
 import socket
-import signal
-import importlib
-from utils.logger import logger
-from config import HUNT_MODE, SLEEP_DURATION, MINIMUM_DOWNLOAD_QUEUE_SIZE, ENABLE_WEB_UI, log_configuration, refresh_settings
+import threading
+import settings_manager
+from utils.logger import logger, setup_logger
+from config import HUNT_MODE, ENABLE_WEB_UI, SINGLE_PROCESS, settings, log_configuration
 from missing import process_missing_episodes
+from upgrade import process_cutoff_upgrades
 from state import check_state_reset, calculate_reset_time
-from api import get_download_queue_size
-
-# Flag to indicate if cycle should restart
-restart_cycle = False
-
-def signal_handler(signum, frame):
-    """Handle signals from the web UI for cycle restart"""
-    global restart_cycle
-    if signum == signal.SIGUSR1:
-        logger.warning("⚠️ Received restart signal from web UI. Immediately aborting current operations... ⚠️")
-        restart_cycle = True
-
-# Register signal handler for SIGUSR1
-signal.signal(signal.SIGUSR1, signal_handler)
+from api import get_download_queue_size, warm_series_cache, series_cache, is_sonarr_available, circuit_breaker, decode_stats, missing_snapshot, cutoff_page_cache, download_throttle
+from decoding import backend_name
+from control import CONTROL_SOCKET, ControlServer, Controller, hunt_control, serve_in_process
 
 def get_ip_address():
     """Get the host's IP address from API_URL for display"""
@@ -53,35 +43,53 @@ def get_ip_address():
         except:
             return "YOUR_SERVER_IP"
 
-def force_reload_all_modules():
-    """Force reload of all relevant modules to ensure fresh settings"""
+def apply_debug_mode(snapshot, changed) -> None:
+    """Switch the log level as soon as DEBUG_MODE changes"""
+    if "debug_mode" in changed:
+        setup_logger(snapshot.debug_mode)
+
+settings.subscribe(apply_debug_mode)
+
+def reload_settings() -> int:
+    """Re-read the settings file now (on request from the web UI) and return the settings version"""
+    settings_manager.notify_settings_changed()
+    return settings.current().version
+
+def start_control_server() -> None:
+    """Listen for requests from the web UI (reload, restart, pause, run now, status)"""
+    controller = Controller(hunt_control, reload_settings)
+    if SINGLE_PROCESS:
+        # The web server runs in this process and calls the controller directly
+        serve_in_process(controller)
+        return
     try:
-        # Force reload the config module
-        import config
-        importlib.reload(config)
-        
-        # Reload any modules that might cache config values
-        import missing
-        importlib.reload(missing)
-        
-        import upgrade
-        importlib.reload(upgrade)
-        
-        # Call the refresh function to ensure settings are updated
-        config.refresh_settings()
-        
-        # Log the reloaded settings for verification
-        logger.warning("⚠️ Settings reloaded from JSON file after restart signal ⚠️")
-        config.log_configuration(logger)
-        
-        return True
+        ControlServer(CONTROL_SOCKET, controller).start()
+    except OSError as e:
+        logger.warning(f"Could not open control channel at {CONTROL_SOCKET}: {e}. The web UI can't control the hunt.")
+
+def start_web_server() -> None:
+    """Serve the web interface from a thread of this process (SINGLE_PROCESS mode)"""
+    try:
+        import web_server
+        server = web_server.make_server()
     except Exception as e:
-        logger.error(f"Error reloading modules: {e}")
-        return False
+        logger.error(f"Could not start the web interface: {e}. Hunting continues without it.")
+        return
+
+    def serve() -> None:
+        try:
+            server.serve_forever()
+        except Exception as e:
+            logger.error(f"Web interface stopped: {e}. Hunting continues without it.")
+
+    threading.Thread(target=serve, name="web-server", daemon=True).start()
+    logger.info(f"Web interface listening on port {server.port} in the hunt process (SINGLE_PROCESS=true)")
 
 def main_loop() -> None:
     """Main processing loop for Huntarr-Sonarr"""
-    global restart_cycle
+    start_control_server()
+    if SINGLE_PROCESS and ENABLE_WEB_UI:
+        start_web_server()
     
     # Log welcome message for web interface
     logger.info("=== Huntarr [Sonarr Edition] Starting ===")
@@ -93,16 +101,25 @@ def main_loop() -> None:
     
     logger.info("GitHub: https://github.com/plexguide/huntarr-sonarr")
     
+    settings_version = settings.current().version
     while True:
-        # Set restart_cycle flag to False at the beginning of each cycle
-        restart_cycle = False
-        
-        # Always force reload all modules at the start of each cycle
-        force_reload_all_modules()
-        
-        # Import after reload to ensure we get fresh values
-        from config import HUNT_MODE, HUNT_MISSING_SHOWS, HUNT_UPGRADE_EPISODES
-        from upgrade import process_cutoff_upgrades
+        # Clear any restart request at the beginning of each cycle
+        hunt_control.begin_cycle()
+        
+        # Wait here while hunting is paused from the web UI
+        if hunt_control.paused:
+            hunt_control.set_phase("paused")
+            logger.info("Hunting is paused. Waiting to be resumed...")
+        if not hunt_control.checkpoint():
+            continue
+        hunt_control.set_phase("starting")
+        
+        # Settings are only re-read if the settings file changed; log them again if they did
+        current = settings.current()
+        if current.version != settings_version:
+            logger.warning("⚠️ Settings changed - applying them to this cycle ⚠️")
+            log_configuration(logger)
+            settings_version = current.version
         
         # Check if state files need to be reset
         check_state_reset()
@@ -114,43 +131,70 @@ def main_loop() -> None:
 
         # Check if we should ignore the download queue size or if we are below the minimum queue size
         download_queue_size = get_download_queue_size()
-        if MINIMUM_DOWNLOAD_QUEUE_SIZE < 0 or (MINIMUM_DOWNLOAD_QUEUE_SIZE >= 0 and download_queue_size <= MINIMUM_DOWNLOAD_QUEUE_SIZE):
+        if not is_sonarr_available():
+            remaining = int(circuit_breaker.remaining_cooldown())
+            logger.warning(f"Sonarr is not responding. Skipping this hunt (API calls paused for another {remaining}s).")
+        elif current.minimum_download_queue_size < 0 or download_queue_size <= current.minimum_download_queue_size:
         
             # Process shows/episodes based on HUNT_MODE
-            if restart_cycle:
-                logger.warning("⚠️ Restarting cycle due to settings change... ⚠️")
+            if hunt_control.restart_requested():
+                logger.warning("⚠️ Restarting cycle as requested... ⚠️")
                 continue
                 
-            if HUNT_MODE in ["missing", "both"] and HUNT_MISSING_SHOWS > 0:
+            # Load series details once for every per-series lookup in this cycle
+            hunt_control.set_phase("warming series cache")
+            warm_series_cache()
+
+            if HUNT_MODE in ["missing", "both"] and current.hunt_missing_shows > 0:
+                hunt_control.set_phase("missing")
                 if process_missing_episodes():
                     processing_done = True
                 
-                # Check if restart signal received
-                if restart_cycle:
-                    logger.warning("⚠️ Restarting cycle due to settings change... ⚠️")
+                # Check if a restart was requested
+                if hunt_control.restart_requested():
+                    logger.warning("⚠️ Restarting cycle as requested... ⚠️")
                     continue
                     
-            if HUNT_MODE in ["upgrade", "both"] and HUNT_UPGRADE_EPISODES > 0:
-                logger.info(f"Starting upgrade process with HUNT_UPGRADE_EPISODES={HUNT_UPGRADE_EPISODES}")
+            if HUNT_MODE in ["upgrade", "both"] and settings.current().hunt_upgrade_episodes > 0:
+                logger.info(f"Starting upgrade process with HUNT_UPGRADE_EPISODES={settings.current().hunt_upgrade_episodes}")
                 
+                hunt_control.set_phase("upgrade")
                 if process_cutoff_upgrades():
                     processing_done = True
                 
-                # Check if restart signal received
-                if restart_cycle:
-                    logger.warning("⚠️ Restarting cycle due to settings change... ⚠️")
+                # Check if a restart was requested
+                if hunt_control.restart_requested():
+                    logger.warning("⚠️ Restarting cycle as requested... ⚠️")
                     continue
 
         else:
-            logger.info(f"Download queue size ({download_queue_size}) is above the minimum threshold ({MINIMUM_DOWNLOAD_QUEUE_SIZE}). Skipped processing.")
+            logger.info(f"Download queue size ({download_queue_size}) is above the minimum threshold ({current.minimum_download_queue_size}). Skipped processing.")
+
+        logger.debug(f"Series cache: {series_cache.stats()}")
+        logger.debug(f"Settings cache: {settings_manager.settings_cache.stats()}")
+
+        # Report response sizes for this cycle when API_DECODE_STATS is enabled
+        decode_summary = decode_stats.summary()
+        if decode_summary:
+            logger.info(f"API response sizes this cycle (JSON backend: {backend_name()}):\n{decode_summary}")
+            decode_stats.reset()
+
+        if current.wanted_delta_sync:
+            logger.info(f"wanted/missing sync this cycle: {missing_snapshot.stats.summary()}")
+            logger.info(f"wanted/cutoff page cache this cycle: {cutoff_page_cache.stats.summary()}")
+            missing_snapshot.stats.reset()
+            cutoff_page_cache.stats.reset()
+
+        if download_throttle.enabled:
+            logger.info(f"Download queue throttle this cycle: {download_throttle.summary()}")
+            download_throttle.reset_stats()
 
         # Calculate time until the next reset
         calculate_reset_time()
         
-        # Refresh settings before sleep to get the latest sleep_duration
-        refresh_settings()
-        # Import it directly from the settings manager to ensure latest value
-        from config import SLEEP_DURATION as CURRENT_SLEEP_DURATION
+        # Use the latest sleep_duration, in case it changed during the cycle
+        CURRENT_SLEEP_DURATION = settings.current().sleep_duration
+        hunt_control.set_phase("sleeping")
         
         # Sleep at the end of the cycle only
         logger.info(f"Cycle complete. Sleeping {CURRENT_SLEEP_DURATION}s before next cycle...")
@@ -161,23 +205,22 @@ def main_loop() -> None:
             server_ip = get_ip_address()
             logger.info(f"Web interface available at http://{server_ip}:8988")
         
-        # Sleep with progress updates for the web interface
+        # Sleep with progress updates for the web interface; requests from the web UI wake it up
         sleep_start = time.time()
-        sleep_end = sleep_start + CURRENT_SLEEP_DURATION
-        
-        while time.time() < sleep_end and not restart_cycle:
-            # Sleep in smaller chunks for more responsive shutdown and restart
-            time.sleep(min(1, sleep_end - time.time()))
+        while True:
+            # Recalculated after a settings reload, in case sleep_duration changed
+            sleep_end = sleep_start + settings.current().sleep_duration
+            woken_by = hunt_control.sleep_until(sleep_end, timeout=60)
+            if woken_by == "restart":
+                logger.warning("⚠️ Sleep interrupted by a restart request. Restarting cycle immediately... ⚠️")
+                break
+            if woken_by == "run-now" or time.time() >= sleep_end:
+                break
             
             # Every minute, log the remaining sleep time for web interface visibility
-            if int((time.time() - sleep_start) % 60) == 0 and time.time() < sleep_end - 10:
+            if woken_by is None and time.time() < sleep_end - 10:
                 remaining = int(sleep_end - time.time())
                 logger.debug(f"Sleeping... {remaining}s remaining until next cycle")
-            
-            # Check if restart signal received
-            if restart_cycle:
-                logger.warning("⚠️ Sleep interrupted due to settings change. Restarting cycle immediately... ⚠️")
-                break
 
 if __name__ == "__main__":
     # Log configuration settings
@@ -7,23 +7,23 @@ Handles searching for missing episodes in Sonarr
 import random
 import time
 import datetime
-from typing import List
+from typing import Iterable, List, Iterator, Tuple
 from utils.logger import logger
-from config import (
-    HUNT_MISSING_SHOWS, 
-    MONITORED_ONLY, 
-    RANDOM_SELECTION,
-    RANDOM_MISSING,
-    SKIP_FUTURE_EPISODES,
-    SKIP_SERIES_REFRESH
-)
+from config import Settings, settings
 from api import (
     get_episodes_for_series, 
-    refresh_series, 
-    episode_search_episodes, 
+    refresh_series_async, 
+    episode_search_episodes_async, 
+    download_throttle,
     get_series_with_missing_episodes
 )
-from state import load_processed_ids, save_processed_id, truncate_processed_list, PROCESSED_MISSING_FILE
+from models import EpisodeRef, SeriesRef
+from control import hunt_control
+from pipeline import Pipeline, Quota, Stage
+from scheduler import PriorityScheduler
+from state import (
+    processed_ids, save_processed_id, flush_state, search_history, load_cursor, save_cursor, resume_after, Cursor, MISSING
+)
 
 def process_missing_episodes() -> bool:
     """
@@ -36,8 +36,11 @@ def process_missing_episodes() -> bool:
     """
     logger.info("=== Checking for Missing Episodes ===")
 
+    # Settings for this cycle; HUNT_MISSING_SHOWS is re-checked as shows are taken
+    current = settings.current()
+
     # Skip if HUNT_MISSING_SHOWS is set to 0
-    if HUNT_MISSING_SHOWS <= 0:
+    if current.hunt_missing_shows <= 0:
         logger.info("HUNT_MISSING_SHOWS is set to 0, skipping missing content")
         return False
 
@@ -50,9 +53,9 @@ def process_missing_episodes() -> bool:
     logger.info(f"Found {len(shows_with_missing)} shows with missing episodes.")
 
     # Optionally filter to only monitored shows (if MONITORED_ONLY==true)
-    if MONITORED_ONLY:
+    if current.monitored_only:
         logger.info("MONITORED_ONLY=true => only fully monitored shows.")
-        shows_with_missing = [s for s in shows_with_missing if s.get("monitored") is True]
+        shows_with_missing = [s for s in shows_with_missing if s.monitored]
     else:
         logger.info("MONITORED_ONLY=false => all shows, even if unmonitored.")
 
@@ -60,113 +63,169 @@ def process_missing_episodes() -> bool:
         logger.info("No monitored shows with missing episodes found.")
         return False
 
-    processed_missing_ids = load_processed_ids(PROCESSED_MISSING_FILE)
-    shows_processed = 0
-    processing_done = False
+    processed_missing_ids = processed_ids(MISSING, [s.id for s in shows_with_missing if s.id])
+
+    # Get current date for future episode filtering
+    current_date = datetime.datetime.now().date()
 
     # Use the specific RANDOM_MISSING setting 
     # (no longer dependent on the master RANDOM_SELECTION setting)
-    if RANDOM_MISSING:
+    if current.priority_scheduling:
+        # Highest score first; RANDOM_MISSING only adds a random part to the score
+        logger.info(f"Using priority selection for missing shows (RANDOM_MISSING={str(current.random_missing).lower()})")
+        unprocessed = [s for s in shows_with_missing if s.id not in processed_missing_ids]
+        shows_with_missing = _missing_scheduler(current, current_date).ranked([unprocessed])
+    elif current.random_missing:
         logger.info("Using random selection for missing shows (RANDOM_MISSING=true)")
         random.shuffle(shows_with_missing)
     else:
         logger.info("Using sequential selection for missing shows (RANDOM_MISSING=false)")
-
-    # Get current date for future episode filtering
-    current_date = datetime.datetime.now().date()
-
+        # Resume after the show the last sequential cycle stopped at
+        list_positions = {show.id: position for position, show in enumerate(shows_with_missing)}
+        list_length = len(shows_with_missing)
+        shows_with_missing = resume_after(shows_with_missing, load_cursor(MISSING), lambda show: show.id)
+
+    candidates = _eligible_shows(shows_with_missing, processed_missing_ids, current_date, current.skip_future_episodes)
+
+    # Shows flow through the refresh, search and commit stages one by one, so the next show is
+    # refreshed while earlier ones are still being searched. A show is only taken from the
+    # candidates while HUNT_MISSING_SHOWS has room for it, and a show that fails frees its place.
+    quota = Quota(current.hunt_missing_shows)
+    hunt_control.track(quota)
+    admitted: List[SeriesRef] = []
+
+    def admit() -> Iterator[Tuple[SeriesRef, List[EpisodeRef]]]:
+        while True:
+            # Wait while hunting is paused, and stop taking new work once a restart was requested
+            if not hunt_control.checkpoint():
+                return
+            # Pick up a HUNT_MISSING_SHOWS change made mid-cycle
+            quota.set_limit(settings.current().hunt_missing_shows)
+            if not quota.acquire(1):
+                return
+            candidate = next(candidates, None)
+            if candidate is None:
+                quota.release(1)
+                return
+            admitted.append(candidate[0])
+            yield candidate
+
+    if current.skip_series_refresh:
+        logger.info(f" - Skipping series refresh (SKIP_SERIES_REFRESH=true)")
+    _missing_pipeline(current, quota).run(admit())
+
+    if not current.priority_scheduling and not current.random_missing and admitted:
+        last_show = admitted[-1]
+        save_cursor(MISSING, Cursor(list_positions[last_show.id], last_show.id, list_length))
+
+    # Write this cycle's processed shows in one go
+    flush_state()
+    
+    return quota.completed > 0
+
+def _missing_scheduler(current: Settings, current_date) -> PriorityScheduler[SeriesRef]:
+    """Ranks shows by their last search, their newest aired missing episode and whether they're monitored."""
+    def newest_air_date(show: SeriesRef):
+        aired = [ep.air_date for ep in show.episodes if ep.air_date is not None and not ep.is_future(current_date)]
+        return max(aired) if aired else None
+
+    return PriorityScheduler(
+        "shows with missing episodes",
+        item_id=lambda show: show.id,
+        air_date=newest_air_date,
+        monitored=lambda show: show.monitored,
+        describe=lambda show: f"'{show.title}' (ID: {show.id})",
+        history=lambda ids: search_history(MISSING, ids),
+        reset_interval_hours=current.state_reset_interval_hours,
+        random_weight=current.priority_random_weight if current.random_missing else 0.0
+    )
+
+def _eligible_shows(shows_with_missing: Iterable[SeriesRef], processed_missing_ids, current_date,
+                    skip_future_episodes: bool) -> Iterator[Tuple[SeriesRef, List[EpisodeRef]]]:
+    """
+    Yield (show, episodes) for each show that still has monitored,
+    already-aired missing episodes to search for.
+    """
     for show in shows_with_missing:
-        if shows_processed >= HUNT_MISSING_SHOWS:
-            break
-
-        series_id = show.get("id")
-        if not series_id:
+        if not show.id:
             continue
 
         # If we already processed this show ID, skip
-        if series_id in processed_missing_ids:
+        if show.id in processed_missing_ids:
             continue
 
-        show_title = show.get("title", "Unknown Show")
-        missing_count = show.get("missingEpisodeCount", 0)
-        missing_episodes = show.get("missingEpisodes", [])
-        
-        logger.info(f"Processing '{show_title}' with {missing_count} missing episodes.")
+        logger.info(f"Processing '{show.title}' with {len(show.episodes)} missing episodes.")
 
         # Filter missing episodes to find those that are monitored
-        monitored_missing_episodes = [
-            ep for ep in missing_episodes
-            if ep.get("monitored") is True
-        ]
+        monitored_missing_episodes = [ep for ep in show.episodes if ep.monitored]
 
         if not monitored_missing_episodes:
-            logger.info(f"No missing monitored episodes found for '{show_title}' — skipping.")
+            logger.info(f"No missing monitored episodes found for '{show.title}' — skipping.")
             continue
 
         # Skip future episodes if SKIP_FUTURE_EPISODES is enabled
-        if SKIP_FUTURE_EPISODES:
-            # Get episodes that don't have a future air date
-            current_or_past_episodes = []
-            future_episode_count = 0
-            
-            for ep in monitored_missing_episodes:
-                air_date_str = ep.get("airDateUtc")
-                
-                # If no air date, include it (can't determine if it's future)
-                if not air_date_str:
-                    current_or_past_episodes.append(ep)
-                    continue
-                
-                try:
-                    # Parse the UTC date string
-                    air_date = datetime.datetime.fromisoformat(air_date_str.replace('Z', '+00:00')).date()
-                    if air_date <= current_date:
-                        current_or_past_episodes.append(ep)
-                    else:
-                        future_episode_count += 1
-                except (ValueError, TypeError):
-                    # If date parsing fails, include it anyway
-                    current_or_past_episodes.append(ep)
+        # (episodes without a known air date are included, as we can't tell)
+        if skip_future_episodes:
+            current_or_past_episodes = [ep for ep in monitored_missing_episodes if not ep.is_future(current_date)]
+            future_episode_count = len(monitored_missing_episodes) - len(current_or_past_episodes)
             
             if future_episode_count > 0:
-                logger.info(f"Skipped {future_episode_count} future episodes for '{show_title}'")
+                logger.info(f"Skipped {future_episode_count} future episodes for '{show.title}'")
             
             monitored_missing_episodes = current_or_past_episodes
             
             if not monitored_missing_episodes:
-                logger.info(f"All missing episodes for '{show_title}' are future episodes - skipping.")
+                logger.info(f"All missing episodes for '{show.title}' are future episodes - skipping.")
                 continue
 
-        logger.info(f"Found {len(monitored_missing_episodes)} missing monitored episode(s) for '{show_title}'.")
+        logger.info(f"Found {len(monitored_missing_episodes)} missing monitored episode(s) for '{show.title}'.")
 
-        # Refresh the series only if SKIP_SERIES_REFRESH is not enabled
-        if not SKIP_SERIES_REFRESH:
-            logger.info(f" - Refreshing series (ID: {series_id})...")
-            refresh_res = refresh_series(series_id)
-            if not refresh_res:
-                logger.warning(f"WARNING: Refresh command failed for {show_title}. Skipping.")
-                continue
-            logger.info(f"Refresh command completed successfully.")
-        else:
-            logger.info(f" - Skipping series refresh (SKIP_SERIES_REFRESH=true)")
-
-        # Search specifically for these missing + monitored episodes
-        episode_ids = [ep["id"] for ep in monitored_missing_episodes]
-        logger.info(f" - Searching for {len(episode_ids)} missing episodes in '{show_title}'...")
-        search_res = episode_search_episodes(episode_ids)
-        if search_res:
-            logger.info(f"Search command completed successfully.")
-            processing_done = True
-        else:
-            logger.warning(f"WARNING: EpisodeSearch failed for show '{show_title}' (ID: {series_id}).")
-            continue
+        yield show, monitored_missing_episodes
 
+def _missing_pipeline(current: Settings, quota: Quota) -> Pipeline:
+    """
+    Refresh (unless SKIP_SERIES_REFRESH), search and commit stages for (show, episodes) candidates.
+    A show is marked processed once all of its episodes have been searched; a failed show,
+    or one the download queue only had room for some of, releases its place in `quota`.
+    """
+    def refresh(candidate):
+        show, episodes = candidate
+        logger.info(f" - Refreshing series '{show.title}' (ID: {show.id})...")
+        future = refresh_series_async(show.id)
+        if future is None or not future.result():
+            logger.warning(f"WARNING: Refresh command failed for {show.title}. Skipping.")
+            return None
+        logger.info(f"Refresh command for '{show.title}' completed successfully.")
+        return candidate
+
+    def search(candidate):
+        show, episodes = candidate
+        # Hold the search back (or search fewer episodes) while the download queue is near full
+        allowed = download_throttle.acquire(len(episodes), max_wait=settings.current().sleep_duration,
+                                            cancelled=hunt_control.interrupted)
+        if not allowed:
+            return None
+        searched = episodes[:allowed]
+        logger.info(f" - Searching for {len(searched)} missing episodes in '{show.title}'...")
+        future = episode_search_episodes_async([ep.id for ep in searched])
+        if future is None or not future.result():
+            logger.warning(f"WARNING: EpisodeSearch failed for show '{show.title}' (ID: {show.id}).")
+            return None
+        logger.info(f"Search command for '{show.title}' completed successfully.")
+        if len(searched) < len(episodes):
+            # Shows are marked processed as a whole, so one searched in part stays eligible for the rest
+            logger.info(f"Searched {len(searched)} of {len(episodes)} missing episodes in '{show.title}' - not marking it processed")
+            return None
+        return candidate
+
+    def commit(candidate):
+        show, _ = candidate
         # Mark as processed
-        save_processed_id(PROCESSED_MISSING_FILE, series_id)
-        shows_processed += 1
-        logger.info(f"Processed {shows_processed}/{HUNT_MISSING_SHOWS} missing shows this cycle.")
-
-    # Truncate processed list if needed
-    truncate_processed_list(PROCESSED_MISSING_FILE)
-    
-    return processing_done
\ No newline at end of file
+        save_processed_id(MISSING, show.id)
+        quota.done(1)
+        logger.info(f"Processed {quota.completed}/{quota.limit} missing shows this cycle.")
+        return candidate
+
+    stages = [] if current.skip_series_refresh else [Stage("refresh", refresh, current.pipeline_refresh_workers)]
+    stages += [Stage("search", search, current.pipeline_search_workers), Stage("commit", commit)]
+    return Pipeline("missing", stages, current.pipeline_queue_size, on_drop=lambda candidate: quota.release(1))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compact record types for Huntarr-Sonarr
+Episode and series references built once from Sonarr API records
+"""
+
+import datetime
+from typing import Dict, Iterable, List, Optional
+
+def parse_air_date(air_date_str: Optional[str]) -> Optional[datetime.date]:
+    """Parse Sonarr's airDateUtc (e.g. '2020-01-01T00:00:00Z') into a date, or None."""
+    if not air_date_str:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(air_date_str.replace('Z', '+00:00')).date()
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+class SeriesRef:
+    """A series with the fields the hunt needs, plus the episodes collected for it."""
+
+    __slots__ = ("id", "title", "monitored", "episodes")
+
+    def __init__(self, series_id: int, title: str, monitored: bool):
+        self.id = series_id
+        self.title = title
+        self.monitored = monitored
+        self.episodes: List["EpisodeRef"] = []
+
+    @classmethod
+    def from_series(cls, series: Dict) -> "SeriesRef":
+        """Build from a Sonarr series object (full or embedded in a wanted record)."""
+        return cls(series.get("id"), series.get("title") or "Unknown Series", series.get("monitored") is True)
+
+    def __repr__(self) -> str:
+        return f"SeriesRef(id={self.id}, title={self.title!r}, episodes={len(self.episodes)})"
+
+class EpisodeRef:
+    """An episode with pre-parsed fields, linked to its (shared) SeriesRef."""
+
+    __slots__ = ("id", "series_id", "season_number", "episode_number", "title", "air_date", "monitored", "series")
+
+    def __init__(self, episode_id: int, series_id: int, season_number: Optional[int], episode_number: Optional[int],
+                 title: str, air_date: Optional[datetime.date], monitored: bool, series: Optional[SeriesRef] = None):
+        self.id = episode_id
+        self.series_id = series_id
+        self.season_number = season_number
+        self.episode_number = episode_number
+        self.title = title
+        self.air_date = air_date
+        self.monitored = monitored
+        self.series = series
+
+    @classmethod
+    def from_record(cls, record: Dict, series: Optional[SeriesRef] = None) -> "EpisodeRef":
+        """Build from a wanted/cutoff or wanted/missing record."""
+        return cls(
+            record.get("id"),
+            record.get("seriesId"),
+            record.get("seasonNumber"),
+            record.get("episodeNumber"),
+            record.get("title") or "Unknown Episode Title",
+            parse_air_date(record.get("airDateUtc")),
+            record.get("monitored") is True,
+            series
+        )
+
+    @property
+    def series_title(self) -> str:
+        return self.series.title if self.series is not None else "Unknown Series"
+
+    def is_future(self, today: datetime.date) -> bool:
+        """True if the episode airs after `today`. Episodes without a known air date are not future."""
+        return self.air_date is not None and self.air_date > today
+
+    def label(self) -> str:
+        return f"{self.series_title} - S{self.season_number}E{self.episode_number}"
+
+    def __repr__(self) -> str:
+        return f"EpisodeRef(id={self.id}, series_id={self.series_id}, S{self.season_number}E{self.episode_number})"
+
+def episodes_from_records(records: Iterable[Dict], series_by_id: Dict[int, SeriesRef]) -> List[EpisodeRef]:
+    """
+    Build EpisodeRefs for a page of wanted records.
+    Series are shared through `series_by_id`: a SeriesRef is created from the embedded
+    series object the first time a series is seen. Episodes whose series is neither
+    embedded nor already in `series_by_id` get series=None.
+    """
+    episodes = []
+    for record in records:
+        if not isinstance(record, dict) or not record.get("id"):
+            continue
+        series_id = record.get("seriesId")
+        series = series_by_id.get(series_id)
+        if series is None:
+            embedded = record.get("series")
+            if isinstance(embedded, dict) and embedded.get("title"):
+                series = SeriesRef.from_series(embedded)
+                series.id = series_id
+                series_by_id[series_id] = series
+        episodes.append(EpisodeRef.from_record(record, series))
+    return episodes
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Staged hunt pipeline for Huntarr-Sonarr
+Runs candidate selection, refresh, search and state commit as overlapping stages
+connected by bounded queues
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+from utils.logger import logger
+
+# Seconds between queue depth reports (debug log) while a pipeline is running
+DEPTH_REPORT_INTERVAL = 10
+
+class Quota:
+    """
+    Admission control for a per-cycle limit such as HUNT_MISSING_SHOWS.
+
+    Units are acquired before work enters the pipeline and are either consumed with
+    done() when it succeeds or handed back with release() when it fails, so a failed
+    item frees its place for another candidate while the others are still running.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(limit, 0)
+        self.completed = 0
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, wanted: int) -> int:
+        """
+        Wait until some of the limit is free and take up to `wanted` units of it.
+        Returns 0 once the limit has been reached by completed work.
+        """
+        with self._condition:
+            while True:
+                available = self.limit - self.completed - self.in_flight
+                if available > 0:
+                    granted = min(wanted, available)
+                    self.in_flight += granted
+                    return granted
+                if self.in_flight == 0:
+                    return 0
+                self._condition.wait()
+
+    def set_limit(self, limit: int) -> None:
+        """Change the limit mid-cycle, e.g. after a settings change."""
+        with self._condition:
+            self.limit = max(limit, 0)
+            self._condition.notify_all()
+
+    def release(self, units: int) -> None:
+        """Hand back units of work that failed."""
+        with self._condition:
+            self.in_flight -= units
+            self._condition.notify_all()
+
+    def done(self, units: int) -> None:
+        """Consume units of work that succeeded."""
+        with self._condition:
+            self.in_flight -= units
+            self.completed += units
+            self._condition.notify_all()
+
+class Stage:
+    """
+    One pipeline stage: `workers` threads take items from a bounded input queue and
+    pass `handler(item)` on to the next stage. A handler returns None to drop the item.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Any], workers: int = 1):
+        self.name = name
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.items_in = 0
+        self.items_out = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self.queue: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, passed: bool) -> None:
+        with self._lock:
+            self.items_in += 1
+            self.busy_seconds += seconds
+            if passed:
+                self.items_out += 1
+            else:
+                self.dropped += 1
+
+    def summary(self, elapsed: float) -> str:
+        rate = self.items_in / elapsed if elapsed > 0 else 0.0
+        return (f"{self.name}: {self.items_in} in, {self.items_out} out, {self.dropped} dropped, "
+                f"{rate:.2f}/s, busy {self.busy_seconds:.1f}s over {self.workers} worker(s), "
+                f"max queue depth {self.max_depth}")
+
+# Put on a stage's queue once per worker when its input is exhausted
+_DONE = object()
+
+class Pipeline:
+    """
+    Stages connected by bounded queues of `queue_size` items. run() feeds a source
+    into the first stage from the calling thread; a full queue blocks the stage (or
+    source) in front of it, so nothing is read much further ahead than the slowest
+    stage can keep up with. Items dropped by a handler, or whose handler raised,
+    are passed to `on_drop`, e.g. to release their Quota.
+    """
+
+    def __init__(self, name: str, stages: List[Stage], queue_size: int,
+                 on_drop: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.stages = stages
+        self.queue_size = max(queue_size, 1)
+        self.on_drop = on_drop
+        self.items_fed = 0
+
+    def _worker(self, index: int, remaining: List[int], lock: threading.Lock) -> None:
+        stage = self.stages[index]
+        next_queue = self.stages[index + 1].queue if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            started = time.monotonic()
+            try:
+                result = stage.handler(item)
+            except Exception as e:
+                logger.error(f"Error in {self.name} {stage.name} stage: {e}")
+                result = None
+            stage.record(time.monotonic() - started, result is not None)
+            if result is None:
+                if self.on_drop is not None:
+                    self.on_drop(item)
+                continue
+            if next_queue is not None:
+                self._put(index + 1, result)
+
+        # The last worker of a stage to finish tells the next stage its input is exhausted
+        with lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and next_queue is not None:
+            for _ in range(self.stages[index + 1].workers):
+                next_queue.put(_DONE)
+
+    def _report_depths(self, stop: threading.Event) -> None:
+        while not stop.wait(DEPTH_REPORT_INTERVAL):
+            depths = ", ".join(f"{stage.name} {stage.queue.qsize()}" for stage in self.stages)
+            logger.debug(f"{self.name} pipeline queue depths: {depths}")
+
+    def _put(self, index: int, item: Any) -> None:
+        """Queue an item for a stage, blocking while its queue is full, and note the depth."""
+        stage = self.stages[index]
+        stage.queue.put(item)
+        depth = stage.queue.qsize()
+        with stage._lock:
+            stage.max_depth = max(stage.max_depth, depth)
+
+    def run(self, source: Iterable[Any]) -> None:
+        """Feed every item of `source` through the stages and wait until all of them are done."""
+        for stage in self.stages:
+            stage.queue = queue.Queue(maxsize=self.queue_size)
+
+        remaining = [stage.workers for stage in self.stages]
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self._worker, args=(index, remaining, lock),
+                             name=f"{self.name}-{stage.name}-{number}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for number in range(stage.workers)
+        ]
+        stop = threading.Event()
+        reporter = threading.Thread(target=self._report_depths, args=(stop,), name=f"{self.name}-depths", daemon=True)
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        reporter.start()
+
+        try:
+            for item in source:
+                self.items_fed += 1
+                self._put(0, item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.stages[0].queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+            stop.set()
+
+        elapsed = time.monotonic() - started
+        logger.info(f"{self.name} pipeline: {self.items_fed} fed in {elapsed:.1f}s")
+        for stage in self.stages:
+            logger.info(f"  {stage.summary(elapsed)}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Series refresh registry for Huntarr-Sonarr
+Remembers when each series was last refreshed so recent refreshes aren't repeated
+"""
+
+import json
+import os
+import pathlib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from utils.logger import logger
+
+class RefreshRegistry:
+    """
+    Memoizes RefreshSeries commands per series.
+
+    A series refreshed successfully within the last `freshness_window` seconds is not
+    refreshed again, and concurrent refresh requests for the same series share one
+    command. Last-refresh times are persisted to `path` so they survive restarts.
+    """
+
+    def __init__(self, path: pathlib.Path, freshness_window: float,
+                 start_refresh: Callable[[int], Optional[Future]]):
+        self.path = path
+        self.freshness_window = freshness_window
+        self._start_refresh = start_refresh
+        self._lock = threading.Lock()
+        self._in_flight: Dict[int, Future] = {}
+        self._last_refreshed: Dict[int, float] = self._load()
+
+    def _load(self) -> Dict[int, float]:
+        try:
+            if self.path.exists():
+                with open(self.path, 'r') as f:
+                    return {int(series_id): float(timestamp) for series_id, timestamp in json.load(f).items()}
+        except Exception as e:
+            logger.error(f"Error reading series refresh times from {self.path}: {e}")
+        return {}
+
+    def _save(self) -> None:
+        """Write the refresh times, dropping entries that are no longer fresh."""
+        cutoff = time.time() - self.freshness_window
+        with self._lock:
+            self._last_refreshed = {
+                series_id: timestamp for series_id, timestamp in self._last_refreshed.items() if timestamp >= cutoff
+            }
+            data = {str(series_id): timestamp for series_id, timestamp in self._last_refreshed.items()}
+        try:
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error writing series refresh times to {self.path}: {e}")
+
+    def last_refreshed(self, series_id: int) -> Optional[float]:
+        with self._lock:
+            return self._last_refreshed.get(series_id)
+
+    def is_fresh(self, series_id: int) -> bool:
+        """True if the series was refreshed successfully within the freshness window."""
+        last = self.last_refreshed(series_id)
+        return last is not None and time.time() - last < self.freshness_window
+
+    def refresh(self, series_id: int, force: bool = False) -> Optional[Future]:
+        """
+        Refresh a series unless it is still fresh (or `force` is set).
+        Returns a Future resolving to True once the series is known to be up to date,
+        or None if a refresh command could not be started.
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(series_id)
+            if in_flight is not None:
+                logger.debug(f"Refresh of series {series_id} already running - waiting on the same command")
+                return in_flight
+
+            last = self._last_refreshed.get(series_id)
+            if not force and last is not None and time.time() - last < self.freshness_window:
+                logger.info(f" - Series {series_id} was refreshed {int((time.time() - last) / 60)} minutes ago - not refreshing again")
+                future = Future()
+                future.set_result(True)
+                return future
+
+            # Register before starting the command, so concurrent callers share it.
+            # The command is started outside the lock as it may wait for a free command slot.
+            shared = Future()
+            self._in_flight[series_id] = shared
+
+        try:
+            command = self._start_refresh(series_id)
+        except BaseException:
+            # Callers already sharing this refresh must not wait on it forever
+            with self._lock:
+                self._in_flight.pop(series_id, None)
+            shared.set_result(False)
+            raise
+        if command is None:
+            with self._lock:
+                self._in_flight.pop(series_id, None)
+            shared.set_result(False)
+            return None
+
+        command.add_done_callback(lambda done: self._finished(series_id, done, shared))
+        return shared
+
+    def _finished(self, series_id: int, command: Future, shared: Future) -> None:
+        succeeded = not command.cancelled() and command.exception() is None and command.result() is True
+        with self._lock:
+            self._in_flight.pop(series_id, None)
+            if succeeded:
+                self._last_refreshed[series_id] = time.time()
+        if succeeded:
+            self._save()
+        shared.set_result(succeeded)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Resilience helpers for Huntarr-Sonarr
+Retry backoff, circuit breaker and rate limiting for Sonarr API calls
+"""
+
+import random
+import threading
+import time
+
+def backoff_delay(attempt: int, base: float = 1, cap: float = 30) -> float:
+    """Jittered exponential backoff: a random delay up to base * 2^attempt, capped at `cap` seconds."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls are
+    refused for `cooldown` seconds. Once the cooldown is over requests are let through
+    again; the next failure re-opens the breaker immediately, a success closes it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 300):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a request may be attempted now."""
+        return self.remaining_cooldown() <= 0
+
+    def is_open(self) -> bool:
+        """True while requests are being refused."""
+        return not self.allow()
+
+    def remaining_cooldown(self) -> float:
+        """Seconds until requests are let through again (0 if the breaker is closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, self._opened_at + self.cooldown - time.time())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> bool:
+        """Count a failure. Returns True if this failure opened the breaker."""
+        with self._lock:
+            now = time.time()
+            self._failures += 1
+            if self._opened_at is not None and now < self._opened_at + self.cooldown:
+                # Already open - a late failure from an in-flight request doesn't extend the cooldown
+                return False
+            # A failure after the cooldown (half-open) or past the threshold (re)opens the breaker
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = now
+                return True
+            return False
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter.
+    Allows bursts of up to `capacity` calls and `rate` calls per second on average.
+    A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
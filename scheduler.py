@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Priority scheduling for Huntarr-Sonarr
+Orders shows and episodes so the ones most worth searching are searched first
+"""
+
+import datetime
+import heapq
+import random
+import time
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from utils.logger import logger
+
+T = TypeVar("T")
+
+# Weight of each factor in an item's score (each factor is between 0 and 1)
+STALENESS_WEIGHT = 0.4
+RECENCY_WEIGHT = 0.3
+MONITORED_WEIGHT = 0.2
+FAILURE_WEIGHT = 0.1
+
+# An episode that aired this many days ago gets half the air date factor of a new one
+RECENCY_HALF_LIFE_DAYS = 365
+
+class Priority:
+    """An item's score and the factors that make it up, for explaining the choice."""
+
+    __slots__ = ("score", "factors")
+
+    def __init__(self):
+        self.score = 0.0
+        self.factors: List[Tuple[str, float]] = []
+
+    def add(self, reason: str, value: float) -> None:
+        self.score += value
+        self.factors.append((reason, value))
+
+    def explain(self) -> str:
+        return f"score {self.score:.2f} (" + ", ".join(f"{reason} {value:+.2f}" for reason, value in self.factors) + ")"
+
+def score(last_searched: Optional[float], attempts: int, air_date: Optional[datetime.date], monitored: bool,
+          now: float, today: datetime.date, reset_interval_hours: float,
+          random_weight: float = 0.0, rng: Optional[random.Random] = None) -> Priority:
+    """
+    Score one item:
+    - staleness: 1 if never searched, otherwise rising towards 1 with the time since its last
+      search (0.5 once STATE_RESET_INTERVAL_HOURS have passed)
+    - recency: halves for every RECENCY_HALF_LIFE_DAYS since it aired (unknown air date: 0)
+    - monitored: 1 if monitored
+    - failures: 1 / (1 + previous searches that didn't resolve it)
+    - random: up to `random_weight`, so equal items are picked in varying order
+    """
+    priority = Priority()
+
+    if last_searched is None:
+        priority.add("never searched", STALENESS_WEIGHT)
+    else:
+        interval = max(reset_interval_hours, 1) * 3600
+        age = max(now - last_searched, 0)
+        priority.add(f"last searched {age / 3600:.0f}h ago", STALENESS_WEIGHT * (1 - 0.5 ** (age / interval)))
+
+    if air_date is None:
+        priority.add("air date unknown", 0.0)
+    else:
+        days = max((today - air_date).days, 0)
+        priority.add(f"aired {days}d ago", RECENCY_WEIGHT * 0.5 ** (days / RECENCY_HALF_LIFE_DAYS))
+
+    priority.add("monitored" if monitored else "unmonitored", MONITORED_WEIGHT if monitored else 0.0)
+    priority.add(f"{attempts} earlier searches", FAILURE_WEIGHT / (1 + attempts))
+
+    if random_weight > 0:
+        priority.add("random", random_weight * (rng or random).random())
+
+    return priority
+
+class PriorityScheduler(Generic[T]):
+    """
+    Yields candidates highest score first.
+
+    Candidates arrive in pools (all shows with missing episodes, or a few pages of
+    cutoff-unmet episodes). Each pool is scored in one go - with one search history
+    lookup - and heapified in O(n); each pick is then a heap pop, so taking the top
+    K of N candidates costs O(N + K log N). Candidates are only scored when a pool
+    is reached, so later pools are never fetched if the earlier ones are enough.
+    Equal scores keep the order the candidates arrived in.
+    """
+
+    def __init__(self, label: str, item_id: Callable[[T], int], air_date: Callable[[T], Optional[datetime.date]],
+                 monitored: Callable[[T], bool], describe: Callable[[T], str],
+                 history: Callable[[List[int]], Dict[int, Tuple[float, int]]],
+                 reset_interval_hours: float, random_weight: float = 0.0, rng: Optional[random.Random] = None):
+        self.label = label
+        self.random_weight = random_weight
+        self.reset_interval_hours = reset_interval_hours
+        self._item_id = item_id
+        self._air_date = air_date
+        self._monitored = monitored
+        self._describe = describe
+        self._history = history
+        self._rng = rng or random.Random()
+
+    def _score_pool(self, pool: List[T]) -> List[Priority]:
+        history = self._history([self._item_id(item) for item in pool])
+        now = time.time()
+        today = datetime.datetime.now().date()
+        priorities = []
+        for item in pool:
+            last_searched, attempts = history.get(self._item_id(item), (None, 0))
+            priorities.append(score(last_searched, attempts, self._air_date(item), self._monitored(item),
+                                    now, today, self.reset_interval_hours, self.random_weight, self._rng))
+        return priorities
+
+    def ranked(self, pools: Iterable[List[T]]) -> Iterator[T]:
+        for pool in pools:
+            if not pool:
+                continue
+            heap = [(-priority.score, index, priority) for index, priority in enumerate(self._score_pool(pool))]
+            heapq.heapify(heap)
+            logger.debug(f"Ranking {len(pool)} {self.label}")
+            while heap:
+                _, index, priority = heapq.heappop(heap)
+                logger.debug(f"Picked {self._describe(pool[index])}: {priority.explain()}")
+                yield pool[index]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Series metadata cache for Huntarr-Sonarr
+Keeps series objects in memory so per-series lookups don't hit the Sonarr API
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class SeriesCache:
+    """
+    In-process cache of Sonarr series objects keyed by series ID.
+
+    Entries expire `ttl` seconds after they were stored, and the least recently
+    used entries are evicted once more than `max_size` series are cached.
+    Hits and misses are counted so the cache's effectiveness can be logged.
+    """
+
+    def __init__(self, ttl: int = 900, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max(max_size, 1)
+        self.hits = 0
+        self.misses = 0
+        self.warmed_at = 0.0
+        self._entries: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        """True if the cache has not been filled from a bulk series fetch within the TTL."""
+        return time.time() - self.warmed_at >= self.ttl
+
+    def warm(self, series_list: List[Dict]) -> None:
+        """Replace the cache contents with a full list of series."""
+        now = time.time()
+        with self._lock:
+            self._entries.clear()
+            for series in series_list:
+                if isinstance(series, dict) and series.get("id") is not None:
+                    self._store(series["id"], series, now)
+            self.warmed_at = now
+
+    def get(self, series_id: int) -> Optional[Dict]:
+        """Return the cached series, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(series_id)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(series_id)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[series_id]
+            self.misses += 1
+            return None
+
+    def get_many(self, series_ids: Iterable[int]) -> Tuple[Dict[int, Dict], List[int]]:
+        """Look up several series. Returns (found series by ID, IDs that were not cached)."""
+        found = {}
+        missing = []
+        for series_id in series_ids:
+            series = self.get(series_id)
+            if series is not None:
+                found[series_id] = series
+            else:
+                missing.append(series_id)
+        return found, missing
+
+    def put(self, series_id: int, series: Dict) -> None:
+        """Store a single series."""
+        with self._lock:
+            self._store(series_id, series, time.time())
+
+    def _store(self, series_id: int, series: Dict, stored_at: float) -> None:
+        self._entries[series_id] = (stored_at, series)
+        self._entries.move_to_end(series_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> str:
+        """A one-line summary of the cache counters for logging."""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0
+        return f"{len(self._entries)} series cached, {self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate)"
@@ -5,21 +5,34 @@ Handles loading, saving, and providing settings from a JSON file
 """
 
 import os
+import copy
 import json
 import pathlib
 import logging
-from typing import Dict, Any, Optional
+import threading
+import types
+import contextlib
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process file locking (e.g. Windows); writes are still atomic
+    fcntl = None
 
 # Create a simple logger for settings_manager
 logging.basicConfig(level=logging.INFO)
 settings_logger = logging.getLogger("settings_manager")
 
 # Settings directory setup
-SETTINGS_DIR = pathlib.Path("/config/settings")
+SETTINGS_DIR = pathlib.Path(os.environ.get("CONFIG_DIR", "/config")) / "settings"
 SETTINGS_DIR.mkdir(parents=True, exist_ok=True)
 
 SETTINGS_FILE = SETTINGS_DIR / "huntarr.json"
 
+# Held while the settings file is read, changed and written, by any process
+SETTINGS_LOCK_FILE = SETTINGS_DIR / "huntarr.json.lock"
+
 # Default settings
 DEFAULT_SETTINGS = {
     "ui": {
@@ -46,48 +59,275 @@ DEFAULT_SETTINGS = {
     }
 }
 
+# Settings configured by environment variable only. The web UI doesn't show them, so
+# they aren't written to huntarr.json; a value in the file (e.g. written by hand) is
+# used unless the environment variable is set
+ENVIRONMENT_SETTINGS = {
+    "huntarr": {
+        "series_refresh_freshness_minutes": 60
+    },
+    "advanced": {
+        "command_max_outstanding": 10,
+        "api_max_concurrency": 4,
+        "api_pool_size": 10,
+        "wanted_prefetch_pages": 1,
+        "series_cache_ttl": 900,
+        "series_cache_size": 10000,
+        "api_retries": 3,
+        "api_retry_backoff": 1.0,
+        "circuit_breaker_threshold": 5,
+        "circuit_breaker_cooldown": 300,
+        "api_rate_limit": 20.0,
+        "api_fast_decode": True,
+        "api_decode_stats": False,
+        "wanted_delta_sync": False,
+        "wanted_full_resync_minutes": 360,
+        "wanted_cache_max_records": 10000,
+        "upgrade_search_batch_size": 10,
+        "upgrade_batch_by_series": False,
+        "state_backend": "sqlite",
+        "priority_scheduling": False,
+        "priority_random_weight": 0.2,
+        "priority_upgrade_pages": 5,
+        "pipeline_refresh_workers": 4,
+        "pipeline_search_workers": 4,
+        "pipeline_queue_size": 8,
+        "download_queue_high_water": -1,
+        "download_queue_low_water": -1,
+        "download_queue_sample_seconds": 30,
+        "download_queue_count_commands": False
+    }
+}
+
+def _freeze(value: Any) -> Any:
+    """A read-only view of parsed JSON: dicts become mappingproxies, lists tuples."""
+    if isinstance(value, dict):
+        return types.MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _thaw(value: Any) -> Any:
+    """A plain, mutable copy of a frozen snapshot."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+class SettingsValidationError(ValueError):
+    """A settings update that doesn't match the categories, keys and types of DEFAULT_SETTINGS (or ENVIRONMENT_SETTINGS)."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+def _matches_type(value: Any, default: Any) -> bool:
+    """Whether `value` has the JSON type of the default value for its setting."""
+    if isinstance(default, bool):
+        return isinstance(value, bool)
+    if isinstance(default, int):
+        return isinstance(value, int) and not isinstance(value, bool)
+    if isinstance(default, float):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, type(default))
+
+def validate_changes(changes: Any) -> List[str]:
+    """Check {category: {key: value}} against DEFAULT_SETTINGS and ENVIRONMENT_SETTINGS; returns the problems found."""
+    if not isinstance(changes, Mapping):
+        return ["settings must be an object of categories"]
+    errors = []
+    for category, values in changes.items():
+        if category not in DEFAULT_SETTINGS:
+            errors.append(f"unknown category '{category}'")
+            continue
+        defaults = {**DEFAULT_SETTINGS[category], **ENVIRONMENT_SETTINGS.get(category, {})}
+        if not isinstance(values, Mapping):
+            errors.append(f"'{category}' must be an object of settings")
+            continue
+        for key, value in values.items():
+            if key not in defaults:
+                errors.append(f"unknown setting {category}.{key}")
+            elif not _matches_type(value, defaults[key]):
+                errors.append(f"{category}.{key} must be of type {type(defaults[key]).__name__}, got {value!r}")
+    return errors
+
+class SettingsCache:
+    """
+    The parsed settings file, kept in memory until the file changes.
+
+    Every read stats the file and only re-parses it when its mtime, size or inode
+    differ from the last load, so other processes' writes (the web server's) are
+    picked up on the next read. Writes made through this module update the cache
+    directly; notify() forces a re-read. Readers share one immutable snapshot.
+
+    The file is always replaced whole (temp file, fsync, rename), so a reader never
+    sees it half-written, and changes are made under a lock file so that writers in
+    different processes don't overwrite each other's changes.
+    """
+
+    def __init__(self, path: pathlib.Path, lock_path: pathlib.Path):
+        self.path = path
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Mapping[str, Any]] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self.reads = 0
+        self.reloads = 0
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Hold the lock file (if the platform supports it) for a read-change-write."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self) -> Mapping[str, Any]:
+        """Re-read the file if it changed since the last load. Call with the lock held."""
+        signature = self._stat()
+        if self._snapshot is not None and signature == self._signature:
+            return self._snapshot
+
+        if signature is None:
+            # Reads never write: the file is created by create() (or the next change) under the file lock
+            settings_logger.info("No settings file found, using default values")
+            self._snapshot = _freeze(copy.deepcopy(DEFAULT_SETTINGS))
+            self._signature = None
+            return self._snapshot
+
+        try:
+            with open(self.path, 'r') as f:
+                settings = json.load(f)
+            self.reloads += 1
+            settings_logger.info("Settings loaded from configuration file")
+        except Exception as e:
+            settings_logger.error(f"Error loading settings: {e}")
+            settings_logger.info("Using default settings due to error")
+            settings = DEFAULT_SETTINGS
+        self._snapshot = _freeze(settings)
+        self._signature = signature
+        return self._snapshot
+
+    def get(self) -> Mapping[str, Any]:
+        """The current settings as an immutable snapshot, re-read only if the file changed."""
+        with self._lock:
+            self.reads += 1
+            return self._refresh()
+
+    def _write(self, settings: Mapping[str, Any]) -> bool:
+        """Replace the settings file atomically. Call with the lock held."""
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(settings, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            settings_logger.error(f"Error saving settings: {e}")
+            with contextlib.suppress(OSError):
+                tmp_path.unlink()
+            self._snapshot = None
+            return False
+        self._snapshot = _freeze(copy.deepcopy(settings))
+        self._signature = self._stat()
+        settings_logger.info("Settings saved successfully")
+        return True
+
+    def save(self, settings: Dict[str, Any]) -> bool:
+        with self._lock, self._file_lock():
+            return self._write(settings)
+
+    def create(self, settings: Mapping[str, Any]) -> None:
+        """Write `settings` unless a settings file exists (checked again under the file lock)."""
+        with self._lock, self._file_lock():
+            if self._stat() is None:
+                settings_logger.info("No settings file found, creating with default values")
+                self._write(settings)
+
+    def update(self, changes: Mapping[str, Mapping[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Apply {category: {key: value}} with one read and (if anything changed) one write.
+        Returns the settings that changed as {category: {key: {"old": ..., "new": ...}}}.
+        Raises SettingsValidationError, leaving the file untouched, if any value doesn't
+        fit DEFAULT_SETTINGS, and OSError if the file couldn't be written.
+        """
+        errors = validate_changes(changes)
+        if errors:
+            raise SettingsValidationError(errors)
+
+        with self._lock, self._file_lock():
+            current = self._refresh()
+            changed: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for category, values in changes.items():
+                section = current.get(category, {})
+                for key, value in values.items():
+                    if key not in section or section[key] != value:
+                        changed.setdefault(category, {})[key] = {"old": section.get(key), "new": value}
+            if not changed:
+                return changed
+
+            settings = _thaw(current)
+            for category, values in changed.items():
+                for key, change in values.items():
+                    settings.setdefault(category, {})[key] = change["new"]
+            if not self._write(settings):
+                raise OSError(f"Could not write {self.path}")
+            return changed
+
+    def notify(self) -> None:
+        """Drop the cached snapshot, e.g. when told the file was rewritten."""
+        with self._lock:
+            self._snapshot = None
+            self._signature = None
+
+    def stats(self) -> str:
+        with self._lock:
+            return f"{self.reads} reads, {self.reloads} file loads"
+
+settings_cache = SettingsCache(SETTINGS_FILE, SETTINGS_LOCK_FILE)
+
+def get_settings_snapshot() -> Mapping[str, Any]:
+    """The current settings as a read-only mapping; cheap while the file is unchanged."""
+    return settings_cache.get()
+
+def notify_settings_changed() -> None:
+    """Tell this process the settings file changed outside of save_settings()."""
+    settings_cache.notify()
+
 def load_settings() -> Dict[str, Any]:
     """Load settings from the settings file, or return defaults if not available."""
-    try:
-        if SETTINGS_FILE.exists():
-            with open(SETTINGS_FILE, 'r') as f:
-                settings = json.load(f)
-                settings_logger.info("Settings loaded from configuration file")
-                return settings
-        else:
-            settings_logger.info("No settings file found, creating with default values")
-            save_settings(DEFAULT_SETTINGS)
-            return DEFAULT_SETTINGS
-    except Exception as e:
-        settings_logger.error(f"Error loading settings: {e}")
-        settings_logger.info("Using default settings due to error")
-        return DEFAULT_SETTINGS
+    return _thaw(settings_cache.get())
 
 def save_settings(settings: Dict[str, Any]) -> bool:
     """Save settings to the settings file."""
-    try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f, indent=2)
-        settings_logger.info("Settings saved successfully")
-        return True
-    except Exception as e:
-        settings_logger.error(f"Error saving settings: {e}")
-        return False
+    return settings_cache.save(settings)
+
+def update_settings(changes: Mapping[str, Mapping[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Update several settings at once, e.g. {"huntarr": {"sleep_duration": 600}}.
+    Returns the changed settings as {category: {key: {"old": ..., "new": ...}}}.
+    """
+    return settings_cache.update(changes)
 
 def update_setting(category: str, key: str, value: Any) -> bool:
     """Update a specific setting value."""
     try:
-        settings = load_settings()
-        
-        # Ensure category exists
-        if category not in settings:
-            settings[category] = {}
-            
-        # Update the value
-        settings[category][key] = value
-        
-        # Save the updated settings
-        return save_settings(settings)
+        update_settings({category: {key: value}})
+        return True
     except Exception as e:
         settings_logger.error(f"Error updating setting {category}.{key}: {e}")
         return False
@@ -95,7 +335,7 @@ def update_setting(category: str, key: str, value: Any) -> bool:
 def get_setting(category: str, key: str, default: Any = None) -> Any:
     """Get a specific setting value."""
     try:
-        settings = load_settings()
+        settings = get_settings_snapshot()
         return settings.get(category, {}).get(key, default)
     except Exception as e:
         settings_logger.error(f"Error getting setting {category}.{key}: {e}")
@@ -107,4 +347,4 @@ def get_all_settings() -> Dict[str, Any]:
 
 # Initialize settings file if it doesn't exist
 if not SETTINGS_FILE.exists():
-    save_settings(DEFAULT_SETTINGS)
\ No newline at end of file
+    settings_cache.create(DEFAULT_SETTINGS)
\ No newline at end of file
@@ -7,8 +7,13 @@ chmod -R 755 /config
 
 # Convert to lowercase
 ENABLE_WEB_UI=$(echo "${ENABLE_WEB_UI:-true}" | tr '[:upper:]' '[:lower:]')
+SINGLE_PROCESS=$(echo "${SINGLE_PROCESS:-false}" | tr '[:upper:]' '[:lower:]')
 
-if [ "$ENABLE_WEB_UI" = "true" ]; then
+if [ "$ENABLE_WEB_UI" = "true" ] && [ "$SINGLE_PROCESS" = "true" ]; then
+    echo "Starting with Web UI enabled on port 8988 (single process)"
+    # The main application serves the web UI from a thread of its own
+    python main.py
+elif [ "$ENABLE_WEB_UI" = "true" ]; then
     echo "Starting with Web UI enabled on port 8988"
     # Start both the web server and the main application
     python web_server.py &
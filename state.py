@@ -7,81 +7,111 @@ Handles tracking which shows/episodes have been processed
 import os
 import time
 import pathlib
-from typing import List
+from typing import Dict, Iterable, Optional, Set, Tuple
 from utils.logger import logger
-from config import STATE_RESET_INTERVAL_HOURS
+import config
+from config import STATE_BACKEND
+from state_store import StateStore, TextStateStore, SQLiteStateStore, BitmapStateStore, Cursor, resume_after
 
 # State directory setup
-STATE_DIR = pathlib.Path("/config/stateful")
+STATE_DIR = pathlib.Path(os.environ.get("CONFIG_DIR", "/config")) / "stateful"
 STATE_DIR.mkdir(parents=True, exist_ok=True)
 
 PROCESSED_MISSING_FILE = STATE_DIR / "processed_missing_ids.txt"
 PROCESSED_UPGRADE_FILE = STATE_DIR / "processed_upgrade_ids.txt"
+STATE_DB_FILE = STATE_DIR / "state.db"
+PROCESSED_MISSING_BITMAP = STATE_DIR / "processed_missing_ids.bin"
+PROCESSED_UPGRADE_BITMAP = STATE_DIR / "processed_upgrade_ids.bin"
+CURSOR_FILE = STATE_DIR / "cursors.json"
 
-# Create files if they don't exist
-PROCESSED_MISSING_FILE.touch(exist_ok=True)
-PROCESSED_UPGRADE_FILE.touch(exist_ok=True)
+# Kinds of processed IDs: shows searched for missing episodes, episodes searched for upgrades
+MISSING = "missing"
+UPGRADE = "upgrade"
 
-def load_processed_ids(file_path: pathlib.Path) -> List[int]:
-    """Load processed show/episode IDs from a file."""
-    try:
-        with open(file_path, 'r') as f:
-            return [int(line.strip()) for line in f if line.strip().isdigit()]
-    except Exception as e:
-        logger.error(f"Error reading processed IDs from {file_path}: {e}")
-        return []
+PROCESSED_FILES = {MISSING: PROCESSED_MISSING_FILE, UPGRADE: PROCESSED_UPGRADE_FILE}
+PROCESSED_BITMAPS = {MISSING: PROCESSED_MISSING_BITMAP, UPGRADE: PROCESSED_UPGRADE_BITMAP}
 
-def save_processed_id(file_path: pathlib.Path, obj_id: int) -> None:
-    """Save a processed show/episode ID to a file."""
+def create_store(backend: str) -> StateStore:
+    """Open the state backend selected by STATE_BACKEND ("sqlite", "text" or "bitmap")."""
+    if backend == "text":
+        return TextStateStore(PROCESSED_FILES, cursor_file=CURSOR_FILE)
+    if backend == "bitmap":
+        # About 24 time buckets per reset interval, at least an hour each
+        bucket_seconds = max(3600, config.STATE_RESET_INTERVAL_HOURS * 3600 / 24)
+        return BitmapStateStore(PROCESSED_BITMAPS, bucket_seconds, import_files=PROCESSED_FILES, cursor_file=CURSOR_FILE)
+    if backend != "sqlite":
+        logger.warning(f"Unknown STATE_BACKEND '{backend}', using sqlite")
     try:
-        with open(file_path, 'a') as f:
-            f.write(f"{obj_id}\n")
+        return SQLiteStateStore(STATE_DB_FILE, import_files=PROCESSED_FILES)
     except Exception as e:
-        logger.error(f"Error writing to {file_path}: {e}")
+        logger.error(f"Error opening state database {STATE_DB_FILE}: {e}. Falling back to text state files.")
+        return TextStateStore(PROCESSED_FILES, cursor_file=CURSOR_FILE)
 
-def truncate_processed_list(file_path: pathlib.Path, max_lines: int = 500) -> None:
-    """Truncate the processed list to prevent unbounded growth."""
-    try:
-        # Only check if file is somewhat large
-        if file_path.stat().st_size > 10000:
-            lines = file_path.read_text().splitlines()
-            if len(lines) > max_lines:
-                logger.info(f"Processed list is large. Truncating to last {max_lines} entries.")
-                with open(file_path, 'w') as f:
-                    f.write('\n'.join(lines[-max_lines:]) + '\n')
-    except Exception as e:
-        logger.error(f"Error truncating {file_path}: {e}")
+# The backend is chosen once per process; changing STATE_BACKEND requires a restart
+store = create_store(STATE_BACKEND)
+
+def processed_ids(kind: str, obj_ids: Iterable[int]) -> Set[int]:
+    """Return which of the given show/episode IDs have already been processed."""
+    return store.processed(kind, obj_ids)
+
+def save_processed_id(kind: str, obj_id: int) -> None:
+    """Mark a show/episode ID as processed. Written to disk by flush_state()."""
+    store.add(kind, [obj_id])
+
+def save_processed_ids(kind: str, obj_ids: Iterable[int]) -> None:
+    """Mark several show/episode IDs as processed. Written to disk by flush_state()."""
+    store.add(kind, obj_ids)
+
+def search_history(kind: str, obj_ids: Iterable[int]) -> Dict[int, Tuple[float, int]]:
+    """(last searched, times searched) for the given IDs that were searched before, even if since expired."""
+    return store.history(kind, obj_ids)
+
+def load_cursor(kind: str) -> Optional[Cursor]:
+    """Where the last sequential walk of a kind stopped, or None to start at the top."""
+    return store.load_cursor(kind)
+
+def save_cursor(kind: str, cursor: Optional[Cursor]) -> None:
+    """Remember where this cycle's sequential walk of a kind stopped."""
+    store.save_cursor(kind, cursor)
+
+def flush_state() -> None:
+    """Write the IDs marked processed this cycle in one go."""
+    store.flush()
+
+def _expiry_cutoff():
+    """Search time before which processed IDs are eligible again, or None if they never expire."""
+    if config.STATE_RESET_INTERVAL_HOURS <= 0:
+        return None
+    return time.time() - config.STATE_RESET_INTERVAL_HOURS * 3600
 
 def check_state_reset() -> None:
-    """Check if state files need to be reset based on their age."""
-    if STATE_RESET_INTERVAL_HOURS <= 0:
+    """Make processed IDs eligible again once STATE_RESET_INTERVAL_HOURS have passed since their own search."""
+    cutoff = _expiry_cutoff()
+    if cutoff is None:
         logger.info("State reset is disabled. Processed items will be remembered indefinitely.")
-        return
     
-    missing_age = time.time() - PROCESSED_MISSING_FILE.stat().st_mtime
-    upgrade_age = time.time() - PROCESSED_UPGRADE_FILE.stat().st_mtime
-    reset_interval_seconds = STATE_RESET_INTERVAL_HOURS * 3600
-    
-    if missing_age >= reset_interval_seconds or upgrade_age >= reset_interval_seconds:
-        logger.info(f"Resetting processed state files (older than {STATE_RESET_INTERVAL_HOURS} hours).")
-        PROCESSED_MISSING_FILE.write_text("")
-        PROCESSED_UPGRADE_FILE.write_text("")
-
-def calculate_reset_time() -> None:
-    """Calculate and display time until the next state reset."""
-    if STATE_RESET_INTERVAL_HOURS <= 0:
+    for kind, label in ((MISSING, "missing shows"), (UPGRADE, "upgrade episodes")):
+        expired = store.expire(kind, cutoff)
+        if expired:
+            logger.info(f"{expired} processed {label} are older than {config.STATE_RESET_INTERVAL_HOURS} hours and can be searched again.")
+
+def calculate_reset_time(limit: int = 3) -> None:
+    """Display when the next processed items become eligible for searching again."""
+    if config.STATE_RESET_INTERVAL_HOURS <= 0:
         logger.info("State reset is disabled. Processed items will be remembered indefinitely.")
         return
     
+    reset_interval_seconds = config.STATE_RESET_INTERVAL_HOURS * 3600
     current_time = time.time()
-    missing_age = current_time - PROCESSED_MISSING_FILE.stat().st_mtime
-    upgrade_age = current_time - PROCESSED_UPGRADE_FILE.stat().st_mtime
+    upcoming = []
+    for kind, label in ((MISSING, "show"), (UPGRADE, "episode")):
+        for obj_id, searched_at in store.next_expiring(kind, limit):
+            upcoming.append((searched_at + reset_interval_seconds - current_time, label, obj_id))
     
-    reset_interval_seconds = STATE_RESET_INTERVAL_HOURS * 3600
-    missing_remaining = reset_interval_seconds - missing_age
-    upgrade_remaining = reset_interval_seconds - upgrade_age
-    
-    remaining_seconds = min(missing_remaining, upgrade_remaining)
-    remaining_minutes = int(remaining_seconds / 60)
+    if not upcoming:
+        logger.info("No processed items are waiting to be searched again.")
+        return
     
-    logger.info(f"State reset will occur in approximately {remaining_minutes} minutes.")
\ No newline at end of file
+    upcoming.sort()
+    next_items = ", ".join(f"{label} {obj_id} in {max(int(remaining / 60), 0)} minutes" for remaining, label, obj_id in upcoming[:limit])
+    logger.info(f"Remembering {store.count(MISSING)} missing shows and {store.count(UPGRADE)} upgrade episodes. Next eligible again: {next_items}.")
@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+State storage backends for Huntarr-Sonarr
+Keeps the processed show/episode IDs in plain text files or in a SQLite database
+"""
+
+import abc
+import heapq
+import itertools
+import json
+import mmap
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+from utils.logger import logger
+from compact_ids import BitmapView, BloomFilter, BucketedIds, serialize_bitmap, serialize_buckets
+
+# Largest number of IDs bound to a single SQLite query
+SQLITE_BATCH_SIZE = 500
+
+T = TypeVar("T")
+
+class Cursor:
+    """
+    Where a sequential walk through a list stopped: the position (0-based) and ID of
+    the last item handled, and how long the list was at the time.
+    """
+
+    __slots__ = ("position", "last_id", "total")
+
+    def __init__(self, position: int, last_id: int, total: int):
+        self.position = position
+        self.last_id = last_id
+        self.total = total
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> Optional["Cursor"]:
+        try:
+            return cls(int(data["position"]), int(data["last_id"]), int(data["total"]))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"position": self.position, "last_id": self.last_id, "total": self.total}
+
+    def earliest_position(self, total: int) -> int:
+        """
+        The earliest position the last item can have moved to in a list now `total` long:
+        items are mostly removed, which moves later items forward by at most the shrinkage.
+        Wraps to 0 if the list is now shorter than that.
+        """
+        position = self.position - max(self.total - total, 0)
+        return position if 0 <= position < total else 0
+
+    def __repr__(self) -> str:
+        return f"Cursor(position={self.position}, last_id={self.last_id}, total={self.total})"
+
+def resume_after(items: List[T], cursor: Optional[Cursor], item_id: Callable[[T], int]) -> List[T]:
+    """
+    `items` rotated to start right after the cursor's last item, wrapping around.
+    If that item is gone, resume at about the position it had.
+    """
+    if cursor is None or not items:
+        return items
+    ids = [item_id(item) for item in items]
+    if cursor.last_id in ids:
+        start = ids.index(cursor.last_id) + 1
+    else:
+        start = cursor.earliest_position(len(items))
+    start %= len(items)
+    return items[start:] + items[:start]
+
+def read_id_log(path: pathlib.Path) -> Tuple[Dict[int, float], int]:
+    """
+    Read a processed ID file with one "id" or "id<TAB>timestamp" line per mark.
+    Returns the newest search time per ID and the number of lines read. Lines
+    without a timestamp are dated by the file's modification time.
+    """
+    ids: Dict[int, float] = {}
+    lines = 0
+    mtime = path.stat().st_mtime
+    with open(path, 'r') as f:
+        for line in f:
+            obj_id, _, searched_at = line.strip().partition("\t")
+            if not obj_id.isdigit():
+                continue
+            try:
+                searched_at = float(searched_at) if searched_at else mtime
+            except ValueError:
+                searched_at = mtime
+            obj_id = int(obj_id)
+            ids[obj_id] = max(searched_at, ids.get(obj_id, 0))
+            lines += 1
+    return ids, lines
+
+class StateStore(abc.ABC):
+    """
+    Processed IDs per kind ("missing" shows, "upgrade" episodes).
+
+    Marks made with add() are buffered and written together by flush(), once per
+    cycle, but are visible to processed() straight away. Each ID remembers when it
+    was last searched; expire() makes IDs searched before a cutoff eligible again.
+    """
+
+    def __init__(self, cursor_file: Optional[pathlib.Path] = None):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[int, float]] = {}
+        self.cursor_file = cursor_file
+        self._cursors: Dict[str, Dict] = {}
+        if cursor_file is not None and cursor_file.exists():
+            try:
+                self._cursors = json.loads(cursor_file.read_text())
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading cursors from {cursor_file}: {e}")
+
+    def add(self, kind: str, ids: Iterable[int]) -> None:
+        now = time.time()
+        with self._lock:
+            pending = self._pending.setdefault(kind, {})
+            for obj_id in ids:
+                pending[int(obj_id)] = now
+
+    def processed(self, kind: str, ids: Iterable[int]) -> Set[int]:
+        """The subset of `ids` that has been processed."""
+        ids = {int(obj_id) for obj_id in ids}
+        if not ids:
+            return set()
+        with self._lock:
+            pending = set(self._pending.get(kind, {}))
+        found = ids & pending
+        remaining = ids - found
+        if remaining:
+            found |= self._stored(kind, remaining)
+        return found
+
+    def flush(self) -> None:
+        """Write all buffered marks."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for kind, marks in pending.items():
+            if marks:
+                self._write(kind, marks)
+
+    @abc.abstractmethod
+    def _stored(self, kind: str, ids: Set[int]) -> Set[int]:
+        ...
+
+    @abc.abstractmethod
+    def _write(self, kind: str, marks: Dict[int, float]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def clear(self, kind: str) -> None:
+        """Forget every processed ID of a kind."""
+        ...
+
+    @abc.abstractmethod
+    def expire(self, kind: str, cutoff: Optional[float]) -> int:
+        """
+        Forget IDs last searched before `cutoff` (None: never expire).
+        Returns how many IDs became eligible again.
+        """
+        ...
+
+    @abc.abstractmethod
+    def next_expiring(self, kind: str, limit: int) -> List[Tuple[int, float]]:
+        """The `limit` processed IDs searched longest ago, as (id, last searched) pairs."""
+        ...
+
+    @abc.abstractmethod
+    def count(self, kind: str) -> int:
+        ...
+
+    def history(self, kind: str, ids: Iterable[int]) -> Dict[int, Tuple[float, int]]:
+        """
+        (last searched, times searched) for those of `ids` that were ever searched,
+        including IDs that have since expired. Backends that forget expired IDs return {}.
+        """
+        return {}
+
+    def load_cursor(self, name: str) -> Optional[Cursor]:
+        """The saved position of a sequential walk (e.g. "upgrade"), or None to start at the top."""
+        data = self._cursors.get(name)
+        return Cursor.from_dict(data) if data else None
+
+    def save_cursor(self, name: str, cursor: Optional[Cursor]) -> None:
+        """Remember (or with None, forget) where a sequential walk stopped."""
+        if cursor is None:
+            self._cursors.pop(name, None)
+        else:
+            self._cursors[name] = cursor.to_dict()
+        if self.cursor_file is None:
+            return
+        temp_path = self.cursor_file.with_suffix(".tmp")
+        try:
+            temp_path.write_text(json.dumps(self._cursors))
+            os.replace(temp_path, self.cursor_file)
+        except OSError as e:
+            logger.error(f"Error writing cursors to {self.cursor_file}: {e}")
+
+class ProcessedIndex:
+    """
+    Processed IDs and their last search time kept in memory, backed by an
+    append-only log file with one "id<TAB>timestamp" line per mark.
+
+    Membership checks never touch the disk. Expiry pops a min-heap ordered by
+    search time, so it only costs as much as the number of IDs expiring. Once the
+    log holds more than `compact_ratio` lines per live ID (and at least
+    `compact_min_lines`), it is rewritten with each live ID once in a background thread.
+    Lines without a timestamp (older files) are dated by the file's modification time.
+    """
+
+    def __init__(self, path: pathlib.Path, compact_ratio: float = 2.0, compact_min_lines: int = 10000):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+        self._lock = threading.Lock()
+        self._ids: Dict[int, float] = {}
+        # (searched_at, id) entries; superseded entries are skipped when popped
+        self._heap: List[Tuple[float, int]] = []
+        self._stale = 0
+        self._log_lines = 0
+        self._compacting = False
+        # Bumped by clear(), so a compaction that started before it is discarded
+        self._generation = 0
+        # Marks appended while a compaction is writing its snapshot
+        self._appended_during_compaction: Dict[int, float] = {}
+        if not self.path.exists():
+            self.path.touch()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            self._ids, self._log_lines = read_id_log(self.path)
+        except Exception as e:
+            logger.error(f"Error reading processed IDs from {self.path}: {e}")
+        self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(searched_at, obj_id) for obj_id, searched_at in self._ids.items()]
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+    @staticmethod
+    def _format(marks: Dict[int, float]) -> str:
+        return "".join(f"{obj_id}\t{searched_at:.0f}\n" for obj_id, searched_at in marks.items())
+
+    def __contains__(self, obj_id: int) -> bool:
+        return obj_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def append(self, marks: Dict[int, float]) -> None:
+        if not marks:
+            return
+        with self._lock:
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(self._format(marks))
+            except Exception as e:
+                logger.error(f"Error writing to {self.path}: {e}")
+            for obj_id, searched_at in marks.items():
+                if obj_id in self._ids:
+                    self._stale += 1
+                self._ids[obj_id] = searched_at
+                heapq.heappush(self._heap, (searched_at, obj_id))
+            self._log_lines += len(marks)
+            if self._compacting:
+                self._appended_during_compaction.update(marks)
+            else:
+                self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if self._log_lines > max(self.compact_min_lines, self.compact_ratio * len(self._ids)):
+            self._compacting = True
+            threading.Thread(target=self._compact, name="state-compaction", daemon=True).start()
+
+    def expire(self, cutoff: float) -> int:
+        """Drop IDs last searched before `cutoff`. Returns how many were dropped."""
+        expired = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] < cutoff:
+                searched_at, obj_id = heapq.heappop(self._heap)
+                if self._ids.get(obj_id) != searched_at:
+                    # Superseded by a later search of the same ID
+                    self._stale -= 1
+                    continue
+                del self._ids[obj_id]
+                self._appended_during_compaction.pop(obj_id, None)
+                expired += 1
+            if expired and not self._compacting:
+                self._maybe_compact()
+        return expired
+
+    def next_expiring(self, limit: int) -> List[Tuple[int, float]]:
+        with self._lock:
+            # At most `_stale` superseded entries can precede the live ones
+            entries = heapq.nsmallest(limit + self._stale, self._heap)
+            live = [(obj_id, searched_at) for searched_at, obj_id in entries if self._ids.get(obj_id) == searched_at]
+        return live[:limit]
+
+    def _compact(self) -> None:
+        """Rewrite the log with every live ID once, keeping marks appended in the meantime."""
+        with self._lock:
+            snapshot = dict(self._ids)
+            generation = self._generation
+        temp_path = self.path.with_suffix(".compact")
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(self._format(snapshot))
+            with self._lock:
+                if generation != self._generation:
+                    # Cleared in the meantime - the snapshot is stale
+                    os.remove(temp_path)
+                    return
+                appended, self._appended_during_compaction = self._appended_during_compaction, {}
+                # IDs that expired while the snapshot was written stay in the file
+                # and simply expire again when it is next loaded
+                with open(temp_path, 'a') as f:
+                    f.write(self._format(appended))
+                os.replace(temp_path, self.path)
+                previous_lines, self._log_lines = self._log_lines, len(snapshot) + len(appended)
+            logger.debug(f"Compacted {self.path.name} from {previous_lines} to {len(snapshot) + len(appended)} lines")
+        except Exception as e:
+            logger.error(f"Error compacting {self.path}: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+                self._appended_during_compaction = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.path.write_text("")
+            self._ids.clear()
+            self._heap = []
+            self._stale = 0
+            self._log_lines = 0
+            # A running compaction must not bring back the cleared IDs
+            self._generation += 1
+            self._appended_during_compaction = {}
+
+class TextStateStore(StateStore):
+    """Processed IDs in resident ProcessedIndexes backed by the processed_*_ids.txt files."""
+
+    def __init__(self, files: Dict[str, pathlib.Path], cursor_file: Optional[pathlib.Path] = None):
+        super().__init__(cursor_file)
+        self.files = files
+        self._indexes = {kind: ProcessedIndex(file_path) for kind, file_path in files.items()}
+
+    def _stored(self, kind: str, ids: Set[int]) -> Set[int]:
+        index = self._indexes[kind]
+        return {obj_id for obj_id in ids if obj_id in index}
+
+    def _write(self, kind: str, marks: Dict[int, float]) -> None:
+        self._indexes[kind].append(marks)
+
+    def clear(self, kind: str) -> None:
+        self._indexes[kind].clear()
+
+    def expire(self, kind: str, cutoff: Optional[float]) -> int:
+        if cutoff is None:
+            return 0
+        return self._indexes[kind].expire(cutoff)
+
+    def next_expiring(self, kind: str, limit: int) -> List[Tuple[int, float]]:
+        return self._indexes[kind].next_expiring(limit)
+
+    def count(self, kind: str) -> int:
+        return len(self._indexes[kind])
+
+class SQLiteStateStore(StateStore):
+    """
+    Processed IDs in a SQLite database (WAL mode), one row per (kind, id) with the
+    time it was first seen, last searched and how many times it has been searched.
+    Existing text files are imported the first time the database is opened.
+
+    Rows are kept when they expire, so first_seen and attempts survive; an ID only
+    counts as processed while its last_searched is at or after the kind's cutoff,
+    which the (kind, last_searched) index answers directly.
+    """
+
+    def __init__(self, path: pathlib.Path, import_files: Optional[Dict[str, pathlib.Path]] = None):
+        super().__init__()
+        self.path = path
+        self._db_lock = threading.Lock()
+        self._cutoffs: Dict[str, float] = {}
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " kind TEXT NOT NULL,"
+            " id INTEGER NOT NULL,"
+            " first_seen REAL NOT NULL,"
+            " last_searched REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 1,"
+            " PRIMARY KEY (kind, id)"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS processed_last_searched ON processed (kind, last_searched)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        for kind, file_path in (import_files or {}).items():
+            self._import_text_file(kind, file_path)
+            self._cutoffs[kind] = float(self._get_meta(f"cutoff:{kind}") or 0)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _import_text_file(self, kind: str, file_path: pathlib.Path) -> None:
+        """Import a processed_*_ids.txt file once."""
+        with self._db_lock:
+            if self._get_meta(f"imported:{kind}") is not None:
+                return
+            imported = 0
+            try:
+                if file_path.exists():
+                    ids, _ = read_id_log(file_path)
+                    self._db.execute("BEGIN")
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO processed (kind, id, first_seen, last_searched, attempts) VALUES (?, ?, ?, ?, 1)",
+                        ((kind, obj_id, searched_at, searched_at) for obj_id, searched_at in ids.items())
+                    )
+                    self._set_meta(f"imported:{kind}", time.time())
+                    self._db.execute("COMMIT")
+                    imported = len(ids)
+                else:
+                    self._set_meta(f"imported:{kind}", time.time())
+            except Exception as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                logger.error(f"Error importing processed IDs from {file_path}: {e}")
+                return
+        if imported:
+            logger.info(f"Imported {imported} processed {kind} IDs from {file_path} into {self.path}")
+
+    def _stored(self, kind: str, ids: Set[int]) -> Set[int]:
+        found = set()
+        ids = list(ids)
+        cutoff = self._cutoffs.get(kind, 0)
+        with self._db_lock:
+            for start in range(0, len(ids), SQLITE_BATCH_SIZE):
+                chunk = ids[start:start + SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT id FROM processed WHERE kind = ? AND last_searched >= ? AND id IN ({placeholders})",
+                    (kind, cutoff, *chunk)
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def _write(self, kind: str, marks: Dict[int, float]) -> None:
+        # One transaction for every mark buffered this cycle
+        try:
+            with self._db_lock:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT INTO processed (kind, id, first_seen, last_searched, attempts) VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT (kind, id) DO UPDATE SET last_searched = excluded.last_searched, attempts = attempts + 1",
+                    ((kind, obj_id, searched_at, searched_at) for obj_id, searched_at in marks.items())
+                )
+                self._db.execute("COMMIT")
+        except Exception as e:
+            with self._db_lock:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+            logger.error(f"Error writing processed {kind} IDs to {self.path}: {e}")
+
+    def clear(self, kind: str) -> None:
+        with self._db_lock:
+            self._db.execute("DELETE FROM processed WHERE kind = ?", (kind,))
+
+    def expire(self, kind: str, cutoff: Optional[float]) -> int:
+        previous = self._cutoffs.get(kind, 0)
+        cutoff = cutoff or 0
+        if cutoff == previous:
+            return 0
+        self._cutoffs[kind] = cutoff
+        if cutoff < previous:
+            # Interval raised or expiry disabled: older searches count as processed again
+            with self._db_lock:
+                self._set_meta(f"cutoff:{kind}", cutoff)
+            return 0
+        # Only the index range between the old and the new cutoff is read
+        with self._db_lock:
+            self._set_meta(f"cutoff:{kind}", cutoff)
+            return self._db.execute(
+                "SELECT COUNT(*) FROM processed WHERE kind = ? AND last_searched >= ? AND last_searched < ?",
+                (kind, previous, cutoff)
+            ).fetchone()[0]
+
+    def next_expiring(self, kind: str, limit: int) -> List[Tuple[int, float]]:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT id, last_searched FROM processed WHERE kind = ? AND last_searched >= ? "
+                "ORDER BY last_searched LIMIT ?",
+                (kind, self._cutoffs.get(kind, 0), limit)
+            ).fetchall()
+
+    def count(self, kind: str) -> int:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM processed WHERE kind = ? AND last_searched >= ?", (kind, self._cutoffs.get(kind, 0))
+            ).fetchone()[0]
+
+    def history(self, kind: str, ids: Iterable[int]) -> Dict[int, Tuple[float, int]]:
+        found = {}
+        ids = list({int(obj_id) for obj_id in ids})
+        with self._db_lock:
+            for start in range(0, len(ids), SQLITE_BATCH_SIZE):
+                chunk = ids[start:start + SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT id, last_searched, attempts FROM processed WHERE kind = ? AND id IN ({placeholders})",
+                    (kind, *chunk)
+                )
+                found.update((row[0], (row[1], row[2])) for row in rows)
+        return found
+
+    def load_cursor(self, name: str) -> Optional[Cursor]:
+        with self._db_lock:
+            value = self._get_meta(f"cursor:{name}")
+        try:
+            return Cursor.from_dict(json.loads(value)) if value else None
+        except ValueError:
+            return None
+
+    def save_cursor(self, name: str, cursor: Optional[Cursor]) -> None:
+        with self._db_lock:
+            if cursor is None:
+                self._db.execute("DELETE FROM meta WHERE key = ?", (f"cursor:{name}",))
+            else:
+                self._set_meta(f"cursor:{name}", json.dumps(cursor.to_dict()))
+
+class BitmapStateStore(StateStore):
+    """
+    Processed IDs in one compact binary file per kind, memory-mapped and queried in place.
+
+    IDs are grouped into time buckets of `bucket_seconds` by search time, each bucket
+    a roaring-style bitmap, with a Bloom filter over all IDs checked first. Expiry
+    drops whole buckets once their newest search is older than the cutoff, so an ID
+    can be remembered up to one bucket width longer than the reset interval.
+    Existing text files are imported when a kind has no bitmap file yet.
+    """
+
+    def __init__(self, files: Dict[str, pathlib.Path], bucket_seconds: float,
+                 import_files: Optional[Dict[str, pathlib.Path]] = None, cursor_file: Optional[pathlib.Path] = None):
+        super().__init__(cursor_file)
+        self.files = files
+        self.bucket_seconds = max(bucket_seconds, 1)
+        self._files_lock = threading.Lock()
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._views: Dict[str, BucketedIds] = {}
+        for kind, file_path in files.items():
+            legacy = (import_files or {}).get(kind)
+            if not file_path.exists() and legacy is not None and legacy.exists():
+                self._import_text_file(kind, legacy)
+            self._open(kind)
+
+    def _import_text_file(self, kind: str, legacy: pathlib.Path) -> None:
+        try:
+            ids, _ = read_id_log(legacy)
+        except Exception as e:
+            logger.error(f"Error importing processed IDs from {legacy}: {e}")
+            return
+        self._write(kind, ids)
+        if ids:
+            logger.info(f"Imported {len(ids)} processed {kind} IDs from {legacy} into {self.files[kind]}")
+
+    def _open(self, kind: str) -> None:
+        """(Re)map the kind's file. Called with _files_lock held or before the store is shared."""
+        previous = self._maps.pop(kind, None)
+        self._views.pop(kind, None)
+        if previous is not None:
+            previous.close()
+        file_path = self.files[kind]
+        try:
+            if file_path.exists() and file_path.stat().st_size > 0:
+                with open(file_path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._views[kind] = BucketedIds(mapped)
+                self._maps[kind] = mapped
+        except Exception as e:
+            logger.error(f"Error reading processed IDs from {file_path}: {e}")
+
+    def _replace(self, kind: str, data: bytes) -> None:
+        file_path = self.files[kind]
+        temp_path = file_path.with_suffix(".tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+        self._open(kind)
+
+    def _stored(self, kind: str, ids: Set[int]) -> Set[int]:
+        with self._files_lock:
+            view = self._views.get(kind)
+            if view is None:
+                return set()
+            return {obj_id for obj_id in ids if obj_id in view}
+
+    def _write(self, kind: str, marks: Dict[int, float]) -> None:
+        # Only the buckets receiving marks are decoded; the others are copied as they are
+        grouped: Dict[float, Dict[int, float]] = {}
+        for obj_id, searched_at in marks.items():
+            grouped.setdefault(searched_at // self.bucket_seconds * self.bucket_seconds, {})[obj_id] = searched_at
+        try:
+            with self._files_lock:
+                view = self._views.get(kind)
+                buckets: Dict[float, List] = {}
+                total = 0
+                bloom = None
+                if view is not None:
+                    for index, (bucket_start, newest, bitmap, _, _) in enumerate(view.buckets):
+                        buckets[bucket_start] = [newest, view.raw_bitmap(index), bitmap]
+                    new_ids = [obj_id for obj_id in marks if obj_id not in view]
+                    total = view.total + len(new_ids)
+                    if total <= view.bloom.capacity:
+                        bloom = view.bloom.copy()
+                        for obj_id in new_ids:
+                            bloom.add(obj_id)
+                else:
+                    total = len(marks)
+
+                for bucket_start, bucket_marks in grouped.items():
+                    newest = max(bucket_marks.values())
+                    if bucket_start in buckets:
+                        previous_newest, _, bitmap = buckets[bucket_start]
+                        ids = set(bitmap) | set(bucket_marks)
+                        newest = max(newest, previous_newest)
+                    else:
+                        ids = set(bucket_marks)
+                    buckets[bucket_start] = [newest, serialize_bitmap(ids), None]
+
+                if bloom is None:
+                    # New, or grown past the filter's capacity: rebuild it with some headroom
+                    bloom = BloomFilter.for_capacity(total + max(total // 4, 1024))
+                    for bucket_start in buckets:
+                        for obj_id in self._bucket_ids(buckets[bucket_start]):
+                            bloom.add(obj_id)
+
+                ordered = [(bucket_start, buckets[bucket_start][0], buckets[bucket_start][1]) for bucket_start in sorted(buckets)]
+                self._replace(kind, serialize_buckets(bloom, total, ordered))
+        except Exception as e:
+            logger.error(f"Error writing processed {kind} IDs to {self.files[kind]}: {e}")
+
+    @staticmethod
+    def _bucket_ids(bucket: List) -> Iterable[int]:
+        newest, raw, bitmap = bucket
+        return bitmap if bitmap is not None else BitmapView(raw)
+
+    def clear(self, kind: str) -> None:
+        with self._files_lock:
+            self._replace(kind, b"")
+
+    def expire(self, kind: str, cutoff: Optional[float]) -> int:
+        if cutoff is None:
+            return 0
+        with self._files_lock:
+            view = self._views.get(kind)
+            if view is None or not view.buckets or view.buckets[0][1] >= cutoff:
+                return 0
+            kept = [bucket for bucket in view.buckets if bucket[1] >= cutoff]
+            remaining: Set[int] = set()
+            for bucket in kept:
+                remaining.update(bucket[2])
+            expired = view.total - len(remaining)
+            bloom = BloomFilter.for_capacity(len(remaining) + max(len(remaining) // 4, 1024))
+            for obj_id in remaining:
+                bloom.add(obj_id)
+            ordered = [
+                (bucket_start, newest, view.raw_bitmap(index))
+                for index, (bucket_start, newest, _, _, _) in enumerate(view.buckets) if newest >= cutoff
+            ]
+            self._replace(kind, serialize_buckets(bloom, len(remaining), ordered) if ordered else b"")
+        return expired
+
+    def next_expiring(self, kind: str, limit: int) -> List[Tuple[int, float]]:
+        # Search times are only known per bucket: report IDs of the oldest bucket
+        with self._files_lock:
+            view = self._views.get(kind)
+            if view is None or not view.buckets:
+                return []
+            _, newest, bitmap, _, _ = view.buckets[0]
+            return [(obj_id, newest) for obj_id in itertools.islice(bitmap, limit)]
+
+    def count(self, kind: str) -> int:
+        with self._files_lock:
+            view = self._views.get(kind)
+            return view.total if view is not None else 0
@@ -0,0 +1,11 @@
+"""
+Shared test setup: the repository's modules are imported from its root, and settings
+and state are kept in a temporary directory instead of /config.
+"""
+
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("CONFIG_DIR", tempfile.mkdtemp(prefix="huntarr-test-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
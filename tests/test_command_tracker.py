@@ -0,0 +1,106 @@
+import threading
+import time
+
+from command_tracker import CommandTracker
+
+class FakeSonarr:
+    """Answers command and command/<id> from a dict of command ID -> status."""
+
+    def __init__(self, listed=None, single=None):
+        self.listed = listed if listed is not None else {}
+        self.single = single if single is not None else {}
+        self.requests = []
+
+    def request(self, endpoint):
+        self.requests.append(endpoint)
+        if endpoint == "command":
+            return [{"id": command_id, "status": status} for command_id, status in self.listed.items()]
+        command_id = int(endpoint.rpartition("/")[2])
+        if command_id in self.single:
+            return {"id": command_id, "status": self.single[command_id]}
+        return None
+
+def test_completed_and_failed_commands_resolve_from_one_list_request():
+    sonarr = FakeSonarr({1: "completed", 2: "failed", 3: "Complete", 4: "aborted"})
+    tracker = CommandTracker(sonarr.request, poll_interval=0.1)
+    futures = {command_id: tracker.track(command_id) for command_id in (1, 2, 3, 4)}
+    assert {command_id: future.result(2) for command_id, future in futures.items()} == {1: True, 2: False, 3: True, 4: False}
+    assert sonarr.requests == ["command"]
+    assert tracker.outstanding() == 0
+
+def test_command_missing_from_the_list_is_looked_up_by_id():
+    sonarr = FakeSonarr({1: "started"}, single={7: "completed"})
+    tracker = CommandTracker(sonarr.request, poll_interval=0.1)
+    future = tracker.track(7)
+    assert future.result(2) is True
+    assert sonarr.requests[:2] == ["command", "command/7"]
+
+def test_running_command_resolves_false_after_max_attempts():
+    sonarr = FakeSonarr({1: "started"})
+    tracker = CommandTracker(sonarr.request, poll_interval=0.1, max_attempts=3)
+    future = tracker.track(1)
+    assert future.result(2) is False
+    assert sonarr.requests == ["command"] * 3
+
+def test_command_sonarr_no_longer_knows_times_out():
+    sonarr = FakeSonarr()
+    tracker = CommandTracker(sonarr.request, poll_interval=0.1, max_attempts=2)
+    assert tracker.track(1).result(2) is False
+    assert sonarr.requests == ["command", "command/1"] * 2
+
+def test_poll_errors_are_retried():
+    calls = []
+
+    def request(endpoint):
+        calls.append(endpoint)
+        if len(calls) == 1:
+            raise ConnectionError("Sonarr went away")
+        return [{"id": 1, "status": "completed"}]
+
+    tracker = CommandTracker(request, poll_interval=0.1)
+    assert tracker.track(1).result(2) is True
+    assert len(calls) == 2
+
+def test_status_changes_between_polls_are_picked_up():
+    sonarr = FakeSonarr({1: "queued"})
+    tracker = CommandTracker(sonarr.request, poll_interval=0.1)
+    future = tracker.track(1)
+    time.sleep(0.25)
+    assert not future.done()
+    sonarr.listed[1] = "completed"
+    assert future.result(2) is True
+
+def test_max_outstanding_blocks_until_a_command_finishes():
+    sonarr = FakeSonarr({1: "started", 2: "started"})
+    tracker = CommandTracker(sonarr.request, poll_interval=0.1, max_outstanding=2)
+    for command_id in (1, 2):
+        tracker.acquire_slot()
+        tracker.track(command_id, slot_acquired=True)
+
+    third = threading.Event()
+    waiter = threading.Thread(target=lambda: (tracker.acquire_slot(), third.set()))
+    waiter.start()
+    assert not third.wait(0.3)
+    # A finished command hands its slot to the waiting one
+    sonarr.listed[1] = "completed"
+    assert third.wait(2)
+    waiter.join()
+
+def test_released_slot_is_reused():
+    tracker = CommandTracker(FakeSonarr().request, max_outstanding=1)
+    tracker.acquire_slot()
+    # The command couldn't be started, so its slot is given back
+    tracker.release_slot()
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (tracker.acquire_slot(), acquired.set()), daemon=True).start()
+    assert acquired.wait(2)
+
+def test_poller_stops_when_nothing_is_tracked_and_restarts():
+    sonarr = FakeSonarr({1: "completed", 2: "completed"})
+    tracker = CommandTracker(sonarr.request, poll_interval=0.1)
+    assert tracker.track(1).result(2)
+    deadline = time.monotonic() + 2
+    while tracker._thread is not None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert tracker._thread is None
+    assert tracker.track(2).result(2)
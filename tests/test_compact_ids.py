@@ -0,0 +1,47 @@
+import random
+
+from compact_ids import ARRAY_MAX_SIZE, BitmapView, BloomFilter, BucketedIds, serialize_bitmap, serialize_buckets
+
+def test_bitmap_round_trips_array_and_bitmap_containers():
+    rng = random.Random(1)
+    # A sparse container, a dense one (stored as a bitmap) and IDs far apart
+    ids = set(rng.sample(range(0, 65536), 100)) | set(range(65536, 65536 + ARRAY_MAX_SIZE + 10)) | {2 ** 31, 2 ** 32 - 1}
+    view = BitmapView(serialize_bitmap(ids))
+    assert list(view) == sorted(ids)
+    assert view.cardinality() == len(ids)
+    assert all(obj_id in view for obj_id in ids)
+    absent = next(obj_id for obj_id in range(65536) if obj_id not in ids)
+    assert not any(obj_id in view for obj_id in (absent, 65536 + ARRAY_MAX_SIZE + 10, 2 ** 31 + 1))
+
+def test_empty_bitmap():
+    view = BitmapView(serialize_bitmap([]))
+    assert list(view) == []
+    assert 0 not in view
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter.for_capacity(10000)
+    for obj_id in range(0, 20000, 2):
+        bloom.add(obj_id)
+    assert all(obj_id in bloom for obj_id in range(0, 20000, 2))
+    false_positives = sum(obj_id in bloom for obj_id in range(1, 20000, 2))
+    assert false_positives < 10000 * 0.03
+
+def test_bloom_filter_serializes_and_copies():
+    bloom = BloomFilter.for_capacity(100)
+    bloom.add(42)
+    restored = BloomFilter.from_buffer(b"xx" + bloom.serialize(), 2)
+    assert 42 in restored
+    copy = restored.copy()
+    copy.add(43)
+    assert 43 in copy
+
+def test_bucketed_ids_checks_every_bucket():
+    bloom = BloomFilter.for_capacity(10)
+    for obj_id in (1, 2, 3):
+        bloom.add(obj_id)
+    data = serialize_buckets(bloom, 3, [(0.0, 10.0, serialize_bitmap([1, 2])), (3600.0, 3700.0, serialize_bitmap([3]))])
+    view = BucketedIds(data)
+    assert view.total == 3
+    assert [bucket[1] for bucket in view.buckets] == [10.0, 3700.0]
+    assert {1, 2, 3} == {obj_id for obj_id in range(10) if obj_id in view}
+    assert view.raw_bitmap(1) == serialize_bitmap([3])
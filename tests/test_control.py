@@ -0,0 +1,111 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import control
+from control import Controller, ControlServer, HuntControl, send_command
+from pipeline import Quota
+
+@pytest.fixture
+def controller():
+    reloads = []
+    return Controller(HuntControl(), lambda: reloads.append(1) or len(reloads))
+
+@pytest.fixture
+def server(tmp_path, controller):
+    server = ControlServer(tmp_path / "ctl.sock", controller)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_status_reports_phase_and_tracked_quota(controller):
+    controller.control.set_phase("missing")
+    quota = Quota(5)
+    quota.acquire(2)
+    quota.done(1)
+    controller.control.track(quota)
+    status = controller.dispatch("status")
+    assert status["ok"] and status["phase"] == "missing" and not status["paused"]
+    assert (status["in_flight"], status["completed"], status["limit"]) == (1, 1, 5)
+
+def test_reload_settings_returns_the_new_version_and_wakes_the_sleep(controller):
+    assert controller.dispatch("reload-settings") == {"ok": True, "settings_version": 1}
+    assert controller.dispatch("reload-settings") == {"ok": True, "settings_version": 2}
+    assert controller.control.sleep_until(time.time() + 30, timeout=30) == "reload"
+
+def test_restart_cycle_stops_the_work_in_progress(controller):
+    assert controller.dispatch("restart-cycle") == {"ok": True}
+    assert controller.control.restart_requested()
+    assert not controller.control.checkpoint()
+    assert controller.control.interrupted()
+    controller.control.begin_cycle()
+    assert controller.control.checkpoint()
+
+def test_pause_and_resume(controller):
+    assert controller.dispatch("pause") == {"ok": True, "paused": True}
+    assert controller.control.interrupted()
+    assert controller.dispatch("resume") == {"ok": True, "paused": False}
+    assert not controller.control.interrupted()
+
+def test_run_now_only_starts_a_cycle_while_sleeping(controller):
+    assert controller.dispatch("run-now") == {"ok": True, "started": False}
+    woke = []
+    sleeper = threading.Thread(target=lambda: woke.append(controller.control.sleep_until(time.time() + 30, timeout=30)))
+    sleeper.start()
+    while controller.control.next_cycle_at is None:
+        time.sleep(0.01)
+    assert controller.dispatch("run-now") == {"ok": True, "started": True}
+    sleeper.join(2)
+    assert woke == ["run-now"]
+
+@pytest.mark.parametrize("command", ["stop", None])
+def test_unknown_command_is_an_error(controller, command):
+    response = controller.dispatch(command)
+    assert not response["ok"] and "unknown command" in response["error"]
+
+def test_checkpoint_blocks_while_paused():
+    hunt = HuntControl()
+    hunt.set_paused(True)
+    passed = threading.Event()
+    worker = threading.Thread(target=lambda: hunt.checkpoint() and passed.set())
+    worker.start()
+    assert not passed.wait(0.1)
+    hunt.set_paused(False)
+    assert passed.wait(2)
+
+def test_sleep_until_returns_none_once_the_cycle_is_due():
+    assert HuntControl().sleep_until(time.time() + 0.05, timeout=30) is None
+
+def test_commands_round_trip_over_the_socket(server):
+    assert send_command("pause", path=server.path) == {"ok": True, "paused": True}
+    status = send_command("status", path=server.path)
+    assert status["ok"] and status["paused"]
+    assert not send_command("stop", path=server.path)["ok"]
+
+def test_invalid_request_is_answered_with_an_error(server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(2)
+        sock.connect(str(server.path))
+        sock.sendall(b"not json\n")
+        with sock.makefile("rb") as reader:
+            assert reader.readline() == b'{"ok": false, "error": "invalid request"}\n'
+
+def test_unreachable_hunt_loop_returns_none(tmp_path):
+    assert send_command("status", path=tmp_path / "missing.sock", timeout=1) is None
+
+def test_in_process_controller_skips_the_socket(tmp_path, controller, monkeypatch):
+    monkeypatch.setattr(control, "_local_controller", None)
+    control.serve_in_process(controller)
+    assert send_command("pause", path=tmp_path / "missing.sock") == {"ok": True, "paused": True}
+    assert controller.control.paused
+
+def test_web_server_reload_checks_the_response(monkeypatch):
+    web_server = pytest.importorskip("web_server")
+    for response, expected in [({"ok": True, "settings_version": 3}, None),
+                               (None, "the hunt is not running"),
+                               ({"ok": False, "error": "boom"}, "the hunt couldn't apply them: boom")]:
+        monkeypatch.setattr(web_server, "send_command", lambda command, response=response: response)
+        assert web_server.reload_hunt_settings() == expected
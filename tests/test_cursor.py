@@ -0,0 +1,66 @@
+import upgrade
+from state_store import Cursor, resume_after
+
+def _items(*ids):
+    return list(ids)
+
+def test_cursor_round_trips_through_a_dict():
+    cursor = Cursor.from_dict(Cursor(41, 1234, 500).to_dict())
+    assert (cursor.position, cursor.last_id, cursor.total) == (41, 1234, 500)
+    assert Cursor.from_dict({"position": 1}) is None
+    assert Cursor.from_dict({"position": "x", "last_id": 1, "total": 2}) is None
+
+def test_resume_after_the_saved_item_when_it_is_still_listed():
+    items = _items(10, 11, 12, 13, 14)
+    assert resume_after(items, Cursor(2, 12, 5), lambda item: item) == [13, 14, 10, 11, 12]
+    # The item moved (others were added before it): found by ID, not position
+    assert resume_after(_items(8, 9, 10, 11, 12, 13), Cursor(2, 12, 5), lambda item: item) == [13, 8, 9, 10, 11, 12]
+    # The last item wraps around to the start
+    assert resume_after(items, Cursor(4, 14, 5), lambda item: item) == items
+
+def test_resume_near_the_old_position_when_the_saved_item_was_removed():
+    # Item 12 at position 2 is gone and one item was removed: resume at position 1
+    assert resume_after(_items(10, 11, 13, 14), Cursor(2, 12, 5), lambda item: item) == [11, 13, 14, 10]
+    # Same length (one removed, one added elsewhere): resume at the old position
+    assert resume_after(_items(10, 11, 13, 14, 15), Cursor(2, 12, 5), lambda item: item) == [13, 14, 15, 10, 11]
+
+def test_resume_from_the_top_when_the_list_shrank_below_the_saved_position():
+    assert resume_after(_items(20, 21), Cursor(40, 99, 50), lambda item: item) == [20, 21]
+    assert Cursor(40, 99, 50).earliest_position(2) == 0
+
+def test_resume_without_a_cursor_or_items():
+    assert resume_after(_items(1, 2), None, lambda item: item) == [1, 2]
+    assert resume_after([], Cursor(0, 1, 1), lambda item: item) == []
+
+def _walk(monkeypatch, total_records, cursor):
+    calls = []
+
+    def fake_pages(kind, page_size, start_page=1, cache=None, end_page=None, **kwargs):
+        calls.append((start_page, end_page))
+        return iter(())
+
+    monkeypatch.setattr(upgrade, "iter_wanted_pages", fake_pages)
+    total_pages = -(-total_records // upgrade.CUTOFF_PAGE_SIZE)
+    list(upgrade._sequential_pages(total_records, total_pages, cursor, use_cache=False))
+    return calls
+
+def test_sequential_walk_without_a_cursor_starts_at_page_one(monkeypatch):
+    assert _walk(monkeypatch, 1000, None) == [(1, None)]
+
+def test_sequential_walk_resumes_at_the_cursor_page_and_wraps(monkeypatch):
+    page_size = upgrade.CUTOFF_PAGE_SIZE
+    cursor = Cursor(2 * page_size + 5, 1234, 5 * page_size)
+    assert _walk(monkeypatch, 5 * page_size, cursor) == [(3, None), (1, 2)]
+
+def test_sequential_walk_starts_earlier_when_episodes_were_removed(monkeypatch):
+    page_size = upgrade.CUTOFF_PAGE_SIZE
+    # Position 2.5 pages in, and a page and a half of episodes gone: the saved
+    # episode can have moved forward to page 2 at the earliest
+    cursor = Cursor(2 * page_size + page_size // 2, 1234, 5 * page_size)
+    total_records = 5 * page_size - page_size - page_size // 2
+    assert _walk(monkeypatch, total_records, cursor) == [(2, None), (1, 1)]
+
+def test_sequential_walk_starts_over_when_the_list_shrank_below_the_cursor(monkeypatch):
+    page_size = upgrade.CUTOFF_PAGE_SIZE
+    cursor = Cursor(4 * page_size, 1234, 5 * page_size)
+    assert _walk(monkeypatch, page_size // 2, cursor) == [(1, None)]
@@ -0,0 +1,46 @@
+import concurrent.futures
+import dataclasses
+
+import missing
+from config import settings
+from models import EpisodeRef, SeriesRef
+from pipeline import Quota
+
+class FakeThrottle:
+    def __init__(self, allowed):
+        self.allowed = allowed
+
+    def acquire(self, wanted, max_wait, cancelled=None):
+        return min(wanted, self.allowed)
+
+def _succeeded():
+    future = concurrent.futures.Future()
+    future.set_result(True)
+    return future
+
+def _run(monkeypatch, allowed, episode_count):
+    saved, searched = [], []
+    monkeypatch.setattr(missing, "download_throttle", FakeThrottle(allowed))
+    monkeypatch.setattr(missing, "episode_search_episodes_async", lambda ids: searched.append(ids) or _succeeded())
+    monkeypatch.setattr(missing, "save_processed_id", lambda kind, show_id: saved.append(show_id))
+
+    show = SeriesRef(7, "Show", True)
+    episodes = [EpisodeRef(100 + number, show.id, 1, number, "Episode", None, True, show) for number in range(episode_count)]
+    quota = Quota(1)
+    assert quota.acquire(1) == 1
+    current = dataclasses.replace(settings.current(), skip_series_refresh=True)
+    missing._missing_pipeline(current, quota).run([(show, episodes)])
+    return saved, searched, quota
+
+def test_show_searched_in_full_is_marked_processed(monkeypatch):
+    saved, searched, quota = _run(monkeypatch, allowed=10, episode_count=3)
+    assert searched == [[100, 101, 102]]
+    assert saved == [7]
+    assert (quota.completed, quota.in_flight) == (1, 0)
+
+def test_show_searched_in_part_stays_eligible(monkeypatch):
+    saved, searched, quota = _run(monkeypatch, allowed=2, episode_count=3)
+    assert searched == [[100, 101]]
+    assert saved == []
+    # Its place in the quota is free for another show
+    assert (quota.completed, quota.in_flight) == (0, 0)
@@ -0,0 +1,128 @@
+import threading
+import time
+
+from pipeline import Pipeline, Quota, Stage
+
+def test_quota_grants_up_to_the_free_part_of_the_limit():
+    quota = Quota(5)
+    assert quota.acquire(3) == 3
+    assert quota.acquire(3) == 2
+    quota.done(2)
+    quota.release(3)
+    assert (quota.completed, quota.in_flight) == (2, 0)
+    assert quota.acquire(10) == 3
+
+def test_quota_returns_zero_once_completed_work_reaches_the_limit():
+    quota = Quota(2)
+    assert quota.acquire(2) == 2
+    quota.done(2)
+    assert quota.acquire(1) == 0
+    assert Quota(-1).acquire(1) == 0
+
+def test_quota_waits_for_in_flight_work_and_reuses_released_units():
+    quota = Quota(1)
+    assert quota.acquire(1) == 1
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(quota.acquire(1)))
+    waiter.start()
+    time.sleep(0.05)
+    assert granted == []
+    # A failed unit is handed back and goes to the waiting candidate
+    quota.release(1)
+    waiter.join(2)
+    assert granted == [1]
+
+def test_quota_limit_raised_mid_cycle_wakes_waiters():
+    quota = Quota(1)
+    quota.acquire(1)
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(quota.acquire(1)))
+    waiter.start()
+    quota.set_limit(2)
+    waiter.join(2)
+    assert granted == [1]
+
+def test_quota_limit_lowered_mid_cycle_stops_admitting():
+    quota = Quota(5)
+    quota.acquire(1)
+    quota.done(1)
+    quota.set_limit(1)
+    assert quota.acquire(1) == 0
+
+def test_pipeline_passes_items_through_every_stage():
+    results = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            results.append(item)
+        return item
+
+    stages = [Stage("double", lambda item: item * 2, workers=3), Stage("add", lambda item: item + 1, workers=2),
+              Stage("collect", collect)]
+    pipeline = Pipeline("test", stages, queue_size=2)
+    pipeline.run(range(50))
+    assert sorted(results) == [item * 2 + 1 for item in range(50)]
+    assert pipeline.items_fed == 50
+    assert [(stage.items_in, stage.items_out, stage.dropped) for stage in stages] == [(50, 50, 0)] * 3
+
+def test_dropped_and_failed_items_go_to_on_drop_and_stop():
+    dropped = []
+    reached_end = []
+
+    def check(item):
+        if item == 3:
+            raise ValueError("broken item")
+        return None if item % 2 else item
+
+    stages = [Stage("check", check, workers=2), Stage("end", lambda item: reached_end.append(item) or item)]
+    pipeline = Pipeline("test", stages, queue_size=1, on_drop=dropped.append)
+    pipeline.run(range(8))
+    assert sorted(dropped) == [1, 3, 5, 7]
+    assert sorted(reached_end) == [0, 2, 4, 6]
+    assert (stages[0].items_in, stages[0].items_out, stages[0].dropped) == (8, 4, 4)
+
+def test_quota_accounting_through_a_pipeline_with_failures():
+    quota = Quota(4)
+
+    def admit():
+        for candidate in range(20):
+            if not quota.acquire(1):
+                return
+            yield candidate
+
+    def search(candidate):
+        return None if candidate % 3 == 0 else candidate
+
+    def commit(candidate):
+        quota.done(1)
+        return candidate
+
+    pipeline = Pipeline("test", [Stage("search", search, workers=2), Stage("commit", commit)],
+                        queue_size=1, on_drop=lambda candidate: quota.release(1))
+    pipeline.run(admit())
+    # Failed candidates freed their place for others until 4 succeeded
+    assert (quota.completed, quota.in_flight) == (4, 0)
+
+def test_full_queues_hold_the_source_back():
+    fed = []
+    release = threading.Event()
+
+    def slow(item):
+        release.wait(2)
+        return item
+
+    def source():
+        for item in range(100):
+            fed.append(item)
+            yield item
+
+    pipeline = Pipeline("test", [Stage("slow", slow)], queue_size=2)
+    runner = threading.Thread(target=pipeline.run, args=(source(),))
+    runner.start()
+    time.sleep(0.1)
+    # One item in the worker, two queued, one waiting to be put
+    assert len(fed) <= 4
+    release.set()
+    runner.join(5)
+    assert len(fed) == 100
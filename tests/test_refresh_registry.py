@@ -0,0 +1,56 @@
+import concurrent.futures
+
+import pytest
+
+from refresh_registry import RefreshRegistry
+
+def _registry(tmp_path, start_refresh, freshness_window=3600):
+    return RefreshRegistry(tmp_path / "refreshes.json", freshness_window, start_refresh)
+
+def test_concurrent_refreshes_share_one_command_and_fresh_series_are_skipped(tmp_path):
+    commands = []
+
+    def start_refresh(series_id):
+        commands.append(concurrent.futures.Future())
+        return commands[-1]
+
+    registry = _registry(tmp_path, start_refresh)
+    first = registry.refresh(1)
+    assert registry.refresh(1) is first
+    commands[0].set_result(True)
+    assert first.result(1) is True
+    assert registry.refresh(1).result(1) is True
+    assert len(commands) == 1
+    # Persisted across restarts
+    assert _registry(tmp_path, start_refresh).is_fresh(1)
+
+def test_failed_refresh_is_not_remembered(tmp_path):
+    command = concurrent.futures.Future()
+    registry = _registry(tmp_path, lambda series_id: command)
+    future = registry.refresh(1)
+    command.set_result(False)
+    assert future.result(1) is False
+    assert not registry.is_fresh(1)
+
+def test_refresh_that_cannot_start_releases_waiting_callers(tmp_path):
+    calls = []
+
+    def start_refresh(series_id):
+        calls.append(series_id)
+        if len(calls) == 1:
+            raise ConnectionError("circuit breaker open")
+        command = concurrent.futures.Future()
+        command.set_result(True)
+        return command
+
+    registry = _registry(tmp_path, start_refresh)
+    with pytest.raises(ConnectionError):
+        registry.refresh(1)
+    # The next caller starts a new refresh instead of waiting on the failed one
+    assert registry.refresh(1).result(1) is True
+    assert calls == [1, 1]
+
+def test_refresh_not_started_returns_none(tmp_path):
+    registry = _registry(tmp_path, lambda series_id: None)
+    assert registry.refresh(1) is None
+    assert registry.refresh(1) is None
@@ -0,0 +1,111 @@
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, TokenBucket, backoff_delay
+
+class FakeClock:
+    """Stands in for the time module: sleep() moves the clock instead of waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+def test_backoff_delay_doubles_up_to_the_cap():
+    for attempt, ceiling in [(0, 1), (1, 2), (3, 8), (10, 30)]:
+        delays = [backoff_delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+    assert max(backoff_delay(10) for _ in range(200)) > 15
+
+def test_breaker_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    assert [breaker.record_failure() for _ in range(2)] == [False, False]
+    assert breaker.allow()
+    assert breaker.record_failure() is True
+    assert breaker.is_open() and not breaker.allow()
+    assert breaker.remaining_cooldown() == 60
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    assert [breaker.record_failure() for _ in range(2)] == [False, False]
+    assert breaker.allow()
+
+def test_late_failures_do_not_extend_the_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    assert breaker.record_failure()
+    clock.now += 50
+    assert breaker.record_failure() is False
+    assert breaker.remaining_cooldown() == 10
+
+def test_after_the_cooldown_one_probe_decides(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 60
+    # Half-open: requests are let through again...
+    assert breaker.allow() and not breaker.is_open()
+    # ...and the first failure re-opens it without waiting for the threshold
+    assert breaker.record_failure() is True
+    assert breaker.remaining_cooldown() == 60
+
+def test_successful_probe_closes_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 61
+    breaker.record_success()
+    assert breaker.allow()
+    # Closed again: it takes the full threshold to open it
+    assert [breaker.record_failure() for _ in range(3)] == [False, False, True]
+
+def test_token_bucket_allows_a_burst_then_spaces_calls(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.slept == [0.5, 0.5]
+
+def test_token_bucket_refills_while_idle_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    clock.now += 100
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [0.5]
+
+def test_token_bucket_default_capacity_is_one_second_of_calls(clock):
+    bucket = TokenBucket(rate=5)
+    for _ in range(5):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(0.2)]
+
+def test_zero_rate_disables_the_limit(clock):
+    bucket = TokenBucket(rate=0)
+    for _ in range(100):
+        bucket.acquire()
+    assert clock.slept == []
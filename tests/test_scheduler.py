@@ -0,0 +1,106 @@
+import datetime
+import random
+import time
+
+import pytest
+
+from scheduler import PriorityScheduler, score
+
+TODAY = datetime.date(2024, 6, 1)
+NOW = 1_700_000_000.0
+
+class Item:
+    def __init__(self, item_id, air_date=TODAY, monitored=True):
+        self.id = item_id
+        self.air_date = air_date
+        self.monitored = monitored
+
+    def __repr__(self):
+        return f"Item({self.id})"
+
+def _scheduler(history=None, random_weight=0.0, rng=None, history_calls=None):
+    def lookup(ids):
+        if history_calls is not None:
+            history_calls.append(ids)
+        return {item_id: entry for item_id, entry in (history or {}).items() if item_id in ids}
+
+    return PriorityScheduler("items", item_id=lambda item: item.id, air_date=lambda item: item.air_date,
+                             monitored=lambda item: item.monitored, describe=repr, history=lookup,
+                             reset_interval_hours=24, random_weight=random_weight, rng=rng)
+
+def _ids(items):
+    return [item.id for item in items]
+
+def test_score_factors():
+    priority = score(None, 0, TODAY, True, NOW, TODAY, reset_interval_hours=24)
+    assert priority.score == pytest.approx(0.4 + 0.3 + 0.2 + 0.1)
+
+    # Searched one reset interval ago, aired a half-life ago, unmonitored, searched once before
+    priority = score(NOW - 24 * 3600, 1, TODAY - datetime.timedelta(days=365), False, NOW, TODAY, reset_interval_hours=24)
+    assert priority.score == pytest.approx(0.2 + 0.15 + 0.0 + 0.05)
+    assert [reason for reason, _ in priority.factors] == [
+        "last searched 24h ago", "aired 365d ago", "unmonitored", "1 earlier searches"]
+
+def test_unknown_and_future_air_dates():
+    assert score(None, 0, None, True, NOW, TODAY, 24).score == pytest.approx(0.7)
+    # Not aired yet counts as new
+    assert score(None, 0, TODAY + datetime.timedelta(days=30), True, NOW, TODAY, 24).score == pytest.approx(1.0)
+
+def test_random_part_is_bounded_by_its_weight():
+    rng = random.Random(3)
+    base = score(None, 0, TODAY, True, NOW, TODAY, 24).score
+    for _ in range(100):
+        assert base <= score(None, 0, TODAY, True, NOW, TODAY, 24, random_weight=0.2, rng=rng).score < base + 0.2
+
+def test_ranked_highest_score_first():
+    now = time.time()
+    today = datetime.datetime.now().date()
+    items = [
+        Item(1, air_date=today, monitored=False),                 # 0.8: never searched, new, unmonitored
+        Item(2, air_date=today),                                  # 0.56: searched an hour ago
+        Item(3, air_date=today - datetime.timedelta(days=3650)),  # 0.7: never searched, aired long ago
+        Item(4, air_date=today),                                  # 1.0: never searched, new, monitored
+        Item(5, air_date=today),                                  # 0.92: searched a week ago, three times
+    ]
+    history = {2: (now - 3600, 1), 5: (now - 7 * 86400, 3)}
+    assert _ids(_scheduler(history).ranked([items])) == [4, 5, 1, 3, 2]
+
+def test_equal_scores_keep_arrival_order():
+    items = [Item(item_id) for item_id in (5, 3, 9, 1, 7)]
+    assert _ids(_scheduler().ranked([items])) == [5, 3, 9, 1, 7]
+
+def test_random_weight_orders_equal_items_by_the_seeded_draws():
+    items = [Item(item_id) for item_id in range(8)]
+    rng = random.Random(42)
+    draws = [rng.random() for _ in items]
+    expected = sorted(range(8), key=lambda index: -draws[index])
+    ranked = _ids(_scheduler(random_weight=0.2, rng=random.Random(42)).ranked([items]))
+    assert ranked == expected
+    assert ranked != list(range(8))
+    # The same seed gives the same order
+    assert _ids(_scheduler(random_weight=0.2, rng=random.Random(42)).ranked([items])) == ranked
+
+def test_random_weight_does_not_override_a_clear_difference():
+    now = time.time()
+    items = [Item(1), Item(2)]
+    # Item 1 was searched a minute ago, item 2 never: a 0.4 staleness gap beats a 0.2 random part
+    history = {1: (now - 60, 0)}
+    for seed in range(20):
+        assert _ids(_scheduler(history, random_weight=0.2, rng=random.Random(seed)).ranked([items])) == [2, 1]
+
+def test_pools_are_ranked_and_fetched_one_at_a_time():
+    history_calls = []
+    fetched = []
+
+    def pools():
+        for pool in ([Item(1, monitored=False), Item(2)], [], [Item(3), Item(4, monitored=False)]):
+            fetched.append(_ids(pool))
+            yield pool
+
+    ranked = _scheduler(history_calls=history_calls).ranked(pools())
+    assert [next(ranked).id, next(ranked).id] == [2, 1]
+    # The next pool isn't fetched until the first one is used up
+    assert fetched == [[1, 2]]
+    assert _ids(ranked) == [3, 4]
+    # One history lookup per non-empty pool
+    assert history_calls == [[1, 2], [3, 4]]
@@ -0,0 +1,132 @@
+import json
+import threading
+
+import pytest
+
+import settings_manager
+from settings_manager import DEFAULT_SETTINGS, SettingsCache, SettingsValidationError, validate_changes
+
+def _cache(tmp_path):
+    return SettingsCache(tmp_path / "huntarr.json", tmp_path / "huntarr.json.lock")
+
+def test_reading_a_missing_file_returns_defaults_without_writing(tmp_path):
+    cache = _cache(tmp_path)
+    settings = cache.get()
+    assert settings["huntarr"]["sleep_duration"] == DEFAULT_SETTINGS["huntarr"]["sleep_duration"]
+    assert not cache.path.exists()
+    # Unchanged (still missing) file: the same snapshot
+    assert cache.get() is settings
+
+def test_create_does_not_overwrite_an_existing_file(tmp_path):
+    cache = _cache(tmp_path)
+    cache.path.write_text(json.dumps({"huntarr": {"sleep_duration": 60}}))
+    cache.create(DEFAULT_SETTINGS)
+    assert json.loads(cache.path.read_text()) == {"huntarr": {"sleep_duration": 60}}
+
+def test_create_writes_defaults_when_missing(tmp_path):
+    cache = _cache(tmp_path)
+    cache.create(DEFAULT_SETTINGS)
+    assert json.loads(cache.path.read_text()) == DEFAULT_SETTINGS
+
+def test_file_removed_after_loading_falls_back_to_defaults(tmp_path):
+    cache = _cache(tmp_path)
+    cache.path.write_text(json.dumps({"huntarr": {"sleep_duration": 60}}))
+    assert cache.get()["huntarr"]["sleep_duration"] == 60
+    cache.path.unlink()
+    assert cache.get()["huntarr"]["sleep_duration"] == DEFAULT_SETTINGS["huntarr"]["sleep_duration"]
+
+def test_update_returns_only_the_changed_settings(tmp_path):
+    cache = _cache(tmp_path)
+    cache.create(DEFAULT_SETTINGS)
+    changed = cache.update({"huntarr": {"sleep_duration": 60, "monitored_only": True}})
+    assert changed == {"huntarr": {"sleep_duration": {"old": 900, "new": 60}}}
+    saved = json.loads(cache.path.read_text())
+    assert saved["huntarr"]["sleep_duration"] == 60
+    assert saved["advanced"] == DEFAULT_SETTINGS["advanced"]
+    assert cache.get()["huntarr"]["sleep_duration"] == 60
+
+def test_update_without_changes_does_not_write(tmp_path):
+    cache = _cache(tmp_path)
+    cache.create(DEFAULT_SETTINGS)
+    before = cache.path.stat().st_ino
+    assert cache.update({"huntarr": {"sleep_duration": 900}}) == {}
+    assert cache.path.stat().st_ino == before
+
+def test_update_creates_the_file_when_missing(tmp_path):
+    cache = _cache(tmp_path)
+    cache.update({"ui": {"dark_mode": False}})
+    saved = json.loads(cache.path.read_text())
+    assert saved["ui"] == {"dark_mode": False}
+    assert saved["huntarr"] == DEFAULT_SETTINGS["huntarr"]
+
+def test_update_accepts_environment_only_settings(tmp_path):
+    cache = _cache(tmp_path)
+    cache.create(DEFAULT_SETTINGS)
+    changed = cache.update({"advanced": {"api_max_concurrency": 8}})
+    assert changed == {"advanced": {"api_max_concurrency": {"old": None, "new": 8}}}
+    assert json.loads(cache.path.read_text())["advanced"]["api_max_concurrency"] == 8
+
+@pytest.mark.parametrize("changes", [
+    {"tv": {"sleep_duration": 60}},
+    {"huntarr": {"no_such_setting": 1}},
+    {"huntarr": {"sleep_duration": "60"}},
+    {"huntarr": {"sleep_duration": True}},
+    {"huntarr": {"monitored_only": 1}},
+    {"huntarr": 60},
+    ["huntarr"],
+])
+def test_invalid_update_is_rejected_and_leaves_the_file_untouched(tmp_path, changes):
+    cache = _cache(tmp_path)
+    cache.create(DEFAULT_SETTINGS)
+    before = cache.path.read_text()
+    with pytest.raises(SettingsValidationError) as excinfo:
+        cache.update(changes)
+    assert excinfo.value.errors
+    assert cache.path.read_text() == before
+
+def test_one_invalid_value_rejects_the_whole_update(tmp_path):
+    cache = _cache(tmp_path)
+    cache.create(DEFAULT_SETTINGS)
+    with pytest.raises(SettingsValidationError):
+        cache.update({"huntarr": {"sleep_duration": 60, "hunt_missing_shows": "lots"}})
+    assert json.loads(cache.path.read_text())["huntarr"]["sleep_duration"] == 900
+
+def test_float_settings_accept_integers():
+    assert validate_changes({"advanced": {"api_retry_backoff": 2}}) == []
+    assert validate_changes({"advanced": {"api_retry_backoff": 2.5}}) == []
+    assert validate_changes({"advanced": {"api_retries": 2.5}})
+
+def test_failed_write_leaves_the_old_file_and_no_temp_file(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    cache.create(DEFAULT_SETTINGS)
+    before = cache.path.read_text()
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(settings_manager.os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        cache.update({"huntarr": {"sleep_duration": 60}})
+    assert cache.path.read_text() == before
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["huntarr.json", "huntarr.json.lock"]
+    monkeypatch.undo()
+    assert cache.get()["huntarr"]["sleep_duration"] == 900
+
+def test_concurrent_updates_from_two_processes_lose_nothing(tmp_path):
+    # Two caches on one file stand in for the web server and the hunt process
+    caches = [_cache(tmp_path), _cache(tmp_path)]
+    caches[0].create(DEFAULT_SETTINGS)
+    keys = ["sleep_duration", "hunt_missing_shows", "hunt_upgrade_episodes", "state_reset_interval_hours"]
+
+    def bump(cache, key):
+        for value in range(1, 21):
+            cache.update({"huntarr": {key: value}})
+
+    threads = [threading.Thread(target=bump, args=(caches[i % 2], key)) for i, key in enumerate(keys)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    saved = json.loads(caches[0].path.read_text())
+    assert {key: saved["huntarr"][key] for key in keys} == {key: 20 for key in keys}
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith(".tmp")]
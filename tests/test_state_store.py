@@ -0,0 +1,249 @@
+import time
+
+import pytest
+
+from state_store import (
+    BitmapStateStore, Cursor, ProcessedIndex, SQLiteStateStore, StateStore, TextStateStore, read_id_log
+)
+
+MISSING = "missing"
+UPGRADE = "upgrade"
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def _sqlite(tmp_path, lines=""):
+    """A SQLite store importing a missing-shows text file with `lines`."""
+    text_file = tmp_path / "processed_missing_ids.txt"
+    if not text_file.exists():
+        text_file.write_text(lines)
+    return SQLiteStateStore(tmp_path / "state.db", import_files={MISSING: text_file})
+
+def test_sqlite_imports_text_file_once(tmp_path):
+    store = _sqlite(tmp_path, "5\t1000\n6\t2000\n6\t3000\nnot-an-id\n")
+    assert store.processed(MISSING, [5, 6, 7]) == {5, 6}
+    assert store.history(MISSING, [6]) == {6: (3000.0, 1)}
+
+    # Lines added to the file later are not imported again
+    (tmp_path / "processed_missing_ids.txt").write_text("7\t4000\n")
+    store = _sqlite(tmp_path)
+    assert store.processed(MISSING, [5, 6, 7]) == {5, 6}
+
+def test_sqlite_marks_are_visible_before_flush_and_counted(tmp_path):
+    store = _sqlite(tmp_path)
+    store.add(UPGRADE, [1, 2])
+    assert store.processed(UPGRADE, [1, 2, 3]) == {1, 2}
+    assert store.count(UPGRADE) == 0
+    store.flush()
+    store.add(UPGRADE, [2])
+    store.flush()
+    assert store.count(UPGRADE) == 2
+    assert {obj_id: attempts for obj_id, (_, attempts) in store.history(UPGRADE, [1, 2]).items()} == {1: 1, 2: 2}
+    # Kinds are separate
+    assert store.processed(MISSING, [1, 2]) == set()
+
+def test_sqlite_cutoff_expires_rows_but_keeps_their_history(tmp_path):
+    store = _sqlite(tmp_path, "1\t1000\n2\t2000\n3\t3000\n")
+    assert store.expire(MISSING, 2500) == 2
+    assert store.processed(MISSING, [1, 2, 3]) == {3}
+    assert store.count(MISSING) == 1
+    assert store.next_expiring(MISSING, 10) == [(3, 3000.0)]
+    assert set(store.history(MISSING, [1, 2, 3])) == {1, 2, 3}
+    # Same cutoff again: nothing new expires
+    assert store.expire(MISSING, 2500) == 0
+
+def test_sqlite_cutoff_survives_reopening_and_can_be_lowered(tmp_path):
+    store = _sqlite(tmp_path, "1\t1000\n2\t2000\n")
+    store.expire(MISSING, 1500)
+    store = _sqlite(tmp_path)
+    assert store.processed(MISSING, [1, 2]) == {2}
+    # Expiry disabled: older searches count as processed again
+    assert store.expire(MISSING, None) == 0
+    assert store.processed(MISSING, [1, 2]) == {1, 2}
+
+def test_sqlite_clear_and_queries_larger_than_one_batch(tmp_path):
+    store = _sqlite(tmp_path)
+    store.add(UPGRADE, range(1, 1201))
+    store.flush()
+    assert store.processed(UPGRADE, range(1, 1301)) == set(range(1, 1201))
+    store.clear(UPGRADE)
+    assert store.processed(UPGRADE, range(1, 1301)) == set()
+
+def test_sqlite_cursors_round_trip(tmp_path):
+    store = _sqlite(tmp_path)
+    assert store.load_cursor(UPGRADE) is None
+    store.save_cursor(UPGRADE, Cursor(41, 1234, 500))
+    cursor = _sqlite(tmp_path).load_cursor(UPGRADE)
+    assert (cursor.position, cursor.last_id, cursor.total) == (41, 1234, 500)
+    store.save_cursor(UPGRADE, None)
+    assert store.load_cursor(UPGRADE) is None
+
+def test_sqlite_next_expiring_is_oldest_first(tmp_path):
+    store = _sqlite(tmp_path, "1\t3000\n2\t1000\n3\t2000\n")
+    assert [obj_id for obj_id, _ in store.next_expiring(MISSING, 2)] == [2, 3]
+    now = time.time()
+    assert store.expire(MISSING, now) == 3
+
+def test_index_appends_marks_and_reloads_newest_time(tmp_path):
+    path = tmp_path / "ids.txt"
+    index = ProcessedIndex(path)
+    index.append({1: 1000.0, 2: 2000.0})
+    index.append({1: 3000.0})
+    assert 1 in index and 2 in index and 3 not in index
+    assert path.read_text().splitlines() == ["1\t1000", "2\t2000", "1\t3000"]
+
+    reloaded = ProcessedIndex(path)
+    assert len(reloaded) == 2
+    assert reloaded.next_expiring(2) == [(2, 2000.0), (1, 3000.0)]
+
+def test_index_reads_lines_without_timestamp_as_file_time(tmp_path):
+    path = tmp_path / "ids.txt"
+    path.write_text("7\n8\t500\n")
+    ids, lines = read_id_log(path)
+    assert lines == 2
+    assert ids[8] == 500.0
+    assert ids[7] == path.stat().st_mtime
+
+def test_index_compacts_log_to_one_line_per_id(tmp_path):
+    path = tmp_path / "ids.txt"
+    index = ProcessedIndex(path, compact_ratio=2.0, compact_min_lines=4)
+    for searched_at in range(1000, 1006):
+        index.append({1: float(searched_at), 2: float(searched_at)})
+    _wait_for(lambda: len(path.read_text().splitlines()) <= 4)
+    _wait_for(lambda: not index._compacting)
+    ids, _ = read_id_log(path)
+    assert ids == {1: 1005.0, 2: 1005.0}
+    assert len(index) == 2
+
+def test_index_log_stays_complete_across_compactions(tmp_path):
+    path = tmp_path / "ids.txt"
+    index = ProcessedIndex(path, compact_ratio=1.0, compact_min_lines=0)
+    for obj_id in range(200):
+        index.append({obj_id: 1000.0})
+        index.append({obj_id: 1001.0})
+    _wait_for(lambda: not index._compacting)
+    index.append({500: 2000.0})
+    _wait_for(lambda: not index._compacting)
+    ids, _ = read_id_log(path)
+    assert set(ids) == set(range(200)) | {500}
+    assert ids[500] == 2000.0
+
+def test_index_clear_empties_log(tmp_path):
+    path = tmp_path / "ids.txt"
+    index = ProcessedIndex(path)
+    index.append({1: 1000.0})
+    index.clear()
+    assert len(index) == 0 and 1 not in index
+    assert len(ProcessedIndex(path)) == 0
+
+def test_text_store_persists_marks_in_its_files(tmp_path):
+    files = {MISSING: tmp_path / "missing.txt", UPGRADE: tmp_path / "upgrade.txt"}
+    store = TextStateStore(files, cursor_file=tmp_path / "cursors.json")
+    store.add(MISSING, [10, 11])
+    store.flush()
+    store.save_cursor(MISSING, Cursor(3, 11, 20))
+
+    store = TextStateStore(files, cursor_file=tmp_path / "cursors.json")
+    assert store.processed(MISSING, [10, 11, 12]) == {10, 11}
+    assert store.processed(UPGRADE, [10, 11]) == set()
+    assert store.count(MISSING) == 2
+    assert store.load_cursor(MISSING).last_id == 11
+
+def test_index_expires_only_ids_searched_before_cutoff(tmp_path):
+    index = ProcessedIndex(tmp_path / "ids.txt")
+    index.append({1: 1000.0, 2: 2000.0, 3: 3000.0})
+    assert index.expire(2500) == 2
+    assert 1 not in index and 2 not in index and 3 in index
+    assert index.expire(2500) == 0
+
+def test_index_id_searched_again_expires_by_its_latest_search(tmp_path):
+    index = ProcessedIndex(tmp_path / "ids.txt")
+    index.append({1: 1000.0, 2: 1500.0})
+    index.append({1: 4000.0})
+    # The superseded (1000, 1) heap entry must neither expire 1 nor be reported
+    assert index.next_expiring(2) == [(2, 1500.0), (1, 4000.0)]
+    assert index.expire(2000) == 1
+    assert 1 in index and 2 not in index
+    assert index.next_expiring(5) == [(1, 4000.0)]
+    assert index.expire(5000) == 1
+    assert len(index) == 0
+
+def test_index_expiry_survives_reloading(tmp_path):
+    path = tmp_path / "ids.txt"
+    index = ProcessedIndex(path)
+    index.append({1: 1000.0})
+    index.append({1: 3000.0, 2: 2000.0})
+    reloaded = ProcessedIndex(path)
+    assert reloaded.expire(2500) == 1
+    assert 1 in reloaded and 2 not in reloaded
+
+def test_text_store_never_expires_without_cutoff(tmp_path):
+    store = TextStateStore({MISSING: tmp_path / "missing.txt"})
+    store.add(MISSING, [1])
+    store.flush()
+    assert store.expire(MISSING, None) == 0
+    assert store.expire(MISSING, time.time() + 1) == 1
+    assert store.processed(MISSING, [1]) == set()
+
+def _bitmap(tmp_path, lines=None, bucket_seconds=1000):
+    legacy = tmp_path / "missing.txt"
+    if lines is not None:
+        legacy.write_text(lines)
+    return BitmapStateStore({MISSING: tmp_path / "missing.bin"}, bucket_seconds,
+                            import_files={MISSING: legacy}, cursor_file=tmp_path / "cursors.json")
+
+def test_bitmap_store_imports_text_file_into_time_buckets(tmp_path):
+    store = _bitmap(tmp_path, "1\t100\n2\t1500\n3\t1600\n4\t2500\n")
+    assert store.processed(MISSING, range(10)) == {1, 2, 3, 4}
+    assert store.count(MISSING) == 4
+    # Search times are only kept per bucket: the oldest bucket's newest time
+    assert store.next_expiring(MISSING, 5) == [(1, 100.0)]
+
+def test_bitmap_store_expires_whole_buckets(tmp_path):
+    store = _bitmap(tmp_path, "1\t100\n2\t1500\n3\t1600\n4\t2500\n")
+    # The bucket holding 2 and 3 was last searched at 1600, so it stays until the cutoff passes that
+    assert store.expire(MISSING, 1550) == 1
+    assert store.processed(MISSING, range(10)) == {2, 3, 4}
+    assert store.expire(MISSING, 2000) == 2
+    assert store.processed(MISSING, range(10)) == {4}
+    assert store.count(MISSING) == 1
+    assert store.expire(MISSING, None) == 0
+
+def test_bitmap_store_adds_marks_and_persists(tmp_path):
+    store = _bitmap(tmp_path, "1\t100\n")
+    store.add(MISSING, [1, 5, 70000])
+    store.flush()
+    assert store.count(MISSING) == 3
+
+    # The bitmap file exists now, so the text file is not imported again
+    (tmp_path / "missing.txt").write_text("9\t100\n")
+    store = _bitmap(tmp_path)
+    assert store.processed(MISSING, [1, 5, 9, 70000]) == {1, 5, 70000}
+
+def test_bitmap_store_grows_past_bloom_filter_capacity(tmp_path):
+    store = _bitmap(tmp_path)
+    for start in range(0, 3000, 500):
+        store.add(MISSING, range(start, start + 500))
+        store.flush()
+    assert store.count(MISSING) == 3000
+    assert store.processed(MISSING, range(2990, 3010)) == set(range(2990, 3000))
+
+def test_bitmap_store_clear(tmp_path):
+    store = _bitmap(tmp_path, "1\t100\n")
+    store.clear(MISSING)
+    assert store.processed(MISSING, [1]) == set()
+    assert store.count(MISSING) == 0
+
+def test_backend_missing_a_method_fails_when_created():
+    class Incomplete(StateStore):
+        def _stored(self, kind, ids):
+            return set()
+
+        def _write(self, kind, marks):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
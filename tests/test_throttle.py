@@ -0,0 +1,124 @@
+import threading
+import time
+
+from throttle import DownloadThrottle
+
+def _throttle(levels, high_water=5, low_water=2):
+    """A throttle whose queue level is the last value put in `levels`."""
+    return DownloadThrottle(lambda: levels[-1], high_water=high_water, low_water=low_water, sample_interval=1)
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_disabled_throttle_allows_everything():
+    throttle = _throttle([100], high_water=-1)
+    assert throttle.acquire(50, max_wait=0) == 50
+
+def test_batch_is_shrunk_to_the_room_under_high_water():
+    throttle = _throttle([3])
+    assert throttle.acquire(10, max_wait=0) == 2
+    assert throttle.shrunk == 1
+
+def test_full_queue_skips_the_search_after_max_wait():
+    throttle = _throttle([10])
+    assert throttle.acquire(3, max_wait=0.2) == 0
+    assert (throttle.pauses, throttle.gave_up) == (1, 1)
+
+def test_waiting_search_does_not_hold_back_the_others():
+    throttle = _throttle([10])
+    long_wait = threading.Thread(target=throttle.acquire, args=(3, 30), kwargs={"cancelled": lambda: stop.is_set()})
+    stop = threading.Event()
+    long_wait.start()
+    try:
+        started = time.monotonic()
+        assert throttle.acquire(3, max_wait=0.5) == 0
+        assert time.monotonic() - started < 2
+    finally:
+        stop.set()
+        long_wait.join(5)
+    assert not long_wait.is_alive()
+
+def test_cancelled_wait_returns_nothing():
+    throttle = _throttle([10])
+    started = time.monotonic()
+    assert throttle.acquire(3, max_wait=30, cancelled=lambda: time.monotonic() - started > 0.5) == 0
+    assert time.monotonic() - started < 3
+    assert throttle.gave_up == 0
+
+def test_searches_resume_once_the_queue_drains_to_low_water():
+    levels = [10]
+    throttle = _throttle(levels)
+    assert throttle.acquire(1, max_wait=0) == 0
+    levels.append(4)
+    time.sleep(1.1)
+    # Still above low water: stays paused
+    assert throttle.acquire(1, max_wait=0) == 0
+    levels.append(1)
+    time.sleep(1.1)
+    assert throttle.acquire(2, max_wait=0) == 2
+
+def test_failed_sample_keeps_the_last_level():
+    levels = [10]
+    throttle = _throttle(levels)
+    assert throttle.acquire(1, max_wait=0) == 0
+    levels.append(None)
+    time.sleep(1.1)
+    # Unknown is not "empty": still paused at the last known level
+    assert throttle.acquire(1, max_wait=0) == 0
+    assert throttle.failed_samples == 1
+
+def test_searches_are_let_through_until_a_level_is_known():
+    levels = [None]
+    throttle = _throttle(levels)
+    assert throttle.acquire(10, max_wait=0) == 10
+    assert throttle.failed_samples == 1
+    levels.append(3)
+    time.sleep(1.1)
+    assert throttle.acquire(10, max_wait=0) == 2
+
+def test_failed_command_count_makes_the_sample_unknown():
+    throttle = DownloadThrottle(lambda: 0, high_water=5, low_water=2, sample_interval=1, sample_commands=lambda: None)
+    assert throttle.acquire(1, max_wait=0) == 1
+    assert (throttle.samples, throttle.failed_samples) == (0, 1)
+
+class SlowQueue:
+    """A queue sampler that blocks once `blocked` is cleared, counting the samples running at once."""
+
+    def __init__(self, level):
+        self.level = level
+        self.blocked = threading.Event()
+        self.blocked.set()
+        self.running = 0
+        self.most_running = 0
+
+    def __call__(self):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        self.blocked.wait(5)
+        self.running -= 1
+        return self.level
+
+def test_slow_sample_does_not_block_other_searches():
+    queue = SlowQueue(0)
+    throttle = DownloadThrottle(queue, high_water=5, low_water=2, sample_interval=1)
+    assert throttle.acquire(1, max_wait=0) == 1
+    time.sleep(1.1)
+    queue.blocked.clear()
+    sampling = threading.Thread(target=throttle.acquire, args=(1, 0))
+    sampling.start()
+    try:
+        _wait_for(lambda: queue.running == 1)
+        started = time.monotonic()
+        # Served from the last level while the other worker samples
+        assert throttle.acquire(2, max_wait=0) == 2
+        assert time.monotonic() - started < 1
+        assert queue.most_running == 1
+    finally:
+        queue.blocked.set()
+        sampling.join(5)
+    # The sample may predate the 2 episodes searched while it ran, so they still count,
+    # as does the sampling worker's own
+    assert throttle.acquire(5, max_wait=0) == 2
@@ -0,0 +1,226 @@
+import random
+
+import pytest
+
+from wanted_sync import SnapshotTooLarge, WantedPageCache, WantedSnapshot
+
+class FakeWanted:
+    """A wanted list as Sonarr pages it: newest first, or oldest first when not descending."""
+
+    def __init__(self, ids):
+        self.ids = list(ids)
+        self.requests = 0
+        self.fail = False
+
+    def fetch_page(self, page, page_size, descending=True):
+        self.requests += 1
+        if self.fail:
+            return None
+        ordered = self.ids if descending else self.ids[::-1]
+        records = [{"id": obj_id} for obj_id in ordered[(page - 1) * page_size:page * page_size]]
+        return {"totalRecords": len(self.ids), "records": records}
+
+    def iter_pages(self, page_size):
+        total_pages = max((len(self.ids) + page_size - 1) // page_size, 1)
+        for page in range(1, total_pages + 1):
+            yield page, total_pages, self.fetch_page(page, page_size)
+
+def _snapshot(remote, page_size=10, max_records=10000, full_resync_interval=3600):
+    return WantedSnapshot("missing", page_size, remote.fetch_page, lambda: remote.iter_pages(page_size),
+                          full_resync_interval=full_resync_interval, max_records=max_records)
+
+def _ids(records):
+    return [record["id"] for record in records]
+
+def test_unchanged_list_is_served_after_two_probes():
+    remote = FakeWanted(range(1000, 900, -1))
+    snapshot = _snapshot(remote)
+    assert _ids(snapshot.sync()) == remote.ids
+    remote.requests = 0
+    assert _ids(snapshot.sync()) == remote.ids
+    assert remote.requests == 2
+    assert snapshot.stats.delta_syncs == 1
+
+def test_new_records_are_read_from_the_head():
+    remote = FakeWanted(range(1000, 900, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    remote.ids = [1003, 1002, 1001] + remote.ids
+    remote.requests = 0
+    assert _ids(snapshot.sync()) == remote.ids
+    # Two probes and one head page, not the 11 pages of a full sync
+    assert remote.requests == 3
+    assert snapshot.stats.full_syncs == 1
+
+def test_removed_records_are_located_by_bisecting():
+    remote = FakeWanted(range(1000, 800, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    for obj_id in (990, 950, 949, 870):
+        remote.ids.remove(obj_id)
+    snapshot.stats.reset()
+    assert _ids(snapshot.sync()) == remote.ids
+    # Single-record probes instead of reading the 200 records again
+    assert snapshot.stats.records_fetched < 50
+    assert snapshot.stats.full_syncs == 0
+
+def test_removed_ends_of_the_list_are_handled():
+    remote = FakeWanted(range(100, 0, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    remote.ids = remote.ids[3:-2]
+    assert _ids(snapshot.sync()) == remote.ids
+    assert snapshot.stats.full_syncs == 1
+
+def test_record_added_in_the_middle_falls_back_to_a_full_sync():
+    remote = FakeWanted(range(100, 0, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    remote.ids.insert(50, 5000)
+    assert _ids(snapshot.sync()) == remote.ids
+    assert snapshot.stats.full_syncs == 2
+
+def test_reorder_met_while_bisecting_falls_back_to_a_full_sync():
+    remote = FakeWanted(range(100, 0, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    remote.ids.remove(70)
+    remote.ids.insert(49, remote.ids.pop(10))
+    assert _ids(snapshot.sync()) == remote.ids
+    assert snapshot.stats.full_syncs == 2
+
+def test_reorder_the_probes_miss_is_fixed_by_the_next_full_resync():
+    remote = FakeWanted(range(100, 0, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    remote.ids[10], remote.ids[60] = remote.ids[60], remote.ids[10]
+    remote.ids.remove(remote.ids[30])
+    # Same records, so delta sync can't tell; the periodic full re-sync puts them in order
+    assert sorted(_ids(snapshot.sync())) == sorted(remote.ids)
+    snapshot.full_resync_interval = 0
+    assert _ids(snapshot.sync()) == remote.ids
+
+def test_random_changes_always_reconcile_to_the_remote_list():
+    rng = random.Random(7)
+    remote = FakeWanted(range(5000, 4500, -1))
+    snapshot = _snapshot(remote, page_size=25)
+    snapshot.sync()
+    next_id = 6000
+    for _ in range(30):
+        for _ in range(rng.randint(0, 8)):
+            if remote.ids:
+                remote.ids.pop(rng.randrange(len(remote.ids)))
+        added = rng.randint(0, 3)
+        remote.ids = list(range(next_id + added, next_id, -1)) + remote.ids
+        next_id += added
+        assert _ids(snapshot.sync()) == remote.ids
+
+def test_emptied_list():
+    remote = FakeWanted(range(10, 0, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    remote.ids = []
+    assert snapshot.sync() == []
+
+def test_failed_probe_falls_back_and_failed_read_returns_none():
+    remote = FakeWanted(range(10, 0, -1))
+    snapshot = _snapshot(remote)
+    snapshot.sync()
+    remote.fail = True
+    assert snapshot.sync() is None
+    remote.fail = False
+    assert _ids(snapshot.sync()) == remote.ids
+
+def test_full_resync_interval():
+    remote = FakeWanted(range(10, 0, -1))
+    snapshot = _snapshot(remote, full_resync_interval=0)
+    snapshot.sync()
+    snapshot.sync()
+    assert (snapshot.stats.full_syncs, snapshot.stats.delta_syncs) == (2, 0)
+
+def test_list_larger_than_max_records_is_not_kept():
+    remote = FakeWanted(range(100, 0, -1))
+    snapshot = _snapshot(remote, max_records=50)
+    remote.requests = 0
+    with pytest.raises(SnapshotTooLarge):
+        snapshot.sync()
+    # Gave up after the first page
+    assert remote.requests == 1
+
+def test_list_growing_past_max_records_drops_the_snapshot():
+    remote = FakeWanted(range(40, 0, -1))
+    snapshot = _snapshot(remote, max_records=50)
+    snapshot.sync()
+    remote.ids = list(range(60, 40, -1)) + remote.ids
+    with pytest.raises(SnapshotTooLarge):
+        snapshot.sync()
+    remote.ids = remote.ids[20:]
+    assert _ids(snapshot.sync()) == remote.ids
+    assert snapshot.stats.full_syncs == 2
+
+def test_page_cache_serves_pages_until_the_list_changes():
+    remote = FakeWanted(range(100, 0, -1))
+    cache = WantedPageCache("cutoff", 10, remote.fetch_page, max_age=3600, max_records=1000)
+    assert cache.validate() == 100
+    first = cache.get(1)
+    remote.requests = 0
+    assert cache.validate() == 100
+    assert cache.get(1) is first
+    assert remote.requests == 2
+
+    remote.ids.pop(50)
+    assert cache.validate() == 99
+    assert cache.cached(1) is None
+
+def test_page_cache_drops_least_recently_used_pages_over_max_records():
+    remote = FakeWanted(range(100, 0, -1))
+    cache = WantedPageCache("cutoff", 10, remote.fetch_page, max_age=3600, max_records=25)
+    cache.validate()
+    for page in (1, 2, 1, 3):
+        cache.get(page)
+    assert cache.cached(2) is None
+    assert cache.cached(1) is not None and cache.cached(3) is not None
+
+def test_invalidated_page_cache_stores_nothing_until_validated():
+    remote = FakeWanted(range(100, 0, -1))
+    cache = WantedPageCache("cutoff", 10, remote.fetch_page, max_age=3600, max_records=1000)
+    cache.validate()
+    cache.get(1)
+    cache.invalidate()
+    assert cache.cached(1) is None
+    cache.get(1)
+    assert cache.cached(1) is None
+    cache.validate()
+    cache.get(1)
+    assert cache.cached(1) is not None
+
+def test_page_cache_without_validation_stores_nothing():
+    remote = FakeWanted(range(100, 0, -1))
+    cache = WantedPageCache("cutoff", 10, remote.fetch_page, max_age=3600, max_records=1000)
+    cache.get(1)
+    assert cache.cached(1) is None
+
+def test_missing_list_too_large_to_keep_is_paged_through(monkeypatch):
+    import api
+    from urllib.parse import parse_qs, urlparse
+
+    remote = FakeWanted(range(30, 0, -1))
+
+    def sonarr_request(endpoint, method="GET", data=None, projected=False):
+        query = parse_qs(urlparse(endpoint).query)
+        page = remote.fetch_page(int(query["page"][0]), int(query["pageSize"][0]), query["sortDirection"][0] == "descending")
+        if page is not None:
+            for record in page["records"]:
+                series_id = record["id"] % 3 + 1
+                record.update(seriesId=series_id, series={"id": series_id, "title": f"Show {series_id}", "monitored": True},
+                              seasonNumber=1, episodeNumber=record["id"], monitored=True)
+        return page
+
+    monkeypatch.setattr(api, "sonarr_request", sonarr_request)
+    monkeypatch.setattr(api, "WANTED_DELTA_SYNC", True)
+    monkeypatch.setattr(api.missing_snapshot, "max_records", 10)
+    api.missing_snapshot.invalidate()
+
+    shows = api.get_series_with_missing_episodes()
+    assert sorted(episode.id for show in shows for episode in show.episodes) == list(range(1, 31))
+    assert len(shows) == 3
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Download queue backpressure for Huntarr-Sonarr
+Holds searches back while the download queue is near full, so they go out only as
+fast as the download client works through them
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+from utils.logger import logger
+
+# Seconds between checks of whether a search waiting for the queue to drain was cancelled
+CANCEL_CHECK_INTERVAL = 1
+
+class DownloadThrottle:
+    """
+    Gates search dispatches on the size of Sonarr's download queue, with hysteresis.
+
+    Before each search, acquire() estimates the queue level: the last sampled queue size
+    (plus, if `sample_commands` is given, searches still pending in Sonarr) and the
+    episodes dispatched since that sample. Samples are taken at most every
+    `sample_interval` seconds. Once the level reaches `high_water`, dispatching pauses
+    and the queue is re-sampled until it drains to `low_water`. Below the high-water
+    mark, a batch is shrunk to the room left under it. Neither waiting searches nor the
+    sample itself hold the lock: one worker samples at a time while the others go on with
+    the last level, and each waiting search gives up at its own deadline.
+
+    A sampler returns None when the queue couldn't be read (Sonarr unreachable, circuit
+    breaker open). The last known level is kept then. Until one is known, searches are
+    let through unthrottled, as without a download queue limit, rather than stalling
+    every cycle on a queue that can't be read.
+    """
+
+    def __init__(self, sample_queue: Callable[[], Optional[int]], high_water: int, low_water: int,
+                 sample_interval: float, sample_commands: Optional[Callable[[], Optional[int]]] = None):
+        self._sample_queue = sample_queue
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self.configure(high_water, low_water, sample_interval, sample_commands)
+        self._sampled_level: Optional[int] = None
+        self._sampled_at = 0.0
+        self._dispatched = 0
+        self._sampling = False
+        self._paused = False
+        self.reset_stats()
+
+    def configure(self, high_water: int, low_water: int, sample_interval: float,
+                  sample_commands: Optional[Callable[[], Optional[int]]] = None) -> None:
+        """Set the water marks and sampling, e.g. after a settings change."""
+        with self._lock:
+            self.high_water = high_water
+            self.low_water = low_water if 0 <= low_water < high_water else high_water * 3 // 4
+            self.sample_interval = max(sample_interval, 1)
+            self._sample_commands = sample_commands
+            self._sampled_at = 0.0
+            self._condition.notify_all()
+
+    @property
+    def enabled(self) -> bool:
+        return self.high_water > 0
+
+    def reset_stats(self) -> None:
+        self.samples = 0
+        self.failed_samples = 0
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self.shrunk = 0
+        self.gave_up = 0
+
+    def summary(self) -> str:
+        return (f"{self.samples} queue samples ({self.failed_samples} failed), {self.pauses} pauses ({self.paused_seconds:.0f}s), "
+                f"{self.shrunk} batches shrunk, {self.gave_up} searches skipped")
+
+    def _sample(self) -> Optional[int]:
+        level = self._sample_queue()
+        if level is not None and self._sample_commands is not None:
+            commands = self._sample_commands()
+            level = level + commands if commands is not None else None
+        return level
+
+    def _level(self) -> Optional[int]:
+        """
+        The estimated queue level, or None while no level is known. Called with the lock
+        held; it is released while the queue is sampled (an HTTP request that may retry).
+        """
+        if not self._sampling and time.monotonic() - self._sampled_at >= self.sample_interval:
+            self._sampling = True
+            dispatched_before = self._dispatched
+            self._lock.release()
+            try:
+                level = self._sample()
+            finally:
+                self._lock.acquire()
+                self._sampling = False
+            self._sampled_at = time.monotonic()
+            if level is None:
+                self.failed_samples += 1
+                known = "no level known yet" if self._sampled_level is None else f"keeping the last level {self._sampled_level + self._dispatched}"
+                logger.warning(f"Couldn't read the download queue size - {known}")
+            else:
+                self._sampled_level = level
+                # Searches dispatched while sampling may not be in the sample yet, so they still count
+                self._dispatched -= dispatched_before
+                self.samples += 1
+                logger.debug(f"Download queue level: {level} (high water {self.high_water}, low water {self.low_water})")
+            self._condition.notify_all()
+        if self._sampled_level is None:
+            return None
+        return self._sampled_level + self._dispatched
+
+    def acquire(self, wanted: int, max_wait: float, cancelled: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Wait until the download queue has room and return how many of `wanted` items
+        may be searched now (at least 1). Returns 0 if the queue didn't drain to the
+        low-water mark within `max_wait` seconds, or once `cancelled()` returns True
+        while waiting (e.g. the hunt was paused).
+        """
+        if not self.enabled:
+            return wanted
+        deadline = time.monotonic() + max_wait
+        with self._condition:
+            while True:
+                level = self._level()
+                if level is None:
+                    # Nothing is known about the queue yet: don't hold searches back on it
+                    self._dispatched += wanted
+                    return wanted
+                if self._paused and level <= self.low_water:
+                    self._paused = False
+                    self._condition.notify_all()
+                    logger.info(f"Download queue down to {level} (low water {self.low_water}) - resuming searches")
+                elif not self._paused and level >= self.high_water:
+                    self._paused = True
+                    self.pauses += 1
+                    logger.info(f"Download queue at {level} (high water {self.high_water}) - pausing searches")
+
+                if not self._paused:
+                    allowed = min(wanted, self.high_water - level)
+                    if allowed < wanted:
+                        self.shrunk += 1
+                        logger.info(f"Download queue at {level} of {self.high_water} - searching {allowed} of {wanted} episodes")
+                    self._dispatched += allowed
+                    return allowed
+
+                if cancelled is not None and cancelled():
+                    logger.info(f"Stopped waiting for the download queue (at {level}) - skipping this search")
+                    return 0
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.gave_up += 1
+                    logger.warning(f"Download queue still at {level} after {max_wait:.0f}s - skipping this search")
+                    return 0
+                # Releases the lock while waiting; the queue is re-sampled once sample_interval has passed
+                waited_from = time.monotonic()
+                self._condition.wait(min(CANCEL_CHECK_INTERVAL, remaining))
+                self.paused_seconds += time.monotonic() - waited_from
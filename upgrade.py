@@ -7,24 +7,29 @@ Handles searching for episodes that need quality upgrades in Sonarr
 import random
 import time
 import datetime
-import importlib
+import itertools
+from typing import List, Dict, Iterable, Iterator, Optional, Set, Tuple
 from utils.logger import logger
-from config import (
-    MONITORED_ONLY, 
-    RANDOM_SELECTION,
-    RANDOM_UPGRADES,
-    SKIP_FUTURE_EPISODES,
-    SKIP_SERIES_REFRESH
+from config import Settings, settings
+from api import (
+    get_cutoff_unmet,
+    get_cutoff_unmet_total_pages,
+    get_cutoff_unmet_total_records,
+    iter_wanted_pages,
+    attach_series,
+    CUTOFF_PAGE_SIZE,
+    cutoff_page_cache,
+    refresh_series_async,
+    episode_search_episodes_async,
+    download_throttle
+)
+from models import EpisodeRef, SeriesRef, episodes_from_records
+from control import hunt_control
+from pipeline import Pipeline, Quota, Stage
+from scheduler import PriorityScheduler
+from state import (
+    processed_ids, save_processed_ids, flush_state, search_history, load_cursor, save_cursor, Cursor, UPGRADE
 )
-from api import get_cutoff_unmet, get_cutoff_unmet_total_pages, refresh_series, episode_search_episodes, sonarr_request
-from state import load_processed_ids, save_processed_id, truncate_processed_list, PROCESSED_UPGRADE_FILE
-
-def get_current_upgrade_limit():
-    """Get the current HUNT_UPGRADE_EPISODES value directly from config"""
-    # Force reload the config module to get the latest value
-    import config
-    importlib.reload(config)
-    return config.HUNT_UPGRADE_EPISODES
 
 def process_cutoff_upgrades() -> bool:
     """
@@ -33,172 +38,326 @@ def process_cutoff_upgrades() -> bool:
     Returns:
         True if any processing was done, False otherwise
     """
-    # Get the current value directly at the start of processing
-    HUNT_UPGRADE_EPISODES = get_current_upgrade_limit()
+    # Settings for this cycle; the limit and batch size are re-checked as episodes are taken
+    current = settings.current()
     
     logger.info("=== Checking for Quality Upgrades (Cutoff Unmet) ===")
 
     # Skip if HUNT_UPGRADE_EPISODES is set to 0
-    if HUNT_UPGRADE_EPISODES <= 0:
+    if current.hunt_upgrade_episodes <= 0:
         logger.info("HUNT_UPGRADE_EPISODES is set to 0, skipping quality upgrades")
         return False
 
-    total_pages = get_cutoff_unmet_total_pages()
+    total_records = get_cutoff_unmet_total_records()
+    total_pages = get_cutoff_unmet_total_pages(total_records)
     if total_pages == 0:
         logger.info("No episodes found that need quality upgrades.")
         return False
 
     logger.info(f"Found {total_pages} total pages of episodes that need quality upgrades.")
-    processed_upgrade_ids = load_processed_ids(PROCESSED_UPGRADE_FILE)
-    episodes_processed = 0
-    processing_done = False
 
     # Get current date for future episode filtering
     current_date = datetime.datetime.now().date()
 
+    # Series seen on any page this cycle, shared by all of their episodes
+    series_by_id: Dict[int, SeriesRef] = {}
+
     # Use the specific RANDOM_UPGRADES setting
     # (no longer dependent on the master RANDOM_SELECTION setting)
-    should_use_random = RANDOM_UPGRADES
-    
-    # Initialize page variable for both modes
-    page = 1
+    should_use_random = current.random_upgrades
     
+    cursor = None
     if should_use_random:
         logger.info("Using random selection for quality upgrades (RANDOM_UPGRADES=true)")
+        pages = _shuffled_pages(total_pages)
+    elif current.priority_scheduling:
+        # As for missing shows, the priority order replaces the sequential cursor
+        logger.info("Using sequential pages for quality upgrades from page 1, ranked by priority (RANDOM_UPGRADES=false)")
+        pages = _sequential_pages(total_records, total_pages, None, current.wanted_delta_sync)
     else:
         logger.info("Using sequential selection for quality upgrades (RANDOM_UPGRADES=false)")
+        # Sequential mode resumes where the last cycle stopped, prefetching ahead
+        cursor = load_cursor(UPGRADE)
+        pages = _sequential_pages(total_records, total_pages, cursor, current.wanted_delta_sync)
 
-    while True:
-        # Check again to make sure we're using the current limit
-        # This ensures if settings changed during processing, we use the new value
-        current_limit = get_current_upgrade_limit()
-        
-        if episodes_processed >= current_limit:
-            logger.info(f"Reached HUNT_UPGRADE_EPISODES={current_limit} for this cycle.")
-            break
-
-        # If random selection is enabled, pick a random page each iteration
-        if should_use_random and total_pages > 1:
-            page = random.randint(1, total_pages)
-        # If sequential and we've reached the end, we're done
-        elif not should_use_random and page > total_pages:
-            break
-
-        logger.info(f"Retrieving cutoff-unmet episodes (page={page} of {total_pages})...")
-        cutoff_data = get_cutoff_unmet(page)
+    usage = PageUsage(total_records)
+    # Randomize the order within each page, unless the priority scheduler orders them itself
+    shuffle = should_use_random and not current.priority_scheduling
+    page_episodes = _page_episodes(pages, shuffle, series_by_id, usage,
+                                   resume_after_id=cursor.last_id if cursor is not None else None)
+    if current.priority_scheduling:
+        # Rank the episodes of every PRIORITY_UPGRADE_PAGES pages against each other
+        logger.info(f"Ranking upgrade candidates by priority, {max(current.priority_upgrade_pages, 1)} pages at a time")
+        episodes = _upgrade_scheduler(current, should_use_random).ranked(_pools(page_episodes, current.priority_upgrade_pages))
+    else:
+        episodes = itertools.chain.from_iterable(page_episodes)
+    candidates = _eligible_episodes(episodes, current_date, current)
+
+    # Eligible episodes are taken in search batches while HUNT_UPGRADE_EPISODES has room for
+    # them, and flow through the refresh, search and commit stages, so one batch's series are
+    # refreshed while earlier batches are still being searched. Failed episodes free their place.
+    quota = Quota(current.hunt_upgrade_episodes)
+    hunt_control.track(quota)
+
+    def admit() -> Iterator[List[EpisodeRef]]:
+        while True:
+            # Wait while hunting is paused, and stop taking new work once a restart was requested
+            if not hunt_control.checkpoint():
+                return
+            # Check again to make sure we're using the current limit
+            # This ensures if settings changed during processing, we use the new value
+            live = settings.current()
+            quota.set_limit(live.hunt_upgrade_episodes)
+            granted = quota.acquire(max(live.upgrade_search_batch_size, 1))
+            if not granted:
+                logger.info(f"Reached HUNT_UPGRADE_EPISODES={quota.limit} for this cycle.")
+                return
+            selected = list(itertools.islice(candidates, granted))
+            if len(selected) < granted:
+                quota.release(granted - len(selected))
+            if not selected:
+                return
+            logger.info(f"Selected {len(selected)} episodes for quality upgrade searches.")
+            usage.selected(selected)
+            yield from _search_batches(selected, live)
+
+    if current.skip_series_refresh:
+        logger.info(" - Skipping series refresh (SKIP_SERIES_REFRESH=true)")
+    _upgrade_pipeline(current, quota).run(admit())
+    logger.info(f"Completed processing {quota.completed} upgrade episodes for this cycle.")
+    logger.info(f"Read {usage.pages_fetched} of {total_pages} cutoff-unmet pages, "
+                f"{len(usage.pages_with_work)} of them had episodes to search.")
+    if not should_use_random and not current.priority_scheduling and usage.cursor() is not None:
+        save_cursor(UPGRADE, usage.cursor())
+        logger.debug(f"Next sequential upgrade cycle resumes after {usage.cursor()}")
+    # Write this cycle's processed episodes in one go
+    flush_state()
+    
+    return quota.completed > 0
+
+class PageUsage:
+    """
+    Cutoff-unmet pages read this cycle, the pages that episodes were selected from,
+    and the furthest selected episode along the walk (for the sequential cursor).
+    """
+
+    def __init__(self, total_records: int):
+        self.total_records = total_records
+        self.pages_fetched = 0
+        self.pages_with_work: Set[int] = set()
+        # Episode ID -> (order the page was read in, page, position in the whole list)
+        self._seen: Dict[int, Tuple[int, int, int]] = {}
+        self._furthest: Optional[Tuple[int, int, int]] = None
+
+    def fetched(self, page: int, episodes: List[EpisodeRef], positions: Dict[int, int]) -> None:
+        self.pages_fetched += 1
+        for episode in episodes:
+            self._seen[episode.id] = (self.pages_fetched, page, positions[episode.id])
+
+    def selected(self, episodes: List[EpisodeRef]) -> None:
+        for episode in episodes:
+            seen = self._seen.get(episode.id)
+            if seen is None:
+                continue
+            read_order, page, position = seen
+            self.pages_with_work.add(page)
+            if self._furthest is None or (read_order, position) > self._furthest[:2]:
+                self._furthest = (read_order, position, episode.id)
+
+    def cursor(self) -> Optional[Cursor]:
+        if self._furthest is None:
+            return None
+        _, position, episode_id = self._furthest
+        return Cursor(position, episode_id, self.total_records)
+
+def _shuffled_pages(total_pages: int) -> Iterator[Tuple[int, int, Optional[Dict]]]:
+    """
+    Yield (page, total_pages, page JSON) for every cutoff-unmet page once, in an order
+    shuffled at the start of the cycle, so no page is fetched twice and the walk ends
+    once every page has been seen.
+    """
+    order = list(range(1, total_pages + 1))
+    random.shuffle(order)
+    for page in order:
+        yield page, total_pages, get_cutoff_unmet(page)
+
+def _sequential_pages(total_records: int, total_pages: int,
+                      cursor: Optional[Cursor], use_cache: bool) -> Iterator[Tuple[int, int, Optional[Dict]]]:
+    """
+    Yield cutoff-unmet pages from the page the last cycle stopped on to the end, then
+    from page 1 up to it. If episodes were removed from the list since, the cursor's
+    episode can only have moved forward, so the walk starts at its earliest possible page.
+    With `use_cache` (WANTED_DELTA_SYNC), unchanged pages come from the cutoff page cache.
+    """
+    cache = cutoff_page_cache if use_cache else None
+    start_page = 1
+    if cursor is not None:
+        start_page = min(cursor.earliest_position(total_records) // CUTOFF_PAGE_SIZE + 1, total_pages)
+        logger.info(f"Resuming sequential upgrade search at page {start_page} of {total_pages}")
+    # The page count is already known, so a page that fails to load is skipped, not the whole walk
+    yield from iter_wanted_pages("cutoff", CUTOFF_PAGE_SIZE, start_page=start_page, cache=cache,
+                                 total_pages=total_pages)
+    if start_page > 1:
+        # Wrap around to the pages before the cursor
+        yield from iter_wanted_pages("cutoff", CUTOFF_PAGE_SIZE, cache=cache, end_page=start_page - 1,
+                                     total_pages=total_pages)
+
+def _page_episodes(pages: Iterator[Tuple[int, int, Optional[Dict]]], shuffle: bool,
+                   series_by_id: Dict[int, SeriesRef], usage: PageUsage,
+                   resume_after_id: Optional[int] = None) -> Iterator[List[EpisodeRef]]:
+    """
+    Yield the not yet processed episodes of each page, fetching the next page only when more are needed.
+    An episode is yielded at most once, even if it moved to another page during the cycle.
+    If `resume_after_id` is on the first page, the episodes up to and including it are skipped.
+    """
+    selected_ids = set()
+
+    for page, total_pages, cutoff_data in pages:
+        logger.info(f"Retrieved cutoff-unmet episodes (page={page} of {total_pages})...")
         if not cutoff_data or "records" not in cutoff_data:
             logger.error(f"ERROR: Unable to retrieve cutoff–unmet data from Sonarr on page {page}.")
-            
-            # In sequential mode, try the next page
-            if not should_use_random:
-                page += 1
-                continue
-            else:
-                break
-
-        episodes = cutoff_data["records"]
-        total_eps = len(episodes)
-        logger.info(f"Found {total_eps} episodes on page {page} that need quality upgrades.")
-
-        # Randomize or sequential indices within the page
-        indices = list(range(total_eps))
-        if should_use_random:
-            random.shuffle(indices)
-
-        for idx in indices:
-            # Check again for the current limit in case it was changed during processing
-            current_limit = get_current_upgrade_limit()
-            
-            if episodes_processed >= current_limit:
-                break
-
-            ep_obj = episodes[idx]
-            episode_id = ep_obj.get("id")
-            if not episode_id or episode_id in processed_upgrade_ids:
+            # Try the next page in the walk
+            continue
+
+        # Build compact episode records once for the page; series come from the
+        # embedded series info or, failing that, one concurrent batch lookup
+        episodes = episodes_from_records(cutoff_data["records"], series_by_id)
+        del cutoff_data
+        attach_series(episodes, series_by_id)
+        logger.info(f"Found {len(episodes)} episodes on page {page} that need quality upgrades.")
+        positions = {ep.id: (page - 1) * CUTOFF_PAGE_SIZE + index for index, ep in enumerate(episodes)}
+
+        # Pick up right after the episode the last sequential cycle stopped at
+        if resume_after_id is not None:
+            page_ids = [ep.id for ep in episodes]
+            if resume_after_id in page_ids:
+                episodes = episodes[page_ids.index(resume_after_id) + 1:]
+            resume_after_id = None
+
+        # Randomize or sequential order within the page
+        if shuffle:
+            random.shuffle(episodes)
+
+        # One indexed lookup for the whole page
+        processed_upgrade_ids = processed_ids(UPGRADE, [ep.id for ep in episodes])
+        unprocessed = [ep for ep in episodes if ep.id not in processed_upgrade_ids and ep.id not in selected_ids]
+        selected_ids.update(ep.id for ep in unprocessed)
+        usage.fetched(page, unprocessed, positions)
+        yield unprocessed
+
+def _pools(page_episodes: Iterator[List[EpisodeRef]], pages_per_pool: int) -> Iterator[List[EpisodeRef]]:
+    """Join the episodes of every `pages_per_pool` pages into one list."""
+    while True:
+        pages = list(itertools.islice(page_episodes, max(pages_per_pool, 1)))
+        if not pages:
+            return
+        yield list(itertools.chain.from_iterable(pages))
+
+def _upgrade_scheduler(current: Settings, should_use_random: bool) -> PriorityScheduler[EpisodeRef]:
+    """Ranks episodes by their last search, their air date and whether they and their series are monitored."""
+    return PriorityScheduler(
+        "cutoff-unmet episodes",
+        item_id=lambda episode: episode.id,
+        air_date=lambda episode: episode.air_date,
+        monitored=lambda episode: episode.monitored and episode.series is not None and episode.series.monitored,
+        describe=lambda episode: f"{episode.label()} (Episode ID: {episode.id})",
+        history=lambda ids: search_history(UPGRADE, ids),
+        reset_interval_hours=current.state_reset_interval_hours,
+        random_weight=current.priority_random_weight if should_use_random else 0.0
+    )
+
+def _eligible_episodes(episodes: Iterable[EpisodeRef], current_date, current: Settings) -> Iterator[EpisodeRef]:
+    """Yield each episode that should be searched for an upgrade."""
+    for episode in episodes:
+        # Skip future episodes if SKIP_FUTURE_EPISODES is enabled
+        if current.skip_future_episodes and episode.is_future(current_date):
+            logger.info(f"Skipping future episode '{episode.series_title}' - S{episode.season_number}E{episode.episode_number} - '{episode.title}' (airs on {episode.air_date})")
+            continue
+
+        logger.info(f"Processing upgrade for \"{episode.series_title}\" - S{episode.season_number}E{episode.episode_number} - \"{episode.title}\" (Episode ID: {episode.id})")
+
+        # If MONITORED_ONLY, ensure both series & episode are monitored
+        if current.monitored_only:
+            series_monitored = episode.series.monitored if episode.series is not None else False
+            if not episode.monitored or not series_monitored:
+                logger.info("Skipping unmonitored episode or series.")
                 continue
 
-            series_id = ep_obj.get("seriesId")
-            season_num = ep_obj.get("seasonNumber")
-            ep_num = ep_obj.get("episodeNumber")
-            ep_title = ep_obj.get("title", "Unknown Episode Title")
-
-            series_title = ep_obj.get("seriesTitle", None)
-            if not series_title:
-                # fallback: request the series
-                series_data = sonarr_request(f"series/{series_id}", method="GET")
-                if series_data:
-                    series_title = series_data.get("title", "Unknown Series")
-                else:
-                    series_title = "Unknown Series"
-
-            # Skip future episodes if SKIP_FUTURE_EPISODES is enabled
-            if SKIP_FUTURE_EPISODES:
-                air_date_str = ep_obj.get("airDateUtc")
-                if air_date_str:
-                    try:
-                        # Parse the UTC date string
-                        air_date = datetime.datetime.fromisoformat(air_date_str.replace('Z', '+00:00')).date()
-                        if air_date > current_date:
-                            logger.info(f"Skipping future episode '{series_title}' - S{season_num}E{ep_num} - '{ep_title}' (airs on {air_date})")
-                            continue
-                    except (ValueError, TypeError):
-                        # If date parsing fails, proceed with the episode
-                        pass
-
-            logger.info(f"Processing upgrade for \"{series_title}\" - S{season_num}E{ep_num} - \"{ep_title}\" (Episode ID: {episode_id})")
-
-            # If MONITORED_ONLY, ensure both series & episode are monitored
-            if MONITORED_ONLY:
-                ep_monitored = ep_obj.get("monitored", False)
-                # Check if series info is already included
-                if "series" in ep_obj and isinstance(ep_obj["series"], dict):
-                    series_monitored = ep_obj["series"].get("monitored", False)
-                else:
-                    # retrieve the series
-                    series_data = sonarr_request(f"series/{series_id}", "GET")
-                    series_monitored = series_data.get("monitored", False) if series_data else False
-
-                if not ep_monitored or not series_monitored:
-                    logger.info("Skipping unmonitored episode or series.")
-                    continue
-
-            # Refresh the series only if SKIP_SERIES_REFRESH is not enabled
-            if not SKIP_SERIES_REFRESH:
-                logger.info(" - Refreshing series information...")
-                refresh_res = refresh_series(series_id)
-                if not refresh_res:
-                    logger.warning("WARNING: Refresh command failed. Skipping this episode.")
-                    continue
-                logger.info(f"Refresh command completed successfully.")
-            else:
-                logger.info(" - Skipping series refresh (SKIP_SERIES_REFRESH=true)")
-
-            # Search for the episode (upgrade)
-            logger.info(" - Searching for quality upgrade...")
-            search_res = episode_search_episodes([episode_id])
-            if search_res:
-                logger.info(f"Search command completed successfully.")
-                # Mark processed
-                save_processed_id(PROCESSED_UPGRADE_FILE, episode_id)
-                episodes_processed += 1
-                processing_done = True
-                
-                # Log with the current limit, not the initial one
-                current_limit = get_current_upgrade_limit()
-                logger.info(f"Processed {episodes_processed}/{current_limit} upgrade episodes this cycle.")
+        yield episode
+
+def _search_batches(episodes: List[EpisodeRef], current: Settings) -> List[List[EpisodeRef]]:
+    """
+    Split episodes into EpisodeSearch batches of at most UPGRADE_SEARCH_BATCH_SIZE,
+    keeping each series in its own batches when UPGRADE_BATCH_BY_SERIES is enabled.
+    """
+    batch_size = max(current.upgrade_search_batch_size, 1)
+    if current.upgrade_batch_by_series:
+        groups = {}
+        for episode in episodes:
+            groups.setdefault(episode.series_id, []).append(episode)
+        groups = list(groups.values())
+    else:
+        groups = [episodes]
+
+    return [
+        group[start:start + batch_size]
+        for group in groups
+        for start in range(0, len(group), batch_size)
+    ]
+
+def _upgrade_pipeline(current: Settings, quota: Quota) -> Pipeline:
+    """
+    Refresh (unless SKIP_SERIES_REFRESH), search and commit stages for batches of episodes.
+    Each series is refreshed once at a time, and a batch is searched with one EpisodeSearch
+    command once its series are refreshed. Episodes are marked processed in bulk as each
+    batch completes; failed episodes release their place in `quota`.
+    """
+    def refresh(batch):
+        failed_series = set()
+        refreshes = {}
+        for series_id in dict.fromkeys(ep.series_id for ep in batch):
+            logger.info(f" - Refreshing series information (ID: {series_id})...")
+            refreshes[series_id] = refresh_series_async(series_id)
+        for series_id, future in refreshes.items():
+            if future is None or not future.result():
+                logger.warning("WARNING: Refresh command failed. Skipping this episode.")
+                failed_series.add(series_id)
             else:
-                logger.warning(f"WARNING: Search command failed for episode ID {episode_id}.")
-                continue
+                logger.info(f"Refresh command completed successfully.")
+        if not failed_series:
+            return batch
+        remaining = [ep for ep in batch if ep.series_id not in failed_series]
+        if not remaining:
+            return None
+        quota.release(len(batch) - len(remaining))
+        return remaining
 
-        # Move to the next page if using sequential mode
-        if not should_use_random:
-            page += 1
-        # In random mode, we just handle one random page this iteration,
-        # then check if we've processed enough episodes or continue to another random page
-    
-    # Log with the current limit, not the initial one
-    current_limit = get_current_upgrade_limit()
-    logger.info(f"Completed processing {episodes_processed} upgrade episodes for this cycle.")
-    truncate_processed_list(PROCESSED_UPGRADE_FILE)
-    
-    return processing_done
\ No newline at end of file
+    def search(batch):
+        # Hold the search back (or shrink the batch) while the download queue is near full;
+        # episodes left out are released and stay eligible
+        allowed = download_throttle.acquire(len(batch), max_wait=settings.current().sleep_duration,
+                                            cancelled=hunt_control.interrupted)
+        if not allowed:
+            return None
+        if allowed < len(batch):
+            # Shrunk in place, so a failed search below releases only what is left
+            quota.release(len(batch) - allowed)
+            del batch[allowed:]
+        logger.info(f" - Searching for quality upgrades of {len(batch)} episode(s): {', '.join(ep.label() for ep in batch)}")
+        future = episode_search_episodes_async([ep.id for ep in batch])
+        if future is None or not future.result():
+            logger.warning(f"WARNING: Search command failed for episode IDs {[ep.id for ep in batch]}.")
+            return None
+        logger.info(f"Search command completed successfully.")
+        return batch
+
+    def commit(batch):
+        # Mark the whole batch processed
+        save_processed_ids(UPGRADE, [ep.id for ep in batch])
+        quota.done(len(batch))
+        logger.info(f"Processed {quota.completed}/{quota.limit} upgrade episodes this cycle.")
+        return batch
+
+    stages = [] if current.skip_series_refresh else [Stage("refresh", refresh, current.pipeline_refresh_workers)]
+    stages += [Stage("search", search, current.pipeline_search_workers), Stage("commit", commit)]
+    return Pipeline("upgrade", stages, current.pipeline_queue_size, on_drop=lambda batch: quota.release(len(batch)))
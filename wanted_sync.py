@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Wanted list synchronisation for Huntarr-Sonarr
+Keeps wanted/missing and wanted/cutoff results between cycles and only fetches what changed
+"""
+
+import collections
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from utils.logger import logger
+
+# fetch_page(page, page_size, descending) -> page JSON with "records" and "totalRecords", or None
+FetchPage = Callable[[int, int, bool], Optional[Dict]]
+
+class SnapshotDrift(Exception):
+    """The local snapshot can't be reconciled with Sonarr cheaply - a full re-sync is needed."""
+
+class SnapshotTooLarge(Exception):
+    """The wanted list has more records than may be kept in memory - page through it instead."""
+
+class SyncStats:
+    """Records fetched from Sonarr versus served from the local snapshot, since the last reset."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.records_fetched = 0
+            self.records_served = 0
+            self.full_syncs = 0
+            self.delta_syncs = 0
+
+    def fetched(self, records: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.records_fetched += records
+
+    def served(self, records: int) -> None:
+        with self._lock:
+            self.records_served += records
+
+    def synced(self, full: bool) -> None:
+        with self._lock:
+            if full:
+                self.full_syncs += 1
+            else:
+                self.delta_syncs += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            return (f"{self.requests} requests, {self.records_fetched} records fetched, "
+                    f"{self.records_served} served from snapshot "
+                    f"({self.full_syncs} full / {self.delta_syncs} delta syncs)")
+
+def _page_signature(newest: Optional[Dict], oldest: Optional[Dict]) -> Tuple[int, Optional[int], Optional[int]]:
+    """(totalRecords, newest record ID, oldest record ID) from the two one-record probes."""
+    total = newest.get("totalRecords", 0) if newest else 0
+    newest_records = newest.get("records") or [] if newest else []
+    oldest_records = oldest.get("records") or [] if oldest else []
+    return (
+        total if isinstance(total, int) else 0,
+        newest_records[0].get("id") if newest_records else None,
+        oldest_records[0].get("id") if oldest_records else None
+    )
+
+class WantedSnapshot:
+    """
+    A local copy of every record of a wanted list, in Sonarr's order (newest air date first).
+
+    Each sync first probes the total and the newest and oldest record. If they match the
+    snapshot, it is served as is. Otherwise new records are read from the head of the list
+    until they line up with the snapshot, and records that disappeared (downloaded,
+    unmonitored) are located by bisecting with single-record probes. Anything that can't
+    be explained that way - or `full_resync_interval` seconds passing - triggers a full
+    re-sync, which also picks up changes that probes can't see (e.g. renamed episodes).
+
+    A list of more than `max_records` records isn't kept: sync() raises SnapshotTooLarge
+    as soon as it sees the total, and the caller pages through the list instead.
+    """
+
+    def __init__(self, kind: str, page_size: int, fetch_page: FetchPage,
+                 iter_pages: Callable[[], Iterator[Tuple[int, int, Optional[Dict]]]],
+                 full_resync_interval: float, max_records: int,
+                 max_probes: int = 64, max_head_pages: int = 4):
+        self.kind = kind
+        self.page_size = page_size
+        self.full_resync_interval = full_resync_interval
+        self.max_records = max_records
+        self.max_probes = max_probes
+        self.max_head_pages = max_head_pages
+        self.stats = SyncStats()
+        self._fetch_page = fetch_page
+        self._iter_pages = iter_pages
+        self._lock = threading.Lock()
+        self._records: Optional[List[Dict]] = None
+        self._positions: Dict[int, int] = {}
+        self._full_synced_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._records = None
+            self._positions = {}
+
+    def sync(self) -> Optional[List[Dict]]:
+        """
+        Bring the snapshot up to date and return its records (None if Sonarr couldn't be read).
+        Raises SnapshotTooLarge, dropping the snapshot, if the list has more than max_records records.
+        """
+        with self._lock:
+            try:
+                if self._records is None or time.time() - self._full_synced_at >= self.full_resync_interval:
+                    return self._full_sync()
+                try:
+                    records = self._delta_sync()
+                except SnapshotDrift as drift:
+                    logger.info(f"wanted/{self.kind} changed too much to update in place ({drift}) - reading it in full")
+                    return self._full_sync()
+            except SnapshotTooLarge:
+                self._records = None
+                self._positions = {}
+                raise
+            self.stats.synced(full=False)
+            return records
+
+    def _check_size(self, total: int) -> None:
+        if total > self.max_records:
+            raise SnapshotTooLarge(f"wanted/{self.kind} has {total} records, more than the {self.max_records} kept in memory")
+
+    def _set_records(self, records: List[Dict]) -> None:
+        self._records = records
+        self._positions = {record.get("id"): index for index, record in enumerate(records)}
+
+    def _full_sync(self) -> Optional[List[Dict]]:
+        records = []
+        complete = True
+        for page, total_pages, data in self._iter_pages():
+            if not data or "records" not in data:
+                logger.error(f"ERROR: Unable to retrieve wanted/{self.kind} data from Sonarr on page {page}.")
+                complete = False
+                continue
+            total = data.get("totalRecords", 0)
+            self._check_size(max(total if isinstance(total, int) else 0, len(records) + len(data["records"])))
+            self.stats.fetched(len(data["records"]))
+            records.extend(record for record in data["records"] if isinstance(record, dict) and record.get("id"))
+
+        self.stats.synced(full=True)
+        if not complete:
+            # Serve what we have this cycle, but don't trust it as a snapshot
+            self._records = None
+            self._positions = {}
+            return records or None
+        self._set_records(records)
+        self._full_synced_at = time.time()
+        return list(records)
+
+    def _probe(self, index: int) -> Dict:
+        """The record at `index` of Sonarr's list, read with a one-record page."""
+        data = self._fetch_page(index + 1, 1, True)
+        records = (data or {}).get("records") or []
+        self.stats.fetched(len(records))
+        if not records:
+            raise SnapshotDrift(f"no record at position {index}")
+        return records[0]
+
+    def _position(self, record: Dict) -> int:
+        position = self._positions.get(record.get("id"))
+        if position is None:
+            raise SnapshotDrift(f"record {record.get('id')} is not in the snapshot")
+        return position
+
+    def _delta_sync(self) -> List[Dict]:
+        old = self._records
+        newest = self._fetch_page(1, 1, True)
+        oldest = self._fetch_page(1, 1, False)
+        if newest is None or oldest is None:
+            raise SnapshotDrift("probe failed")
+        self.stats.fetched(len(newest.get("records") or []))
+        self.stats.fetched(len(oldest.get("records") or []))
+        total, newest_id, oldest_id = _page_signature(newest, oldest)
+        self._check_size(total)
+
+        if total == len(old) and (total == 0 or (newest_id == old[0].get("id") and oldest_id == old[-1].get("id"))):
+            self.stats.served(len(old))
+            return list(old)
+        if total == 0:
+            self._set_records([])
+            return []
+        if not old:
+            raise SnapshotDrift("snapshot was empty")
+
+        # Records newer than anything in the snapshot: read the head until it lines up
+        added: List[Dict] = []
+        anchor = None
+        if newest_id in self._positions:
+            anchor = newest["records"][0]
+        else:
+            for page in range(1, self.max_head_pages + 1):
+                data = self._fetch_page(page, self.page_size, True)
+                if not data or "records" not in data:
+                    raise SnapshotDrift("head page failed")
+                self.stats.fetched(len(data["records"]))
+                for record in data["records"]:
+                    if record.get("id") in self._positions:
+                        anchor = record
+                        break
+                    added.append(record)
+                if anchor is not None or len(data["records"]) < self.page_size:
+                    break
+            if anchor is None:
+                raise SnapshotDrift("no overlap with the snapshot")
+
+        # Remote index a lines up with snapshot index s. Everything in the snapshot before s is gone.
+        a, s = len(added), self._position(anchor)
+        last = total - 1
+        e = self._position(oldest["records"][0])
+        if e < s or (last - a) > (e - s):
+            raise SnapshotDrift("records were added in the middle of the list")
+
+        # Snapshot records missing between s and e: bisect on the number removed before each position
+        removed: Set[int] = set()
+        probes = [0]
+
+        def locate(lo: int, lo_pos: int, hi: int, hi_pos: int) -> None:
+            lo_shift, hi_shift = lo_pos - s - (lo - a), hi_pos - s - (hi - a)
+            if lo_shift == hi_shift:
+                return
+            if hi - lo <= 1:
+                removed.update(range(lo_pos + 1, hi_pos))
+                return
+            probes[0] += 1
+            if probes[0] > self.max_probes:
+                raise SnapshotDrift(f"more than {self.max_probes} probes needed")
+            mid = (lo + hi) // 2
+            mid_pos = self._position(self._probe(mid))
+            if not lo_pos < mid_pos < hi_pos:
+                raise SnapshotDrift("records were reordered")
+            locate(lo, lo_pos, mid, mid_pos)
+            locate(mid, mid_pos, hi, hi_pos)
+
+        if last > a:
+            locate(a, s, last, e)
+        elif e != s:
+            raise SnapshotDrift("records were reordered")
+
+        records = added + [old[index] for index in range(s, e + 1) if index not in removed]
+        if len(records) != total:
+            raise SnapshotDrift(f"expected {total} records, reconciled {len(records)}")
+
+        self.stats.served(len(records) - len(added))
+        logger.info(f"Updated wanted/{self.kind} snapshot: {len(added)} new, "
+                    f"{len(old) - (len(records) - len(added))} gone, {probes[0]} probes")
+        self._set_records(records)
+        return list(records)
+
+class WantedPageCache:
+    """
+    Pages of a wanted list kept between cycles while the list looks unchanged.
+
+    validate() probes the total and the newest and oldest record; any difference (or the
+    cache reaching `max_age` seconds) drops every cached page, as page contents shift.
+    Pages holding more than `max_records` records between them are dropped least
+    recently used first.
+    """
+
+    def __init__(self, kind: str, page_size: int, fetch_page: FetchPage, max_age: float, max_records: int):
+        self.kind = kind
+        self.page_size = page_size
+        self.max_age = max_age
+        self.max_records = max_records
+        self.stats = SyncStats()
+        self._fetch_page = fetch_page
+        self._lock = threading.Lock()
+        self._pages: "collections.OrderedDict[int, Dict]" = collections.OrderedDict()
+        self._cached_records = 0
+        self._signature = None
+        self._created_at = 0.0
+
+    def validate(self) -> int:
+        """Probe Sonarr, dropping the cache if the list changed. Returns totalRecords (0 on failure)."""
+        newest = self._fetch_page(1, 1, True)
+        oldest = self._fetch_page(1, 1, False)
+        with self._lock:
+            if newest is None or oldest is None:
+                self._clear()
+                self._signature = None
+                return 0
+            self.stats.fetched(len(newest.get("records") or []))
+            self.stats.fetched(len(oldest.get("records") or []))
+            signature = _page_signature(newest, oldest)
+            if signature != self._signature or time.time() - self._created_at >= self.max_age:
+                if self._pages:
+                    logger.debug(f"wanted/{self.kind} changed - dropping {len(self._pages)} cached pages")
+                self._clear()
+                self._signature = signature
+                self._created_at = time.time()
+                self.stats.synced(full=True)
+            else:
+                self.stats.synced(full=False)
+            return signature[0]
+
+    def invalidate(self) -> None:
+        """Drop every cached page; nothing is cached again until the next validate()."""
+        with self._lock:
+            self._clear()
+            self._signature = None
+
+    def _clear(self) -> None:
+        self._pages.clear()
+        self._cached_records = 0
+
+    def cached(self, page: int) -> Optional[Dict]:
+        with self._lock:
+            data = self._pages.get(page)
+            if data is not None:
+                self._pages.move_to_end(page)
+        if data is not None:
+            self.stats.served(len(data.get("records", [])))
+        return data
+
+    def store(self, page: int, data: Optional[Dict]) -> Optional[Dict]:
+        if data and "records" in data:
+            self.stats.fetched(len(data["records"]))
+            with self._lock:
+                if self._signature is not None:
+                    previous = self._pages.pop(page, None)
+                    if previous is not None:
+                        self._cached_records -= len(previous["records"])
+                    self._pages[page] = data
+                    self._cached_records += len(data["records"])
+                    while self._pages and self._cached_records > self.max_records:
+                        _, evicted = self._pages.popitem(last=False)
+                        self._cached_records -= len(evicted["records"])
+        return data
+
+    def get(self, page: int) -> Optional[Dict]:
+        data = self.cached(page)
+        if data is not None:
+            return data
+        return self.store(page, self._fetch_page(page, self.page_size, True))
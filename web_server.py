@@ -10,12 +10,13 @@ import datetime
 import pathlib
 import socket
 import json
-import signal
 import sys
 from flask import Flask, render_template, Response, stream_with_context, request, jsonify, send_from_directory
+from werkzeug.serving import make_server as make_http_server
 import logging
 from config import ENABLE_WEB_UI
 import settings_manager
+from control import send_command
 from utils.logger import setup_logger
 
 # Check if web UI is disabled
@@ -35,24 +36,6 @@ LOG_FILE = "/tmp/huntarr-logs/huntarr.log"
 LOG_DIR = pathlib.Path("/tmp/huntarr-logs")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-# Get the PID of the main process
-def get_main_process_pid():
-    try:
-        # Try to find the main.py process
-        for proc in os.listdir('/proc'):
-            if not proc.isdigit():
-                continue
-            try:
-                with open(f'/proc/{proc}/cmdline', 'r') as f:
-                    cmdline = f.read().replace('\0', ' ')
-                    if 'python' in cmdline and 'main.py' in cmdline:
-                        return int(proc)
-            except (IOError, ProcessLookupError):
-                continue
-        return None
-    except:
-        return None
-
 @app.route('/')
 def index():
     """Render the main page"""
@@ -94,6 +77,15 @@ def get_settings():
     """Get all settings"""
     return jsonify(settings_manager.get_all_settings())
 
+def reload_hunt_settings():
+    """Tell the hunt loop to pick up the saved settings now, even mid-cycle. Returns None once it has, or why it hasn't."""
+    response = send_command("reload-settings")
+    if response is None:
+        return "the hunt is not running"
+    if not response.get("ok"):
+        return f"the hunt couldn't apply them: {response.get('error', 'request failed')}"
+    return None
+
 @app.route('/api/settings', methods=['POST'])
 def update_settings():
     """Update settings and restart the main process to apply them immediately"""
@@ -102,51 +94,20 @@ def update_settings():
         if not data:
             return jsonify({"success": False, "message": "No data provided"}), 400
         
-        # Get current settings to compare
-        old_settings = settings_manager.get_all_settings()
-        old_huntarr = old_settings.get("huntarr", {})
-        old_advanced = old_settings.get("advanced", {})
-        old_ui = old_settings.get("ui", {})
-        
-        # Find changes
-        huntarr_changes = {}
-        advanced_changes = {}
-        ui_changes = {}
-        
-        # Track if any real changes were made
-        changes_made = False
-        
-        # Update huntarr settings and track changes
-        if "huntarr" in data:
-            for key, value in data["huntarr"].items():
-                old_value = old_huntarr.get(key)
-                if old_value != value:
-                    huntarr_changes[key] = {"old": old_value, "new": value}
-                    changes_made = True
-                settings_manager.update_setting("huntarr", key, value)
-        
-        # Update UI settings and track changes
-        if "ui" in data:
-            for key, value in data["ui"].items():
-                old_value = old_ui.get(key)
-                if old_value != value:
-                    ui_changes[key] = {"old": old_value, "new": value}
-                    changes_made = True
-                settings_manager.update_setting("ui", key, value)
+        # Validate, merge and write all changes in one go
+        try:
+            changes = settings_manager.update_settings(data)
+        except settings_manager.SettingsValidationError as e:
+            return jsonify({"success": False, "message": f"Invalid settings: {e}"}), 400
+        huntarr_changes = changes.get("huntarr", {})
+        advanced_changes = changes.get("advanced", {})
+        ui_changes = changes.get("ui", {})
+        changes_made = bool(changes)
         
-        # Update advanced settings and track changes
-        if "advanced" in data:
-            for key, value in data["advanced"].items():
-                old_value = old_advanced.get(key)
-                if old_value != value:
-                    advanced_changes[key] = {"old": old_value, "new": value}
-                    changes_made = True
-                settings_manager.update_setting("advanced", key, value)
-                
-                # Special handling for debug_mode setting
-                if key == "debug_mode" and old_value != value:
-                    # Reconfigure the logger with new debug mode setting
-                    setup_logger(value)
+        # Special handling for debug_mode setting
+        if "debug_mode" in advanced_changes:
+            # Reconfigure the logger with new debug mode setting
+            setup_logger(advanced_changes["debug_mode"]["new"])
         
         # Log changes if any were made
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -168,20 +129,12 @@ def update_settings():
                     f.write(f"{timestamp} - huntarr-web - INFO - Changed UI.{key} from {change['old']} to {change['new']}\n")
                 
                 f.write(f"{timestamp} - huntarr-web - INFO - Settings saved successfully\n")
-                f.write(f"{timestamp} - huntarr-web - INFO - Restarting current cycle to apply new settings immediately\n")
+                f.write(f"{timestamp} - huntarr-web - INFO - Applying new settings to the running hunt\n")
             
-            # Try to signal the main process to restart the cycle
-            main_pid = get_main_process_pid()
-            if main_pid:
-                try:
-                    # Send a SIGUSR1 signal which we'll handle in main.py to restart the cycle
-                    os.kill(main_pid, signal.SIGUSR1)
-                    return jsonify({"success": True, "message": "Settings saved and cycle restarted", "changes_made": True})
-                except:
-                    # If signaling fails, just return success for the settings save
-                    return jsonify({"success": True, "message": "Settings saved, but cycle not restarted", "changes_made": True})
-            else:
-                return jsonify({"success": True, "message": "Settings saved, but main process not found", "changes_made": True})
+            not_applied = reload_hunt_settings()
+            if not_applied is None:
+                return jsonify({"success": True, "message": "Settings saved and applied", "changes_made": True})
+            return jsonify({"success": True, "message": f"Settings saved, but {not_applied}", "changes_made": True})
         else:
             # No changes were made
             return jsonify({"success": True, "message": "No changes detected", "changes_made": False})
@@ -203,20 +156,12 @@ def reset_settings():
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with open(LOG_FILE, 'a') as f:
             f.write(f"{timestamp} - huntarr-web - INFO - Settings reset to defaults by user\n")
-            f.write(f"{timestamp} - huntarr-web - INFO - Restarting current cycle to apply new settings immediately\n")
+            f.write(f"{timestamp} - huntarr-web - INFO - Applying default settings to the running hunt\n")
         
-        # Try to signal the main process to restart the cycle
-        main_pid = get_main_process_pid()
-        if main_pid:
-            try:
-                # Send a SIGUSR1 signal which we'll handle in main.py to restart the cycle
-                os.kill(main_pid, signal.SIGUSR1)
-                return jsonify({"success": True, "message": "Settings reset and cycle restarted"})
-            except:
-                # If signaling fails, just return success for the settings reset
-                return jsonify({"success": True, "message": "Settings reset, but cycle not restarted"})
-        else:
-            return jsonify({"success": True, "message": "Settings reset, but main process not found"})
+        not_applied = reload_hunt_settings()
+        if not_applied is None:
+            return jsonify({"success": True, "message": "Settings reset and applied"})
+        return jsonify({"success": True, "message": f"Settings reset, but {not_applied}"})
         
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -246,6 +191,31 @@ def update_theme():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/api/hunt/status', methods=['GET'])
+def get_hunt_status():
+    """Get the hunt loop's current phase, work in progress and time until the next cycle"""
+    status = send_command("status")
+    if status is None:
+        return jsonify({"success": False, "message": "The hunt is not running"}), 503
+    status.pop("ok", None)
+    return jsonify({"success": True, **status})
+
+@app.route('/api/hunt/<command>', methods=['POST'])
+def control_hunt(command):
+    """Restart the current cycle, pause or resume hunting, or start the next cycle now"""
+    if command not in ("restart-cycle", "pause", "resume", "run-now"):
+        return jsonify({"success": False, "message": f"Unknown command: {command}"}), 404
+    response = send_command(command)
+    if response is None:
+        return jsonify({"success": False, "message": "The hunt is not running"}), 503
+    if not response.pop("ok", False):
+        return jsonify({"success": False, "message": response.get("error", "Request failed")}), 500
+    
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(LOG_FILE, 'a') as f:
+        f.write(f"{timestamp} - huntarr-web - INFO - Sent '{command}' to the hunt\n")
+    return jsonify({"success": True, **response})
+
 def get_ip_address():
     """Get the host's IP address from API_URL for display"""
     try:
@@ -270,7 +240,14 @@ def get_ip_address():
         except:
             return "localhost"
 
-if __name__ == "__main__":
+def make_server():
+    """Bind the web interface to port 8988 (raises OSError if it's taken); serve_forever() serves it"""
+    try:
+        server = make_http_server('0.0.0.0', 8988, app, threaded=True)
+    except SystemExit:
+        # werkzeug exits instead of raising when the port can't be bound
+        raise OSError("port 8988 is not available")
+
     # Create a basic log entry at startup
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     ip_address = get_ip_address()
@@ -278,6 +255,11 @@ if __name__ == "__main__":
     with open(LOG_FILE, 'a') as f:
         f.write(f"{timestamp} - huntarr-web - INFO - Web server starting on port 8988\n")
         f.write(f"{timestamp} - huntarr-web - INFO - Web interface available at http://{ip_address}:8988\n")
-    
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=8988, debug=False, threaded=True)
\ No newline at end of file
+    return server
+
+def run():
+    """Serve the web interface on port 8988 (blocks)"""
+    make_server().serve_forever()
+
+if __name__ == "__main__":
+    run()